@@ -0,0 +1,60 @@
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+
+FORECAST_STEPS = 15
+
+
+class ForecastWorker(QThread):
+    """
+    Прогноз распространения и оптимальная стратегия в отдельном потоке.
+    submit() кладёт снимок симуляции с новым номером поколения; ожидающий снимок заменяется
+    новым (в работе всегда только последнее состояние). Каждый посчитанный прогноз уходит сигналом
+    result_ready в поток UI — иначе при расчёте дольше тика таймера он не показывался бы никогда.
+    Если снимок устарел уже за время прогноза, стратегия для него не считается: с прогнозом
+    уходит предыдущая.
+    """
+    result_ready = pyqtSignal(int, object, object)  # поколение, сетка прогноза, стратегия
+
+    def __init__(self, steps=FORECAST_STEPS, planner=None, parent=None):
+        super().__init__(parent)
+        self.steps = steps
+        self.planner = planner  # функция снимок -> стратегия, например tactics.optimize_tactics
+        self.generation = 0
+        self._pending = None
+        self._stopping = False
+        self._strategy = []  # последняя посчитанная стратегия
+        self._cond = threading.Condition()
+
+    def submit(self, sim):
+        """Снимок берётся сразу (в потоке UI), расчёт — в рабочем потоке. Возвращает номер поколения."""
+        snap = sim.snapshot()
+        with self._cond:
+            self.generation += 1
+            self._pending = (self.generation, snap)
+            self._cond.notify()
+        return self.generation
+
+    def _is_stale(self, generation):
+        return generation != self.generation or self._stopping
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                generation, snap = self._pending
+                self._pending = None
+            grid = snap.predict_future_grid(steps=self.steps)
+            # Симуляция ушла вперёд за время прогноза — прогноз всё равно показываем, с прежней стратегией
+            if not self._is_stale(generation):
+                self._strategy = self.planner(snap) if self.planner else snap.get_optimal_strategy()
+            if not self._stopping:
+                self.result_ready.emit(generation, grid, self._strategy)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self.wait()
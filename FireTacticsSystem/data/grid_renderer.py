@@ -0,0 +1,204 @@
+import math
+import numpy as np
+from PyQt5 import sip
+from PyQt5.QtCore import QPoint, QRect, QRectF, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen, QPixmap, QRegion
+
+from simulation import CellState, CELL_SIZE
+from tilegrid import TILE, read_cells
+
+# Цвета состояний клеток (индекс = значение клетки)
+REAL_PALETTE = {
+    CellState.NORMAL.value: QColor(Qt.white),
+    CellState.SMOKE.value: QColor(220, 220, 220),
+    CellState.FIRE.value: QColor(255, 69, 0),
+    CellState.BURNT.value: QColor(80, 80, 80),
+    CellState.WALL.value: QColor(Qt.black),
+}
+PREDICTION_PALETTE = {**REAL_PALETTE, CellState.FIRE.value: QColor(139, 0, 0)}
+GRIDLINE_COLOR = QColor(Qt.lightGray)
+MIN_GRIDLINE_CELL = 4     # при более мелких клетках сетка не рисуется
+DIRTY_MAX_CELLS = 256     # больше изменившихся клеток — перерисовка целиком
+# Масштабы (пикселей на клетку). Меньше 1 — клетки сводятся блоками k x k (k делит сторону плитки)
+ZOOM_LEVELS = tuple(1 / k for k in (64, 32, 16, 8, 4, 2)) + (1, 2, 3, 4, 6, 8, 12, 16, 20, 24, 32, 48, 64)
+assert CELL_SIZE in ZOOM_LEVELS and all(TILE % round(1 / z) == 0 for z in ZOOM_LEVELS if z < 1)
+
+
+class Viewport:
+    """
+    Видимая часть карты: масштаб cell_px (пикселей на клетку) и смещение ox, oy —
+    пиксель карты в левом верхнем углу виджета. Переводит координаты виджета в клетки и обратно.
+    """
+
+    def __init__(self, rows, cols, cell_px=CELL_SIZE):
+        self.rows, self.cols = rows, cols
+        self.cell_px = cell_px
+        self.ox = self.oy = 0
+        self.width = self.height = 0
+
+    def set_map(self, rows, cols):
+        """Новая карта: обычный масштаб, если помещается, иначе крупнейший, при котором видна целиком."""
+        self.rows, self.cols = rows, cols
+        self.ox = self.oy = 0
+        self.cell_px = CELL_SIZE
+        if self.width and self.height and (cols * CELL_SIZE > self.width or rows * CELL_SIZE > self.height):
+            fit = min(self.width / cols, self.height / rows)
+            self.cell_px = max([z for z in ZOOM_LEVELS if z <= fit] or [ZOOM_LEVELS[0]])
+        self.clamp()
+
+    def resize(self, width, height):
+        self.width, self.height = width, height
+        self.clamp()
+
+    @property
+    def step(self):
+        """Клеток карты на пиксель изображения по каждой оси (1 при cell_px >= 1)."""
+        return 1 if self.cell_px >= 1 else round(1 / self.cell_px)
+
+    def clamp(self):
+        # Смещение целое, чтобы границы клеток попадали на пиксели
+        self.ox = round(min(max(0, self.ox), max(0, self.cols * self.cell_px - self.width)))
+        self.oy = round(min(max(0, self.oy), max(0, self.rows * self.cell_px - self.height)))
+
+    def visible(self):
+        """Видимые клетки [r0, r1) x [c0, c1); r0 и c0 выровнены на step."""
+        k, z = self.step, self.cell_px
+        r0 = int(self.oy // z) // k * k
+        c0 = int(self.ox // z) // k * k
+        r1 = min(self.rows, math.ceil((self.oy + self.height) / z))
+        c1 = min(self.cols, math.ceil((self.ox + self.width) / z))
+        return r0, max(r0, r1), c0, max(c0, c1)
+
+    def cell_at(self, x, y):
+        return int((y + self.oy) // self.cell_px), int((x + self.ox) // self.cell_px)
+
+    def to_widget(self, r, c):
+        return c * self.cell_px - self.ox, r * self.cell_px - self.oy
+
+    def pan(self, dx, dy):
+        self.ox -= dx
+        self.oy -= dy
+        self.clamp()
+
+    def zoom_at(self, x, y, zoom_in):
+        """Соседний масштаб; точка карты под курсором (x, y) остаётся на месте."""
+        i = ZOOM_LEVELS.index(self.cell_px)
+        i = min(len(ZOOM_LEVELS) - 1, i + 1) if zoom_in else max(0, i - 1)
+        mx, my = (x + self.ox) / self.cell_px, (y + self.oy) / self.cell_px
+        self.cell_px = ZOOM_LEVELS[i]
+        self.ox, self.oy = mx * self.cell_px - x, my * self.cell_px - y
+        self.clamp()
+
+    def apply(self, painter):
+        """Переводит painter в координаты карты с CELL_SIZE пикселей на клетку — в них рисуются подразделения."""
+        painter.translate(-self.ox, -self.oy)
+        painter.scale(self.cell_px / CELL_SIZE, self.cell_px / CELL_SIZE)
+
+
+class GridRenderer:
+    """
+    Рисует видимое окно сетки через QImage Indexed8 поверх собственного буфера uint8: значения клеток —
+    индексы в таблице цветов, так что обновление кадра — это копирование окна без цикла по клеткам.
+    Изображение растягивается без сглаживания, линии сетки — одна кэшированная плитка.
+    При cell_px < 1 окно сводится блоками (огонь в блоке виден всегда), поэтому кадр стоит
+    O(пикселей виджета) при любом размере карты. update() сообщает, какие клетки окна изменились.
+    """
+
+    def __init__(self, palette=REAL_PALETTE):
+        self.buffer = None
+        self.image = None
+        self.window = None    # (r0, c0, step, форма) окна, лежащего в буфере
+        self.pool_cache = {}  # сведённые плитки TiledGrid между кадрами
+        self._tiles = {}
+        self.set_palette(palette)
+
+    def set_palette(self, palette):
+        self.color_table = [QColor(Qt.white).rgba()] * 256
+        for value, color in palette.items():
+            self.color_table[value] = color.rgba()
+        if self.image is not None:
+            self.image.setColorTable(self.color_table)
+
+    def _allocate(self, rows, cols):
+        # Строки QImage выравниваются на 4 байта, поэтому буфер шире на остаток.
+        # Указатель (а не memoryview) — изображение считает память изменяемой и не копирует её
+        stride = (cols + 3) // 4 * 4
+        self.buffer = np.zeros((rows, stride), dtype=np.uint8)
+        self.image = QImage(sip.voidptr(self.buffer.ctypes.data), cols, rows, stride, QImage.Format_Indexed8)
+        self.image.setColorTable(self.color_table)
+
+    def update(self, grid, view):
+        """
+        Переносит видимое окно grid в буфер. Возвращает None, если нужна полная перерисовка
+        (сдвинулось окно или изменилось много клеток), иначе QRegion изменившихся клеток
+        в координатах виджета (пустой — ничего не изменилось).
+        """
+        r0, r1, c0, c1 = view.visible()
+        k = view.step
+        # Кэш держит не больше нескольких экранов плиток
+        if len(self.pool_cache) > 4 * ((r1 - r0) // TILE + 2) * ((c1 - c0) // TILE + 2):
+            self.pool_cache.clear()
+        cells = read_cells(grid, r0, r1, c0, c1, k, self.pool_cache)
+        window = (r0, c0, k, cells.shape)
+        if window != self.window:
+            self.window = window
+            self._allocate(*cells.shape)
+            self.buffer[:, :cells.shape[1]] = cells
+            return None
+
+        view_buf = self.buffer[:, :cells.shape[1]]
+        changed = view_buf != cells
+        n_changed = np.count_nonzero(changed)
+        if n_changed == 0:
+            return QRegion()
+        np.copyto(view_buf, cells)
+        if n_changed > DIRTY_MAX_CELLS:
+            return None
+        region = QRegion()
+        size = math.ceil(k * view.cell_px)
+        for r, c in zip(*np.nonzero(changed)):
+            x, y = view.to_widget(r0 + int(r) * k, c0 + int(c) * k)
+            region += QRect(math.floor(x), math.floor(y), size + 1, size + 1)
+        return region
+
+    def _gridline_tile(self, cell):
+        if cell not in self._tiles:
+            per_tile = max(1, 64 // cell)
+            size = cell * per_tile
+            tile = QPixmap(size, size)
+            tile.fill(Qt.transparent)
+            p = QPainter(tile)
+            p.setPen(QPen(GRIDLINE_COLOR, 1))
+            for k in range(per_tile):
+                p.drawLine(k * cell, 0, k * cell, size - 1)
+                p.drawLine(0, k * cell, size - 1, k * cell)
+            p.end()
+            self._tiles[cell] = tile
+        return self._tiles[cell]
+
+    def draw(self, painter, view, rect):
+        """Рисует клетки окна, попадающие в rect (координаты виджета)."""
+        if self.image is None:
+            return
+        r0, c0, k, (rows, cols) = self.window
+        x, y = view.to_widget(r0, c0)
+        size = k * view.cell_px
+        i0 = max(0, int((rect.top() - y) // size))
+        i1 = min(rows, int((rect.bottom() - y) // size) + 1)
+        j0 = max(0, int((rect.left() - x) // size))
+        j1 = min(cols, int((rect.right() - x) // size) + 1)
+        if i0 >= i1 or j0 >= j1:
+            return
+        source = QRect(j0, i0, j1 - j0, i1 - i0)
+        target = QRectF(x + j0 * size, y + i0 * size, (j1 - j0) * size, (i1 - i0) * size)
+        painter.save()
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, False)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        painter.drawImage(target, self.image, QRectF(source))
+        if view.cell_px >= MIN_GRIDLINE_CELL:
+            tile = self._gridline_tile(int(view.cell_px))
+            target = target.toRect()
+            # Узор сдвинут так, чтобы линии совпали с границами клеток при любом смещении вида
+            offset = QPoint((target.left() + view.ox) % tile.width(), (target.top() + view.oy) % tile.height())
+            painter.drawTiledPixmap(target, tile, offset)
+        painter.restore()
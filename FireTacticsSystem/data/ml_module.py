@@ -1,73 +1,290 @@
+import hashlib
+import json
 import os
-import random
+import shutil
+import sys
+import threading
+from collections import OrderedDict
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from forest_export import compile_forest, load_forest, merge_forests
+import synthetic
+
+# pandas и sklearn импортируются только при обучении: их загрузка занимает секунды,
+# а при старте с готовым кэшем моделей они не нужны
+
+FEATURES = ['area', 'units', 'intensity']
+TABLE_MAX_CELLS = 2_000_000  # больше — таблицу не строим, работает только LRU
+CACHE_SIZE = 4096
+MODEL_FORMAT = 1
+SYNTHETIC_ROWS = 500 # сценариев в наборе по умолчанию
+PARTIAL_TREES = 10   # деревьев на каждую новую порцию данных в partial_fit
+MAX_TREES = 200      # сверх этого в partial_fit вытесняются самые старые деревья
+
+
+def data_hash(path, block_size=1 << 20):
+    """SHA-1 содержимого файла данных — ключ кэша моделей."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
 
 class MLModule:
-    def __init__(self):
-        self.regressor = RandomForestRegressor(n_estimators=50)
-        self.classifier = RandomForestClassifier(n_estimators=50)
+    def __init__(self, data_path="data/fires.csv", model_dir=None):
+        self.regressor = None        # модели sklearn (есть только после обучения в этом процессе)
+        self.classifier = None
         self.is_trained = False
-        self.data_path = "data/fires.csv"
+        self.fast_regressor = None   # компактные копии лесов для быстрых одиночных предсказаний
+        self.fast_classifier = None
+        self.table_lo = None         # таблица предсказаний по целым входам (см. build_table)
+        self.table_hi = None
+        self.table_time = None
+        self.table_risk = None
+        self.cache = OrderedDict()   # LRU для входов вне таблицы
+        self.data_path = data_path
+        self.model_dir = model_dir or os.path.join(os.path.dirname(data_path) or ".", "models")
+        self.data_hash = None
+        self.training = False        # идёт фоновое обучение
+        self.error = None            # текст ошибки последнего фонового обучения
+        self.lock = threading.Lock()
+        self._thread = None
+        self._data_stat = None
 
     def load_or_generate_data(self):
         """
         Загружает CSV, если есть. Если нет - генерирует 'умные' синтетические данные.
         """
+        import pandas as pd
         if os.path.exists(self.data_path):
             print(f"Загрузка данных из {self.data_path}")
             df = pd.read_csv(self.data_path)
         else:
             print("Файл данных не найден. Генерация синтетического датасета...")
-            os.makedirs("data", exist_ok=True)
+            os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
             df = self.generate_realistic_data()
             df.to_csv(self.data_path, index=False)
             print(f"Датасет сохранен в {self.data_path}")
         
         return df
 
-    def generate_realistic_data(self):
-        """Создает данные с логическими зависимостями для обучения."""
-        data = []
-        for _ in range(500): # 500 сценариев
-            area = random.randint(10, 800)       # Площадь
-            units = random.randint(1, 15)        # Число пожарных
-            intensity = random.randint(1, 5)     # Ранг пожара/Сложность
-            
-            # --- ФОРМУЛА ЛОГИКИ ---
-            # Базовое время = (Площадь * Сложность) / Силы
-            # Добавляем шум (случайные факторы)
-            base_time = (area * intensity * 0.5) / (units + 0.5)
-            time_loc = base_time + random.gauss(0, base_time * 0.1) # +/- 10% шума
-            time_loc = max(1, time_loc) # Время не может быть отрицательным
-
-            # Риск распространения: если сил мало на большую площадь
-            risk_prob = (area * intensity) / (units * 100)
-            risk = 1 if risk_prob > 1.2 else 0 # Класс 1 (Риск есть) или 0
-            
-            data.append([area, units, intensity, round(time_loc, 1), risk])
-        
-        return pd.DataFrame(data, columns=['area', 'units', 'intensity', 'time', 'risk'])
+    def generate_realistic_data(self, n_rows=SYNTHETIC_ROWS, seed=None, noise="gauss"):
+        """Создает данные с логическими зависимостями для обучения (векторно, см. synthetic.py)."""
+        return synthetic.generate(n_rows, seed=seed, noise=noise)
 
     def train(self):
+        from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+
         df = self.load_or_generate_data()
+        digest = data_hash(self.data_path)
         
-        X = df[['area', 'units', 'intensity']]
+        X = df[FEATURES]
         y_time = df['time']
         y_risk = df['risk']
         
-        self.regressor.fit(X, y_time)
-        self.classifier.fit(X, y_risk)
-        self.is_trained = True
+        regressor = RandomForestRegressor(n_estimators=50)
+        classifier = RandomForestClassifier(n_estimators=50)
+        regressor.fit(X, y_time)
+        classifier.fit(X, y_risk)
+        fast_regressor = compile_forest(regressor)
+        fast_classifier = compile_forest(classifier)
+        table = self.build_table(fast_regressor, fast_classifier)
+        self.save_models(digest, fast_regressor, fast_classifier, table)
+        self._install(fast_regressor, fast_classifier, table, digest)
+        self.regressor, self.classifier = regressor, classifier
         print("ML Модели успешно обучены.")
 
-    def predict(self, area, units, intensity):
+    def _install(self, fast_regressor, fast_classifier, table, digest):
+        # Модели подменяются целиком под блокировкой: predict из UI не увидит смесь старой и новой
+        with self.lock:
+            self.fast_regressor = fast_regressor
+            self.fast_classifier = fast_classifier
+            self.table_lo, self.table_hi, self.table_time, self.table_risk = table
+            self.cache.clear()
+            self.data_hash = digest
+            self.is_trained = True
+
+    def _model_path(self, digest):
+        return os.path.join(self.model_dir, digest)
+
+    def save_models(self, digest, fast_regressor, fast_classifier, table):
+        """Сохраняет компактные леса и таблицу в model_dir/<sha1 данных>/."""
+        target = self._model_path(digest)
+        tmp = target + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        fast_regressor.save(os.path.join(tmp, "regressor.forest"))
+        fast_classifier.save(os.path.join(tmp, "classifier.forest"))
+        lo, hi, table_time, table_risk = table
+        if table_time is not None:
+            np.save(os.path.join(tmp, "table_time.npy"), table_time)
+            np.save(os.path.join(tmp, "table_risk.npy"), table_risk)
+        with open(os.path.join(tmp, "model.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": MODEL_FORMAT, "sha1": digest, "features": FEATURES,
+                       "table_lo": lo, "table_hi": hi}, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+
+    def load_cached(self):
+        """Загружает модели, обученные на текущем файле данных. False — кэша нет, нужно обучение."""
+        if not os.path.exists(self.data_path):
+            return False
+        self._data_stat = self._stat()
+        return self.load_models(data_hash(self.data_path))
+
+    def load_models(self, digest):
+        """Загружает модели из model_dir/<digest>/. False — таких нет или формат устарел."""
+        path = self._model_path(digest)
+        meta_path = os.path.join(path, "model.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != MODEL_FORMAT or meta.get("features") != FEATURES:
+            return False
+
+        fast_regressor = load_forest(os.path.join(path, "regressor.forest"))
+        fast_classifier = load_forest(os.path.join(path, "classifier.forest"))
+        if meta["table_lo"] is not None:
+            table = (meta["table_lo"], meta["table_hi"],
+                     np.load(os.path.join(path, "table_time.npy")), np.load(os.path.join(path, "table_risk.npy")))
+        else:
+            table = (None, None, None, None)
+        self._install(fast_regressor, fast_classifier, table, digest)
+        print(f"ML модели загружены из кэша {path}")
+        return True
+
+    def partial_fit(self, data, n_trees=PARTIAL_TREES, max_trees=MAX_TREES, digest=None):
+        """
+        Дообучение на новой порции данных (колонки area/units/intensity/time/risk) без обучения с нуля.
+        У лесов sklearn нет partial_fit, поэтому на порции обучаются n_trees новых деревьев и
+        добавляются к уже обученным (самые старые вытесняются сверх max_trees).
+        digest — ключ, под которым сохранить результат в кэш моделей.
+        """
+        from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+
+        X = np.column_stack([np.asarray(data[c], dtype=np.float64) for c in FEATURES])
+        regressor = RandomForestRegressor(n_estimators=n_trees, n_jobs=-1).fit(X, np.asarray(data['time']))
+        classifier = RandomForestClassifier(n_estimators=n_trees, n_jobs=-1).fit(X, np.asarray(data['risk']))
+        with self.lock:
+            old = (self.fast_regressor, self.fast_classifier) if self.is_trained else (None, None)
+        fast_regressor = merge_forests([old[0], compile_forest(regressor)], max_trees=max_trees)
+        fast_classifier = merge_forests([old[1], compile_forest(classifier)], max_trees=max_trees)
+        table = self.build_table(fast_regressor, fast_classifier)
+        if digest is not None:
+            self.save_models(digest, fast_regressor, fast_classifier, table)
+        self._install(fast_regressor, fast_classifier, table, digest)
+
+    def train_async(self):
+        """Обучение в фоновом потоке; пока оно идёт, is_trained остаётся прежним (UI показывает «не готово»)."""
+        if self.training:
+            return
+        self.training = True
+        self.error = None
+        self._thread = threading.Thread(target=self._train_job, daemon=True)
+        self._thread.start()
+
+    def _train_job(self):
+        try:
+            self.train()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Ошибка обучения ML моделей: {e}")
+        finally:
+            self._data_stat = self._stat()
+            self.training = False
+
+    def start(self):
+        """Запуск без блокировки: модели из кэша, а если их нет — обучение в фоне."""
+        if not self.load_cached():
+            self.train_async()
+
+    def _stat(self):
+        if not os.path.exists(self.data_path):
+            return None
+        st = os.stat(self.data_path)
+        return st.st_size, st.st_mtime_ns
+
+    def refresh_if_changed(self):
+        """Дешёвая проверка (размер и mtime) файла данных; при изменении — кэш или фоновое переобучение."""
+        if self.training or self._stat() == self._data_stat:
+            return False
+        if not self.load_cached():
+            self.train_async()
+        return True
+
+    def build_table(self, fast_regressor, fast_classifier):
+        """
+        Предсказания для всех целых (area, units, intensity) между крайними порогами деревьев.
+        Целые значения за этими границами проходят по деревьям так же, как граничные,
+        поэтому после обрезки по границам таблица точна для любого целого входа.
+        Возвращает (lo, hi, время, риск); (None, None, None, None), если таблица слишком велика.
+        """
+        lo, hi = [], []
+        for f in range(len(FEATURES)):
+            thresholds = np.concatenate([
+                forest.arrays["threshold"][(forest.arrays["feature"] == f) & np.isfinite(forest.arrays["threshold"])]
+                for forest in (fast_regressor, fast_classifier)
+            ])
+            if len(thresholds) == 0:
+                lo.append(0)
+                hi.append(0)
+            else:
+                lo.append(int(np.floor(thresholds.min())))
+                hi.append(int(np.floor(thresholds.max())) + 1)
+        shape = tuple(h - l + 1 for l, h in zip(lo, hi))
+        if np.prod(shape) > TABLE_MAX_CELLS:
+            return None, None, None, None
+
+        axes = [np.arange(l, h + 1) for l, h in zip(lo, hi)]
+        grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(FEATURES))
+        return (lo, hi, fast_regressor.predict(grid).reshape(shape),
+                fast_classifier.predict(grid).reshape(shape))
+
+    def _table_index(self, X):
+        return tuple((np.clip(X, self.table_lo, self.table_hi) - self.table_lo).T)
+
+    def _ensure_trained(self):
+        # Синхронный вызов без готовых моделей: дождаться фонового обучения или обучить здесь
+        if self.is_trained:
+            return
+        if self.training and self._thread is not None:
+            self._thread.join()
         if not self.is_trained:
             self.train()
+
+    def predict(self, area, units, intensity):
+        self._ensure_trained()
         
-        input_data = np.array([[area, units, intensity]])
-        pred_time = self.regressor.predict(input_data)[0]
-        pred_risk = self.classifier.predict(input_data)[0]
-        
-        return pred_time, pred_risk
\ No newline at end of file
+        key = (area, units, intensity)
+        with self.lock:
+            if self.table_time is not None and all(float(v).is_integer() for v in key):
+                idx = tuple(min(max(int(v), lo), hi) - lo for v, lo, hi in zip(key, self.table_lo, self.table_hi))
+                return self.table_time[idx], self.table_risk[idx]
+
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                return cached
+            input_data = np.array([key])
+            pred_time = self.fast_regressor.predict(input_data)[0]
+            pred_risk = self.fast_classifier.predict(input_data)[0]
+            self.cache[key] = (pred_time, pred_risk)
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+            return pred_time, pred_risk
+
+    def predict_many(self, area, units, intensity):
+        """Пакетный прогноз для массивов (с broadcasting): (время, риск) той же формы."""
+        self._ensure_trained()
+
+        values = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (area, units, intensity)))
+        shape = values[0].shape
+        X = np.stack([v.ravel() for v in values], axis=1)
+        with self.lock:
+            if self.table_time is not None and np.all(X == np.floor(X)):
+                idx = self._table_index(X.astype(np.int64))
+                return self.table_time[idx].reshape(shape), self.table_risk[idx].reshape(shape)
+            return (self.fast_regressor.predict(X).reshape(shape),
+                    self.fast_classifier.predict(X).reshape(shape))
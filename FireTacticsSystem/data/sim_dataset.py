@@ -0,0 +1,232 @@
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+
+from simulation import SimulationEngine, CellState, GRID_SIZE
+from ml_module import MLModule, data_hash
+
+# Колонки набора: признаки и цели MLModule + служебные поля прогона
+COLUMNS = {
+    'area': np.int32,          # пиковая площадь горения (клетки)
+    'units': np.int32,         # число подразделений
+    'intensity': np.int32,     # ранг пожара
+    'time': np.float32,        # шагов от пика до ликвидации
+    'risk': np.int8,           # эскалация: пик >= ESCALATION_RATIO * начальная площадь или не потушен
+    'initial_area': np.int32,
+    'extinguished': np.int8,
+    'seed': np.int64,
+}
+META_FILE = "meta.json"
+UNITS_RANGE = (1, 15)
+INTENSITY_RANGE = (1, 5)
+IGNITIONS_PER_RANK = 2  # ранг пожара задаёт число начальных очагов (в самой модели он не участвует)
+ESCALATION_RATIO = 3
+REPLAN_EVERY = 5        # шагов между пересчётом оптимальной стратегии
+MAX_STEPS = 400
+
+
+def run_scenario(seed, rows=GRID_SIZE, cols=GRID_SIZE, max_steps=MAX_STEPS):
+    """
+    Один прогон SimulationEngine без UI: случайные очаги и подразделения, каждые REPLAN_EVERY шагов
+    подразделения идут по get_optimal_strategy. Возвращает строку набора (словарь).
+    """
+    sim = SimulationEngine(rows, cols, seed)
+    rng = sim.stream  # расстановка и шаги — из одного потока сценария
+    intensity = rng.integers(INTENSITY_RANGE[0], INTENSITY_RANGE[1] + 1)
+    units = rng.integers(UNITS_RANGE[0], UNITS_RANGE[1] + 1)
+    sim.fire_intensity = intensity
+
+    cr, cc = rng.integers(0, rows), rng.integers(0, cols)
+    for _ in range(intensity * IGNITIONS_PER_RANK):
+        r = min(rows - 1, max(0, cr + rng.integers(-2, 3)))
+        c = min(cols - 1, max(0, cc + rng.integers(-2, 3)))
+        sim.grid[r][c] = CellState.FIRE.value
+    free = [(r, c) for r in range(rows) for c in range(cols) if sim.grid[r][c] == CellState.NORMAL.value]
+    for i in rng.generator.choice(len(free), min(units, len(free)), replace=False):
+        sim.add_agent(*free[i])
+
+    initial_area = int(sim.get_fire_area())
+    sim.active = True
+    extinguished_at = None
+    while sim.time_step < max_steps:
+        if sim.time_step % REPLAN_EVERY == 0:
+            paths = {s['start']: s['path'] for s in sim.get_optimal_strategy()}
+            for agent in sim.agents:
+                path = paths.get((agent['r'], agent['c']))
+                if path:
+                    agent['path'] = list(path)
+        sim.step()
+        if sim.get_fire_area() == 0:
+            extinguished_at = sim.time_step
+            break
+
+    peak = max(sim.history) if sim.history else initial_area
+    peak_step = sim.history.index(peak) + 1 if sim.history else 0
+    end = extinguished_at if extinguished_at is not None else sim.time_step
+    return {
+        'area': int(peak),
+        'units': len(sim.agents),
+        'intensity': intensity,
+        'time': float(end - peak_step),
+        'risk': int(peak >= ESCALATION_RATIO * initial_area or extinguished_at is None),
+        'initial_area': initial_area,
+        'extinguished': int(extinguished_at is not None),
+        'seed': seed,
+    }
+
+
+def _run_chunk(seeds, max_steps):
+    return [run_scenario(s, max_steps=max_steps) for s in seeds]
+
+
+def run_seeds(n_runs, seed=None, start=0):
+    """Сиды прогонов start..start+n_runs из SeedSequence(seed): дозапуск набора не повторяет прогоны."""
+    state = np.random.SeedSequence(seed).generate_state(start + n_runs, dtype=np.uint64)
+    return state[start:].astype(np.int64) & 0x7FFFFFFF
+
+
+def run_parallel(seeds, max_steps=MAX_STEPS, workers=None, chunksize=4):
+    """
+    Прогоняет сценарии в пуле процессов (все ядра), не больше 2 пачек на процесс в работе.
+    Отдаёт списки строк по мере готовности.
+    """
+    workers = workers or os.cpu_count() or 1
+    seeds = iter(int(s) for s in seeds)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        while True:
+            while len(pending) < workers * 2:
+                chunk = list(itertools.islice(seeds, chunksize))
+                if not chunk:
+                    break
+                pending.add(pool.submit(_run_chunk, chunk, max_steps))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield future.result()
+
+
+class ColumnarDataset:
+    """
+    Набор прогонов по колонкам: каждая дописанная порция — отдельные {колонка}_{порция}.npy,
+    meta.json обновляется последним, поэтому недописанная порция не видна читателям.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"columns": list(COLUMNS), "parts": []}
+
+    @property
+    def n_rows(self):
+        return sum(self.meta["parts"])
+
+    @property
+    def n_parts(self):
+        return len(self.meta["parts"])
+
+    def signature(self):
+        """Ключ состояния набора (для кэша моделей): число порций и строк."""
+        return f"sim-{self.n_parts:05d}-{self.n_rows}"
+
+    def _path(self, column, part):
+        return os.path.join(self.directory, f"{column}_{part:05d}.npy")
+
+    def append(self, rows):
+        """Дописывает порцию строк (список словарей) и возвращает её в виде колонок."""
+        if not rows:
+            return None
+        part = self.n_parts
+        columns = {c: np.array([r[c] for r in rows], dtype=dt) for c, dt in COLUMNS.items()}
+        for c, values in columns.items():
+            np.save(self._path(c, part), values)
+        self.meta["parts"].append(len(rows))
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+        return columns
+
+    def load(self, columns=None, first_part=0):
+        """Колонки порций начиная с first_part (чтение через memmap)."""
+        columns = columns or self.meta["columns"]
+        out = {}
+        for c in columns:
+            chunks = [np.load(self._path(c, p), mmap_mode="r") for p in range(first_part, self.n_parts)]
+            out[c] = np.concatenate(chunks) if chunks else np.empty(0, dtype=COLUMNS[c])
+        return out
+
+    def to_csv(self, path):
+        """Экспорт в формат data/fires.csv (area, units, intensity, time, risk) для MLModule."""
+        import pandas as pd
+        pd.DataFrame(self.load(['area', 'units', 'intensity', 'time', 'risk'])).to_csv(path, index=False)
+
+
+def collect(dataset, n_runs, seed=None, batch_runs=64, ml=None, export_csv=None, max_steps=MAX_STEPS, workers=None):
+    """
+    Генерирует n_runs прогонов, дописывая набор порциями по batch_runs. Если передан MLModule,
+    после каждой порции модели дообучаются на ней (partial_fit) и сохраняются в кэш моделей.
+    export_csv — путь data/fires.csv: тогда кэш ключуется хешем этого файла и UI подхватывает модели сразу.
+    """
+    batch = []
+    done = 0
+
+    def flush():
+        columns = dataset.append(batch)
+        if ml is None or columns is None:
+            return
+        if export_csv:
+            # Модели сохраняются под хешем нового файла до его подмены: UI сразу найдёт их в кэше
+            tmp = export_csv + ".tmp"
+            dataset.to_csv(tmp)
+            ml.partial_fit(columns, digest=data_hash(tmp))
+            os.replace(tmp, export_csv)
+        else:
+            ml.partial_fit(columns, digest=dataset.signature())
+
+    seeds = run_seeds(n_runs, seed, start=dataset.n_rows)
+    for rows in run_parallel(seeds, max_steps=max_steps, workers=workers):
+        batch.extend(rows)
+        done += len(rows)
+        if len(batch) >= batch_runs:
+            flush()
+            batch = []
+        print(f"Прогонов: {done}/{n_runs}, в наборе строк: {dataset.n_rows}", end="\r")
+    if batch:
+        flush()
+    print(f"\nНабор: {dataset.directory}, строк: {dataset.n_rows}")
+    return dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Набор для MLModule из прогонов SimulationEngine")
+    parser.add_argument("--runs", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="data/sim_dataset")
+    parser.add_argument("--batch-runs", type=int, default=64, help="прогонов на порцию (и на шаг дообучения)")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-train", action="store_true", help="только собрать данные")
+    parser.add_argument("--export-csv", default=None, help="переписывать data/fires.csv данными симуляции")
+    args = parser.parse_args()
+
+    dataset = ColumnarDataset(args.out)
+    ml = None
+    if not args.no_train:
+        # Продолжаем дообучение с моделей, соответствующих текущему состоянию набора
+        ml = MLModule(data_path=args.export_csv or "data/fires.csv")
+        if args.export_csv:
+            ml.load_cached()
+        else:
+            ml.load_models(dataset.signature())
+    collect(dataset, args.runs, seed=args.seed, batch_runs=args.batch_runs, ml=ml,
+            export_csv=args.export_csv, max_steps=args.max_steps, workers=args.workers)
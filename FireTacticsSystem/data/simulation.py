@@ -1,10 +1,14 @@
+import copy
+import os
+import sys
 import numpy as np
-import random
 import json
 import heapq
-import pandas as pd # Нужно для удобного экспорта в CSV
 from enum import Enum
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from rngstreams import RandomStream
+
 # --- КОНСТАНТЫ ---
 GRID_SIZE = 30
 CELL_SIZE = 20
@@ -14,6 +18,13 @@ COST_SMOKE = 5
 COST_FIRE = float('inf')
 COST_WALL = float('inf')
 
+# Модель огня и тушения (вероятности за шаг)
+SPREAD_P = 0.08         # горящий сосед поджигает клетку
+BURN_P = 0.02           # горящая клетка выгорает
+SMOKE_CLEAR_P = 0.1     # дым рассеивается
+SUPPRESS_P = 0.8        # подразделение тушит горящую клетку рядом
+FORECAST_SPREAD_P = 0.1
+
 class CellState(Enum):
     NORMAL = 0
     SMOKE = 1
@@ -24,11 +35,39 @@ class CellState(Enum):
 class AgentType(Enum):
     FIRE_FIGHTER = 0
 
+def fire_kernel(cells, burning, draws, spread_p=SPREAD_P, burn_p=BURN_P, smoke_clear_p=SMOKE_CLEAR_P):
+    """
+    Новое состояние клеток за шаг огня (векторно). burning — число горящих соседей (4-связность),
+    draws — по одному случайному числу [0, 1) на клетку. Каждый горящий сосед поджигает
+    с вероятностью spread_p независимо, поэтому порог — 1 - (1 - spread_p) ** burning.
+    """
+    ignite_p = (1 - (1 - spread_p) ** np.arange(5)).astype(np.float32)
+    new = cells.copy()
+    new[(cells == CellState.NORMAL.value) & (draws < ignite_p[burning])] = CellState.FIRE.value
+    new[(cells == CellState.FIRE.value) & (draws < burn_p)] = CellState.BURNT.value
+    new[(cells == CellState.SMOKE.value) & (draws < smoke_clear_p)] = CellState.NORMAL.value
+    return new
+
+
+def burning_neighbors(cells):
+    fire = cells == CellState.FIRE.value
+    burning = np.zeros(cells.shape, dtype=np.int8)
+    burning[1:, :] += fire[:-1, :]
+    burning[:-1, :] += fire[1:, :]
+    burning[:, 1:] += fire[:, :-1]
+    burning[:, :-1] += fire[:, 1:]
+    return burning
+
+
 class SimulationEngine:
-    def __init__(self, rows=GRID_SIZE, cols=GRID_SIZE):
+    def __init__(self, rows=GRID_SIZE, cols=GRID_SIZE, seed=None):
         self.rows = rows
         self.cols = cols
-        self.grid = np.zeros((rows, cols), dtype=int)
+        # Поток случайных чисел сценария; сид пишется в лог и план, по нему прогон повторяется
+        self.stream = RandomStream(seed)
+        self.seed = self.stream.seed
+        self.grid = self._new_grid(rows, cols)
+        self.grid_version = 0  # растёт при каждом изменении сетки (шаг, правка клетки, загрузка карты)
         self.agents = [] 
         self.time_step = 0
         self.active = False
@@ -39,11 +78,15 @@ class SimulationEngine:
         # Полный лог для CSV (детальная)
         self.full_log = []
 
+    def _new_grid(self, rows, cols):
+        return np.zeros((rows, cols), dtype=int)
+
     # ... (Методы toggle_cell, is_occupied, add_agent, remove_agent - БЕЗ ИЗМЕНЕНИЙ) ...
     def toggle_cell(self, r, c):
-        if self.grid[r][c] == CellState.NORMAL.value: self.grid[r][c] = CellState.FIRE.value
-        elif self.grid[r][c] == CellState.FIRE.value: self.grid[r][c] = CellState.WALL.value
-        else: self.grid[r][c] = CellState.NORMAL.value
+        if self.grid[r, c] == CellState.NORMAL.value: self.grid[r, c] = CellState.FIRE.value
+        elif self.grid[r, c] == CellState.FIRE.value: self.grid[r, c] = CellState.WALL.value
+        else: self.grid[r, c] = CellState.NORMAL.value
+        self.grid_version += 1
 
     def is_occupied(self, r, c):
         for a in self.agents:
@@ -51,7 +94,7 @@ class SimulationEngine:
         return False
 
     def add_agent(self, r, c):
-        if self.grid[r][c] in [CellState.WALL.value, CellState.FIRE.value]: return
+        if self.grid[r, c] in [CellState.WALL.value, CellState.FIRE.value]: return
         if self.is_occupied(r, c): return
         self.agents.append({
             'r': r, 'c': c, 'type': AgentType.FIRE_FIGHTER, 
@@ -64,6 +107,20 @@ class SimulationEngine:
     def get_fire_area(self):
         return np.sum(self.grid == CellState.FIRE.value)
 
+    def branch(self, seed=None):
+        """Ветка «что если» от текущего состояния с копированием при записи (whatif.SimulationBranch)."""
+        from whatif import SimulationBranch
+        return SimulationBranch.from_engine(self, seed)
+
+    def snapshot(self):
+        """Независимая копия состояния (сетка, подразделения) для расчётов вне потока UI."""
+        snap = copy.copy(self)
+        snap.grid = self.grid.copy()
+        snap.history = list(self.history); snap.full_log = []
+        snap.agents = [dict(a, path=list(a.get('path', [])), waypoints=list(a['waypoints'])) for a in self.agents]
+        snap.stream = self.stream.spawn(1)[0]  # снимок считается в другом потоке ОС
+        return snap
+
     # ... (Методы find_path_astar, get_optimal_strategy, predict_future_grid - БЕЗ ИЗМЕНЕНИЙ) ...
     # Копируйте их из предыдущего ответа, они работают отлично.
     def find_path_astar(self, start, target, avoid_obstacles=None):
@@ -79,7 +136,7 @@ class SimulationEngine:
             for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
                 nr, nc = r+dr, c+dc
                 if 0 <= nr < self.rows and 0 <= nc < self.cols:
-                    cell_val = self.grid[nr][nc]
+                    cell_val = self.grid[nr, nc]
                     move_cost = COST_NORMAL
                     if cell_val == CellState.SMOKE.value: move_cost = COST_SMOKE
                     elif cell_val == CellState.WALL.value or cell_val == CellState.BURNT.value: move_cost = COST_WALL
@@ -93,8 +150,8 @@ class SimulationEngine:
                         heapq.heappush(queue, (new_cost + heuristic, nr, nc, path + [(nr, nc)]))
         return []
 
-    def get_optimal_strategy(self):
-        strategy = []
+    def attack_points(self):
+        """Свободные клетки рядом с огнём (с повторами)."""
         attack_points = []
         for r in range(self.rows):
             for c in range(self.cols):
@@ -104,7 +161,11 @@ class SimulationEngine:
                         if 0 <= nr < self.rows and 0 <= nc < self.cols:
                             if self.grid[nr][nc] == CellState.NORMAL.value:
                                 attack_points.append((nr, nc))
-        unique_targets = list(set(attack_points))
+        return attack_points
+
+    def get_optimal_strategy(self):
+        strategy = []
+        unique_targets = list(set(self.attack_points()))
         if not unique_targets: return []
         for agent in self.agents:
             start = (agent['r'], agent['c'])
@@ -121,17 +182,9 @@ class SimulationEngine:
     def predict_future_grid(self, steps=20):
         temp_grid = self.grid.copy()
         for _ in range(steps):
-            next_grid = temp_grid.copy()
-            for r in range(self.rows):
-                for c in range(self.cols):
-                    if temp_grid[r][c] == CellState.FIRE.value:
-                        neighbors = [(-1,0), (1,0), (0,-1), (0,1)]
-                        for dr, dc in neighbors:
-                            nr, nc = r+dr, c+dc
-                            if 0 <= nr < self.rows and 0 <= nc < self.cols:
-                                if temp_grid[nr][nc] == CellState.NORMAL.value:
-                                    if random.random() < 0.1: next_grid[nr][nc] = CellState.FIRE.value
-            temp_grid = next_grid
+            # Прогноз: только распространение, без выгорания и рассеивания дыма
+            temp_grid = fire_kernel(temp_grid, burning_neighbors(temp_grid), self.stream.random(temp_grid.shape),
+                                    spread_p=FORECAST_SPREAD_P, burn_p=0.0, smoke_clear_p=0.0)
         return temp_grid
 
     # --- STEP ---
@@ -153,22 +206,17 @@ class SimulationEngine:
         })
         # -----------------------------
         
-        new_grid = self.grid.copy()
+        new_grid = self._spread_fire()
+        self._move_agents(new_grid)
+        self.grid = new_grid
+        self.grid_version += 1
 
-        # 1. Огонь
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.grid[r][c] == CellState.FIRE.value:
-                    if random.random() < 0.02: new_grid[r][c] = CellState.BURNT.value
-                    for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-                        nr, nc = r+dr, c+dc
-                        if 0 <= nr < self.rows and 0 <= nc < self.cols:
-                            if self.grid[nr][nc] == CellState.NORMAL.value:
-                                if random.random() < 0.08: new_grid[nr][nc] = CellState.FIRE.value
-                elif self.grid[r][c] == CellState.SMOKE.value:
-                    if random.random() < 0.1: new_grid[r][c] = CellState.NORMAL.value
-        
-        # 2. Агенты
+    def _spread_fire(self):
+        """1. Огонь: новая сетка по состоянию до шага (одно случайное число на клетку из блока потока)."""
+        return fire_kernel(self.grid, burning_neighbors(self.grid), self.stream.random(self.grid.shape))
+
+    def _move_agents(self, new_grid):
+        """2. Агенты: тушат огонь рядом с собой или идут по маршруту."""
         occupied_positions = {(a['r'], a['c']) for a in self.agents}
         for agent in self.agents:
             r, c = agent['r'], agent['c']
@@ -177,9 +225,9 @@ class SimulationEngine:
                 for dc in [-1, 0, 1]:
                     nr, nc = r + dr, c + dc
                     if 0 <= nr < self.rows and 0 <= nc < self.cols:
-                        if new_grid[nr][nc] == CellState.FIRE.value:
+                        if new_grid[nr, nc] == CellState.FIRE.value:
                             fire_nearby = True
-                            if random.random() < 0.8: new_grid[nr][nc] = CellState.SMOKE.value
+                            if self.stream.random() < SUPPRESS_P: new_grid[nr, nc] = CellState.SMOKE.value
             
             if not fire_nearby:
                 if agent['waypoints']:
@@ -194,7 +242,7 @@ class SimulationEngine:
                 if agent['path']:
                     next_step = agent['path'][0]; nr, nc = next_step
                     is_blocked_by_agent = (nr, nc) in occupied_positions and (nr, nc) != (r, c)
-                    is_passable = new_grid[nr][nc] not in [CellState.WALL.value, CellState.FIRE.value] or (new_grid[nr][nc] == CellState.FIRE.value and not agent['path'][1:])
+                    is_passable = new_grid[nr, nc] not in [CellState.WALL.value, CellState.FIRE.value] or (new_grid[nr, nc] == CellState.FIRE.value and not agent['path'][1:])
 
                     if not is_blocked_by_agent and is_passable:
                         occupied_positions.remove((r, c)); occupied_positions.add((nr, nc))
@@ -205,13 +253,13 @@ class SimulationEngine:
                         if new_detour: agent['path'] = new_detour
                     else: agent['path'] = []
 
-        self.grid = new_grid
-
     # --- ЭКСПОРТ ---
     def export_log_to_csv(self, filename):
         if not self.full_log: return False
         try:
+            import pandas as pd # Только для экспорта в CSV (долгий импорт не тормозит запуск)
             df = pd.DataFrame(self.full_log)
+            df.insert(0, 'seed', self.stream.label)  # сид сценария: по нему прогон повторяется
             df.to_csv(filename, index=False)
             return True
         except Exception as e:
@@ -220,8 +268,9 @@ class SimulationEngine:
             
     # Save/Load
     def save_map_to_json(self, filename):
-        clean_agents = [{'r': a['r'], 'c': a['c'], 'type': a['type'], 'path': [], 'waypoints': a['waypoints']} for a in self.agents]
-        data = {"rows": self.rows, "cols": self.cols, "grid": self.grid.tolist(), "agents": clean_agents}
+        clean_agents = [{'r': a['r'], 'c': a['c'], 'type': getattr(a['type'], 'value', a['type']), 'path': [], 'waypoints': a['waypoints']} for a in self.agents]
+        data = {"rows": self.rows, "cols": self.cols, "grid": self.grid.tolist(), "agents": clean_agents,
+                "rng": self.stream.describe()}
         with open(filename, 'w') as f: json.dump(data, f)
 
     def load_map_from_json(self, filename):
@@ -229,9 +278,13 @@ class SimulationEngine:
         self.rows = data["rows"]
         self.cols = data["cols"]
         self.grid = np.array(data["grid"])
+        self.grid_version += 1
         self.agents = data["agents"]
         for a in self.agents: 
             a['path'] = []; 
             if 'waypoints' not in a: a['waypoints'] = []
         self.history = []
-        self.full_log = []
\ No newline at end of file
+        self.full_log = []
+        if "rng" in data:  # план с сидом: прогон от него повторяется
+            self.stream = RandomStream.from_description(data["rng"])
+            self.seed = self.stream.seed
\ No newline at end of file
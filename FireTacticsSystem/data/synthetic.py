@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+COLUMNS = ['area', 'units', 'intensity', 'time', 'risk']
+BLOCK_ROWS = 65536  # строк на блок со своим дочерним сидом: результат не зависит от размера чанка
+AREA_RANGE = (10, 800)       # Площадь
+UNITS_RANGE = (1, 15)        # Число пожарных
+INTENSITY_RANGE = (1, 5)     # Ранг пожара/Сложность
+
+
+# --- МОДЕЛИ ШУМА ---
+# Принимают генератор и базовое время, возвращают время с шумом (той же формы)
+
+def gauss_noise(rng, base_time, scale=0.1):
+    """+/- 10% нормального шума, как в исходной формуле."""
+    return base_time + rng.normal(0.0, 1.0, base_time.shape) * (base_time * scale)
+
+
+def lognormal_noise(rng, base_time, sigma=0.15):
+    """Мультипликативный шум: время всегда положительно, хвост вправо (затяжные пожары)."""
+    return base_time * rng.lognormal(0.0, sigma, base_time.shape)
+
+
+def no_noise(rng, base_time):
+    return base_time
+
+
+NOISE_MODELS = {"gauss": gauss_noise, "lognormal": lognormal_noise, "none": no_noise}
+
+
+def _noise_fn(noise):
+    if callable(noise):
+        return noise
+    if noise not in NOISE_MODELS:
+        raise ValueError(f"Неизвестная модель шума: {noise} (есть {', '.join(NOISE_MODELS)})")
+    return NOISE_MODELS[noise]
+
+
+def generate_block(rng, n_rows, noise="gauss"):
+    """Один блок сценариев: словарь колонок NumPy (формулы те же, что в MLModule)."""
+    area = rng.integers(AREA_RANGE[0], AREA_RANGE[1] + 1, n_rows)
+    units = rng.integers(UNITS_RANGE[0], UNITS_RANGE[1] + 1, n_rows)
+    intensity = rng.integers(INTENSITY_RANGE[0], INTENSITY_RANGE[1] + 1, n_rows)
+
+    # Базовое время = (Площадь * Сложность) / Силы, плюс шум
+    base_time = (area * intensity * 0.5) / (units + 0.5)
+    time_loc = np.maximum(1, _noise_fn(noise)(rng, base_time)) # Время не может быть отрицательным
+
+    # Риск распространения: если сил мало на большую площадь
+    risk = ((area * intensity) / (units * 100) > 1.2).astype(np.int8)
+    return {'area': area, 'units': units, 'intensity': intensity, 'time': np.round(time_loc, 1), 'risk': risk}
+
+
+def iter_blocks(n_rows, seed=None, noise="gauss"):
+    """Сценарии блоками по BLOCK_ROWS; блок i берёт сид SeedSequence(seed, spawn_key=(i,))."""
+    entropy = np.random.SeedSequence(seed).entropy
+    for i, start in enumerate(range(0, n_rows, BLOCK_ROWS)):
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(i,)))
+        yield generate_block(rng, min(BLOCK_ROWS, n_rows - start), noise)
+
+
+def generate(n_rows, seed=None, noise="gauss"):
+    """Весь набор в памяти (DataFrame)."""
+    import pandas as pd
+    blocks = list(iter_blocks(n_rows, seed, noise))
+    if not blocks:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.DataFrame({c: np.concatenate([b[c] for b in blocks]) for c in COLUMNS})
+
+
+def write_csv(path, n_rows, seed=None, noise="gauss", chunk_rows=1_000_000):
+    """
+    Пишет набор в CSV по чанкам (в памяти не больше одного чанка), подходит для наборов больше ОЗУ.
+    Файл появляется под итоговым именем только целиком.
+    """
+    import pandas as pd
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    per_chunk = max(1, chunk_rows // BLOCK_ROWS)
+    written = 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        pending = []
+        for block in iter_blocks(n_rows, seed, noise):
+            pending.append(block)
+            if len(pending) == per_chunk:
+                written += _write_chunk(f, pending, pd)
+                pending = []
+                print(f"Записано строк: {written}", end="\r")
+        if pending:
+            written += _write_chunk(f, pending, pd)
+    os.replace(tmp, path)
+    print(f"Записано строк: {written}")
+    return written
+
+
+def _write_chunk(f, blocks, pd):
+    df = pd.DataFrame({c: np.concatenate([b[c] for b in blocks]) for c in COLUMNS})
+    df.to_csv(f, header=False, index=False)
+    return len(df)
+
+
+def benchmark_scaling(sizes, seed=0, noise="gauss", n_estimators=50, test_rows=20000):
+    """Время обучения, размер и точность лесов MLModule в зависимости от числа сценариев."""
+    from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+    from sklearn.metrics import accuracy_score, mean_absolute_error
+
+    test = generate(test_rows, seed=None if seed is None else seed + 1, noise=noise)
+    X_test = test[['area', 'units', 'intensity']]
+    results = []
+    for n in sizes:
+        df = generate(n, seed=seed, noise=noise)
+        X = df[['area', 'units', 'intensity']]
+        row = {"rows": n}
+        for name, model, target in (("regressor", RandomForestRegressor(n_estimators=n_estimators, n_jobs=-1), 'time'),
+                                    ("classifier", RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1), 'risk')):
+            start = time.perf_counter()
+            model.fit(X, df[target])
+            row[f"{name}_fit_s"] = round(time.perf_counter() - start, 3)
+            row[f"{name}_nodes"] = int(sum(e.tree_.node_count for e in model.estimators_))
+            pred = model.predict(X_test)
+            if name == "regressor":
+                row["time_mae"] = round(float(mean_absolute_error(test['time'], pred)), 3)
+            else:
+                row["risk_accuracy"] = round(float(accuracy_score(test['risk'], pred)), 4)
+        print(json.dumps(row, ensure_ascii=False))
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синтетические сценарии для MLModule")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_gen = sub.add_parser("generate", help="записать набор в CSV")
+    p_gen.add_argument("-o", "--output", default="data/fires.csv")
+    p_gen.add_argument("--rows", type=int, default=500)
+    p_gen.add_argument("--chunk-rows", type=int, default=1_000_000)
+    p_scale = sub.add_parser("scale", help="замер обучения на наборах разного размера")
+    p_scale.add_argument("--sizes", default="1000,10000,100000,1000000")
+    p_scale.add_argument("--trees", type=int, default=50)
+    for p in (p_gen, p_scale):
+        p.add_argument("--seed", type=int, default=None)
+        p.add_argument("--noise", choices=sorted(NOISE_MODELS), default="gauss")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        write_csv(args.output, args.rows, seed=args.seed, noise=args.noise, chunk_rows=args.chunk_rows)
+    else:
+        benchmark_scaling([int(s) for s in args.sizes.split(",")], seed=args.seed, noise=args.noise,
+                          n_estimators=args.trees)
@@ -0,0 +1,226 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from simulation import CellState, SPREAD_P, BURN_P, SMOKE_CLEAR_P, SUPPRESS_P
+from rngstreams import RandomStream, make_seed
+
+FIRE = CellState.FIRE.value
+SMOKE = CellState.SMOKE.value
+NORMAL = CellState.NORMAL.value
+BURNT = CellState.BURNT.value
+
+# Модель огня та же, что в SimulationEngine.step (вероятности из simulation).
+# Вероятность загорания клетки при k горящих соседях (каждый поджигает независимо)
+IGNITE_P = (1 - (1 - SPREAD_P) ** np.arange(5)).astype(np.float32)
+
+N_SECTORS = 8         # направления вокруг центра пожара, на которые можно послать подразделение
+HORIZON = 20          # шагов в одном прогоне
+N_ROLLOUTS = 32       # прогонов на оценку плана (одни и те же случайные числа для всех планов)
+POPULATION = 24       # планов на итерацию кросс-энтропийного поиска
+ELITE_FRAC = 0.25
+MAX_DRAWS = 8         # розыгрышей планов на итерацию, в единицах размера пачки
+SMOOTHING = 0.7       # доля новой оценки распределения на итерации
+AUC_WEIGHT = 0.1      # вес суммы площадей горения относительно потерянной площади в конце
+
+
+class TacticSearch:
+    """
+    Поиск распределения подразделений по секторам пожара. Варианты для каждого подразделения —
+    цель get_optimal_strategy и ближайшая точка атаки в каждом секторе (маршрут A* по текущей сетке).
+    План оценивается пачкой векторных прогонов модели огня на окне вокруг пожара:
+    потерянная площадь в конце горизонта + AUC_WEIGHT * сумма площадей горения (меньше — лучше).
+    Только для плотной сетки SimulationEngine (np.ndarray), не для TiledSimulationEngine.
+    """
+
+    def __init__(self, sim, horizon=HORIZON, n_rollouts=N_ROLLOUTS, n_sectors=N_SECTORS,
+                 auc_weight=AUC_WEIGHT, seed=None):
+        if not isinstance(sim.grid, np.ndarray):
+            raise TypeError(f"Поиск тактики работает только с плотной сеткой, получена {type(sim.grid).__name__}")
+        self.horizon = horizon
+        self.n_rollouts = n_rollouts
+        self.auc_weight = auc_weight
+        self.eval_seed = np.random.SeedSequence(seed).generate_state(1)[0]  # один поток на все планы
+        self.starts = [(a['r'], a['c']) for a in sim.agents]
+        self.options = self._build_options(sim, n_sectors)
+        self._crop(sim)
+
+    def _build_options(self, sim, n_sectors):
+        greedy = {p['start']: tuple(p['path']) for p in sim.get_optimal_strategy()}
+        fire = np.argwhere(sim.grid == FIRE)
+        if len(fire) == 0:
+            return [[()] for _ in self.starts]
+
+        # Точки атаки: свободные клетки рядом с огнём, по секторам угла вокруг центра пожара
+        normal = sim.grid == NORMAL
+        near = np.zeros_like(normal)
+        near[1:, :] |= sim.grid[:-1, :] == FIRE
+        near[:-1, :] |= sim.grid[1:, :] == FIRE
+        near[:, 1:] |= sim.grid[:, :-1] == FIRE
+        near[:, :-1] |= sim.grid[:, 1:] == FIRE
+        points = np.argwhere(normal & near)
+        center = fire.mean(axis=0)
+        angle = np.arctan2(points[:, 0] - center[0], points[:, 1] - center[1])
+        sector = ((angle + np.pi) / (2 * np.pi) * n_sectors).astype(int) % n_sectors
+
+        options = []
+        for start in self.starts:
+            paths = [greedy.get(start, ())]
+            dist = np.abs(points[:, 0] - start[0]) + np.abs(points[:, 1] - start[1])
+            for s in range(n_sectors):
+                in_sector = np.flatnonzero(sector == s)
+                if len(in_sector) == 0:
+                    continue
+                target = tuple(int(v) for v in points[in_sector[np.argmin(dist[in_sector])]])
+                path = tuple(sim.find_path_astar(start, target))
+                if path and path not in paths:
+                    paths.append(path)
+            options.append(paths)
+        return options
+
+    def _crop(self, sim):
+        # Окно: огонь, подразделения и все маршруты + запас на распространение за горизонт
+        cells = [np.argwhere(sim.grid == FIRE)] + [np.array(self.starts, dtype=int).reshape(-1, 2)]
+        cells += [np.array(p, dtype=int).reshape(-1, 2) for opts in self.options for p in opts if p]
+        cells = np.concatenate(cells)
+        margin = self.horizon + 1
+        r0, c0 = np.maximum(cells.min(axis=0) - margin, 0)
+        r1, c1 = np.minimum(cells.max(axis=0) + margin + 1, sim.grid.shape)
+        self.origin = np.array([r0, c0])
+        self.window = np.array(sim.grid[r0:r1, c0:c1], dtype=np.int8)
+
+    def routes(self, assignment):
+        """Маршруты плана в координатах окна: (A, L, 2), первая точка — старт, хвост повторяет конец."""
+        paths = [self.options[a][k] for a, k in enumerate(assignment)]
+        length = 1 + max((len(p) for p in paths), default=0)
+        out = np.empty((len(paths), length, 2), dtype=np.int64)
+        for a, (start, path) in enumerate(zip(self.starts, paths)):
+            cells = [start] + list(path)
+            cells += [cells[-1]] * (length - len(cells))
+            out[a] = np.array(cells) - self.origin
+        return out
+
+    def evaluate(self, assignment):
+        """Средняя оценка плана по n_rollouts прогонам (меньше — лучше) и её составляющие."""
+        rng = RandomStream(int(self.eval_seed))
+        R, (H, W) = self.n_rollouts, self.window.shape
+        grid = np.repeat(self.window[None], R, axis=0)
+        routes = self.routes(assignment)
+        A, L = routes.shape[:2]
+        pos = np.zeros((R, A), dtype=np.int64)
+        rr = np.arange(R)[:, None, None]
+        offsets = np.array([(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)])
+        auc = np.zeros(R)
+
+        for _ in range(self.horizon):
+            fire = grid == FIRE
+            auc += fire.sum(axis=(1, 2))
+            burning = np.zeros(grid.shape, dtype=np.int8)
+            burning[:, 1:, :] += fire[:, :-1, :]
+            burning[:, :-1, :] += fire[:, 1:, :]
+            burning[:, :, 1:] += fire[:, :, :-1]
+            burning[:, :, :-1] += fire[:, :, 1:]
+            draws = rng.random(grid.shape, dtype=np.float32)
+            new = grid.copy()
+            new[(grid == NORMAL) & (draws < IGNITE_P[burning])] = FIRE
+            new[fire & (draws < BURN_P)] = BURNT
+            new[(grid == SMOKE) & (draws < SMOKE_CLEAR_P)] = NORMAL
+            grid = new
+
+            if A:
+                # Подразделение тушит огонь в 3x3 вокруг себя и не двигается, пока рядом огонь
+                here = routes[np.arange(A)[None, :], pos]                    # (R, A, 2)
+                cells = here[:, :, None, :] + offsets                         # (R, A, 9, 2)
+                inside = ((cells >= 0) & (cells < (H, W))).all(axis=-1)
+                r = np.clip(cells[..., 0], 0, H - 1)
+                c = np.clip(cells[..., 1], 0, W - 1)
+                on_fire = inside & (grid[rr, r, c] == FIRE)
+                hit = on_fire & (rng.random(on_fire.shape) < SUPPRESS_P)
+                grid[np.broadcast_to(rr, hit.shape)[hit], r[hit], c[hit]] = SMOKE
+                pos = np.where(on_fire.any(axis=-1), pos, np.minimum(pos + 1, L - 1))
+
+        lost = ((grid == FIRE) | (grid == BURNT)).sum(axis=(1, 2)) - np.sum(self.window == BURNT)
+        score = lost + self.auc_weight * auc
+        return {"score": float(score.mean()), "lost_area": float(lost.mean()), "auc": float(auc.mean())}
+
+    def plan(self, assignment):
+        """План в формате get_optimal_strategy (его рисует UI)."""
+        return [{'start': start, 'path': list(self.options[a][k])}
+                for a, (start, k) in enumerate(zip(self.starts, assignment)) if self.options[a][k]]
+
+
+_search = None
+
+
+def _init_worker(search):
+    global _search
+    _search = search
+
+
+def _evaluate(assignment):
+    return _search.evaluate(assignment)
+
+
+def optimize_tactics(sim, time_budget_s=1.0, population=POPULATION, elite_frac=ELITE_FRAC,
+                     workers=None, seed=None, return_info=False, **search_args):
+    """
+    Кросс-энтропийный поиск плана в пределах time_budget_s (секунды, вместе с построением вариантов).
+    Начинает с плана get_optimal_strategy и возвращает его, если ничего лучше не нашлось. Планы популяции
+    оцениваются параллельно по процессам (workers, по умолчанию все ядра); пачка урезается до числа
+    оценок, которое успевает до срока по измеренной скорости.
+    """
+    deadline = time.perf_counter() + time_budget_s
+    seed = make_seed(seed)  # записывается в info: по нему поиск повторяется
+    search = TacticSearch(sim, seed=seed, **search_args)
+    sizes = [len(opts) for opts in search.options]
+    rng = RandomStream(seed).generator
+    probs = [np.full(n, 1.0 / n) for n in sizes]
+    best = tuple(0 for _ in sizes)
+    started = time.perf_counter()
+    best_info = search.evaluate(best)
+    rate = 1 / max(time.perf_counter() - started, 1e-6)  # оценок в секунду; уточняется по каждой пачке
+    baseline_score = best_info["score"]
+    n_batch = min(population, math.prod(sizes))
+    iterations = 0
+
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(search,)) if workers > 1 else None
+    evaluate = (lambda batch: list(pool.map(_evaluate, batch))) if pool else (lambda batch: [_evaluate(a) for a in batch])
+    _init_worker(search)
+    try:
+        while max(sizes, default=1) > 1:
+            # Новых планов — не больше, чем успеет оцениться до срока (лучший план уже оценён)
+            n_new = min(n_batch - 1, int((deadline - time.perf_counter()) * rate))
+            if n_new < 1:
+                break
+            # Сначала только новые планы; число розыгрышей ограничено, и при сошедшемся
+            # распределении последние розыгрыши добирают пачку повторами
+            batch, seen = [best], {best}
+            for i in range(MAX_DRAWS * (n_new + 1)):
+                if len(batch) > n_new:
+                    break
+                plan = tuple(int(rng.choice(n, p=p)) for n, p in zip(sizes, probs))
+                if plan not in seen or i >= (MAX_DRAWS - 1) * (n_new + 1):
+                    seen.add(plan)
+                    batch.append(plan)
+            started = time.perf_counter()
+            infos = [best_info] + evaluate(batch[1:])
+            rate = (len(batch) - 1) / max(time.perf_counter() - started, 1e-6)
+            scores = [info["score"] for info in infos]
+            order = np.argsort(scores, kind="stable")
+            best, best_info = batch[order[0]], infos[order[0]]
+            elite = [batch[i] for i in order[:max(1, int(len(batch) * elite_frac))]]
+            for a, n in enumerate(sizes):
+                freq = np.bincount([e[a] for e in elite], minlength=n) / len(elite)
+                probs[a] = (1 - SMOOTHING) * probs[a] + SMOOTHING * freq
+            iterations += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    plan = search.plan(best)
+    if return_info:
+        return plan, {**best_info, "baseline_score": baseline_score, "iterations": iterations, "seed": seed}
+    return plan
@@ -0,0 +1,378 @@
+import copy
+import heapq
+import itertools
+import numpy as np
+
+from simulation import (SimulationEngine, CellState, COST_NORMAL, COST_SMOKE, SPREAD_P, BURN_P, SMOKE_CLEAR_P,
+                        FORECAST_SPREAD_P, fire_kernel)
+
+TILE = 64                  # сторона плитки
+DENSE_MAX_CELLS = 4_000_000  # карты больше — TiledSimulationEngine
+ASTAR_MARGIN = 256         # запас A* вокруг прямоугольника start/target на больших картах
+
+FIRE = CellState.FIRE.value
+SMOKE = CellState.SMOKE.value
+NORMAL = CellState.NORMAL.value
+BURNT = CellState.BURNT.value
+WALL = CellState.WALL.value
+
+# Приоритет состояний при уменьшении масштаба: одна горящая клетка делает горящим весь блок
+PRIORITY = np.zeros(256, dtype=np.uint8)
+PRIORITY[[NORMAL, WALL, BURNT, SMOKE, FIRE]] = np.arange(5)
+BY_PRIORITY = np.array([NORMAL, WALL, BURNT, SMOKE, FIRE], dtype=np.uint8)
+
+_versions = itertools.count(1)
+
+
+def pool_states(cells, k):
+    """Уменьшение в k раз: блок k x k -> состояние с наибольшим приоритетом."""
+    if k == 1:
+        return cells
+    h, w = cells.shape
+    H, W = -(-h // k) * k, -(-w // k) * k
+    padded = np.full((H, W), NORMAL, dtype=np.uint8)
+    padded[:h, :w] = cells
+    return BY_PRIORITY[PRIORITY[padded].reshape(H // k, k, W // k, k).max(axis=(1, 3))]
+
+
+class TiledGrid:
+    """
+    Сетка uint8 из плиток tile x tile. Плитки, где все клетки NORMAL, не хранятся.
+    Сводный уровень — число горящих и дымящихся клеток по плиткам (словари только по
+    непустым плиткам): «есть ли здесь огонь» отвечается без чтения клеток.
+    fork()/copy() разделяют плитки, плитка копируется при первой записи (копирование при записи).
+    """
+
+    def __init__(self, rows, cols, tile=TILE):
+        self.shape = (rows, cols)
+        self.tile = tile
+        self.n_tiles = (-(-rows // tile), -(-cols // tile))
+        self.tiles = {}      # (i, j) -> np.ndarray uint8
+        self.owned = set()   # плитки, которые можно менять на месте
+        self.fire = {}       # (i, j) -> число горящих клеток
+        self.smoke = {}      # (i, j) -> число клеток с дымом
+        self.versions = {}   # (i, j) -> номер версии плитки (для кэшей отрисовки)
+        self.version = 0     # номер последнего изменения всей сетки
+
+    @classmethod
+    def from_array(cls, array, tile=TILE):
+        grid = cls(array.shape[0], array.shape[1], tile)
+        grid.write_region(0, 0, array)
+        return grid
+
+    def to_array(self, dtype=int):
+        out = np.zeros(self.shape, dtype=dtype)
+        for (i, j), a in self.tiles.items():
+            r0, c0 = i * self.tile, j * self.tile
+            out[r0:r0 + a.shape[0], c0:c0 + a.shape[1]] = a
+        return out
+
+    def tolist(self):
+        return self.to_array().tolist()
+
+    def fork(self):
+        other = copy.copy(self)
+        other.tiles = dict(self.tiles)
+        other.fire, other.smoke, other.versions = dict(self.fire), dict(self.smoke), dict(self.versions)
+        # После разделения ни одна из сеток не владеет плитками
+        self.owned = set()
+        other.owned = set()
+        return other
+
+    copy = fork
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.tiles.values())
+
+    # --- Плитки ---
+    def tile_shape(self, i, j):
+        t = self.tile
+        return min(t, self.shape[0] - i * t), min(t, self.shape[1] - j * t)
+
+    def read_tile(self, i, j):
+        """Плитка для чтения (для невыделенной — новый массив NORMAL)."""
+        a = self.tiles.get((i, j))
+        return a if a is not None else np.zeros(self.tile_shape(i, j), dtype=np.uint8)
+
+    def _touch(self, key, a):
+        self.version = next(_versions)
+        self.versions[key] = self.version
+        for counts, value in ((self.fire, FIRE), (self.smoke, SMOKE)):
+            n = int(np.count_nonzero(a == value)) if a is not None else 0
+            if n:
+                counts[key] = n
+            else:
+                counts.pop(key, None)
+
+    def set_tile(self, i, j, array):
+        """Ставит плитку целиком (массив переходит во владение сетки); плитка из NORMAL освобождается."""
+        key = (i, j)
+        if not array.any():
+            self.tiles.pop(key, None)
+            self.owned.discard(key)
+            array = None
+        else:
+            self.tiles[key] = array
+            self.owned.add(key)
+        self._touch(key, array)
+
+    def _writable(self, i, j):
+        key = (i, j)
+        a = self.tiles.get(key)
+        if a is None:
+            a = np.zeros(self.tile_shape(i, j), dtype=np.uint8)
+        elif key not in self.owned:
+            a = a.copy()
+        else:
+            return a
+        self.tiles[key] = a
+        self.owned.add(key)
+        return a
+
+    # --- Клетки ---
+    def __getitem__(self, key):
+        r, c = key
+        if isinstance(r, slice) or isinstance(c, slice):
+            r0, r1, _ = r.indices(self.shape[0]) if isinstance(r, slice) else (r, r + 1, 1)
+            c0, c1, _ = c.indices(self.shape[1]) if isinstance(c, slice) else (c, c + 1, 1)
+            return self.region(r0, r1, c0, c1)
+        a = self.tiles.get((r // self.tile, c // self.tile))
+        return NORMAL if a is None else int(a[r % self.tile, c % self.tile])
+
+    def __setitem__(self, key, value):
+        r, c = key
+        if isinstance(r, slice) or isinstance(c, slice):
+            r0, r1, _ = r.indices(self.shape[0]) if isinstance(r, slice) else (r, r + 1, 1)
+            c0, c1, _ = c.indices(self.shape[1]) if isinstance(c, slice) else (c, c + 1, 1)
+            self.write_region(r0, c0, np.broadcast_to(np.asarray(value, dtype=np.uint8), (r1 - r0, c1 - c0)))
+            return
+        i, j = r // self.tile, c // self.tile
+        if value == NORMAL and (i, j) not in self.tiles:
+            return
+        a = self._writable(i, j)
+        rr, cc = r % self.tile, c % self.tile
+        old = a[rr, cc]
+        if old == value:
+            return
+        a[rr, cc] = value
+        key = (i, j)
+        for counts, state in ((self.fire, FIRE), (self.smoke, SMOKE)):
+            n = counts.get(key, 0) + (value == state) - (old == state)
+            if n:
+                counts[key] = n
+            else:
+                counts.pop(key, None)
+        # Плитка, ставшая целиком NORMAL, освобождается, как в set_tile
+        if value == NORMAL and key not in self.fire and key not in self.smoke and not a.any():
+            del self.tiles[key]
+            self.owned.discard(key)
+        self.version = next(_versions)
+        self.versions[key] = self.version
+
+    def region(self, r0, r1, c0, c1, fill=NORMAL):
+        """Копия прямоугольника [r0, r1) x [c0, c1); клетки за краем карты — fill."""
+        out = np.full((r1 - r0, c1 - c0), fill, dtype=np.uint8)
+        rows, cols = self.shape
+        t = self.tile
+        if max(0, r0) < min(rows, r1) and max(0, c0) < min(cols, c1):
+            out[max(0, r0) - r0:min(rows, r1) - r0, max(0, c0) - c0:min(cols, c1) - c0] = NORMAL
+            for i in range(max(0, r0) // t, (min(rows, r1) - 1) // t + 1):
+                for j in range(max(0, c0) // t, (min(cols, c1) - 1) // t + 1):
+                    a = self.tiles.get((i, j))
+                    if a is None:
+                        continue
+                    gr0, gc0 = i * t, j * t
+                    sr0, sr1 = max(r0, gr0), min(r1, gr0 + a.shape[0])
+                    sc0, sc1 = max(c0, gc0), min(c1, gc0 + a.shape[1])
+                    out[sr0 - r0:sr1 - r0, sc0 - c0:sc1 - c0] = a[sr0 - gr0:sr1 - gr0, sc0 - gc0:sc1 - gc0]
+        return out
+
+    def write_region(self, r0, c0, array):
+        t = self.tile
+        r1, c1 = r0 + array.shape[0], c0 + array.shape[1]
+        for i in range(r0 // t, (r1 - 1) // t + 1):
+            for j in range(c0 // t, (c1 - 1) // t + 1):
+                gr0, gc0 = i * t, j * t
+                h, w = self.tile_shape(i, j)
+                sr0, sr1 = max(r0, gr0), min(r1, gr0 + h)
+                sc0, sc1 = max(c0, gc0), min(c1, gc0 + w)
+                a = self.read_tile(i, j).copy()
+                a[sr0 - gr0:sr1 - gr0, sc0 - gc0:sc1 - gc0] = array[sr0 - r0:sr1 - r0, sc0 - c0:sc1 - c0]
+                self.set_tile(i, j, a)
+
+    # --- Сводный уровень ---
+    def fire_area(self):
+        return sum(self.fire.values())
+
+    def active_tiles(self):
+        """Плитки с огнём или дымом."""
+        return self.fire.keys() | self.smoke.keys()
+
+    def any_fire(self, r0, r1, c0, c1):
+        """Есть ли огонь в прямоугольнике: по сводке, клетки читаются только в крайних плитках."""
+        t = self.tile
+        for i, j in self.fire:
+            if i * t < r1 and (i + 1) * t > r0 and j * t < c1 and (j + 1) * t > c0:
+                if r0 <= i * t and (i + 1) * t <= r1 and c0 <= j * t and (j + 1) * t <= c1:
+                    return True
+                if np.any(self.region(max(r0, i * t), min(r1, (i + 1) * t),
+                                      max(c0, j * t), min(c1, (j + 1) * t)) == FIRE):
+                    return True
+        return False
+
+    def pooled(self, r0, r1, c0, c1, k, cache=None):
+        """
+        Уменьшенная в k раз копия прямоугольника (k делит tile, r0/c0 кратны k).
+        cache (словарь) хранит уменьшенные плитки между кадрами: пересчитываются только изменённые.
+        """
+        t = self.tile
+        out = np.full((-(-(r1 - r0) // k), -(-(c1 - c0) // k)), NORMAL, dtype=np.uint8)
+        for i in range(max(0, r0) // t, (min(self.shape[0], r1) - 1) // t + 1):
+            for j in range(max(0, c0) // t, (min(self.shape[1], c1) - 1) // t + 1):
+                a = self.tiles.get((i, j))
+                if a is None:
+                    continue
+                key = (i, j, k)
+                entry = cache.get(key) if cache is not None else None
+                if entry is not None and entry[0] is a and entry[1] == self.versions.get((i, j)):
+                    small = entry[2]
+                else:
+                    small = pool_states(a, k)
+                    if cache is not None:
+                        cache[key] = (a, self.versions.get((i, j)), small)
+                # Плитка в координатах уменьшенного окна
+                pr, pc = (i * t - r0) // k, (j * t - c0) // k
+                sr0, sc0 = max(0, -pr), max(0, -pc)
+                sr1, sc1 = min(small.shape[0], out.shape[0] - pr), min(small.shape[1], out.shape[1] - pc)
+                if sr0 < sr1 and sc0 < sc1:
+                    out[pr + sr0:pr + sr1, pc + sc0:pc + sc1] = small[sr0:sr1, sc0:sc1]
+        return out
+
+
+def read_cells(grid, r0, r1, c0, c1, k=1, cache=None):
+    """Окно карты (ndarray или TiledGrid) для отрисовки, уменьшенное в k раз."""
+    if isinstance(grid, TiledGrid):
+        return grid.region(r0, r1, c0, c1) if k == 1 else grid.pooled(r0, r1, c0, c1, k, cache)
+    return pool_states(np.asarray(grid[r0:r1, c0:c1], dtype=np.uint8), k)
+
+
+def spread_step(grid, rng, spread_p=SPREAD_P, burn_p=BURN_P, smoke_clear_p=SMOKE_CLEAR_P):
+    """
+    Шаг огня по правилам SimulationEngine.step, только в плитках с огнём/дымом и их соседях.
+    Все новые плитки считаются по состоянию до шага и ставятся после.
+    """
+    t = grid.tile
+    n_tr, n_tc = grid.n_tiles
+    candidates = set()
+    for i, j in grid.active_tiles():
+        for di, dj in ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)):
+            if 0 <= i + di < n_tr and 0 <= j + dj < n_tc:
+                candidates.add((i + di, j + dj))
+
+    updates = []
+    for i, j in sorted(candidates):
+        old = grid.read_tile(i, j)
+        h, w = old.shape
+        win = grid.region(i * t - 1, i * t + h + 1, j * t - 1, j * t + w + 1)
+        fire = win == FIRE
+        burning = fire[:-2, 1:-1].astype(np.int8) + fire[2:, 1:-1] + fire[1:-1, :-2] + fire[1:-1, 2:]
+        new = fire_kernel(old, burning, rng.random((h, w), dtype=np.float32), spread_p, burn_p, smoke_clear_p)
+        if not np.array_equal(new, old):
+            updates.append((i, j, new))
+    for i, j, new in updates:
+        grid.set_tile(i, j, new)
+    return grid
+
+
+class TiledSimulationEngine(SimulationEngine):
+    """
+    SimulationEngine для больших карт (районы, десятки миллионов клеток): сетка — TiledGrid,
+    огонь считается только в активных плитках, точки атаки — только вокруг горящих плиток.
+    """
+
+    def __init__(self, rows, cols, tile=TILE, seed=None):
+        self.tile = tile
+        super().__init__(rows, cols, seed)
+
+    def _new_grid(self, rows, cols):
+        return TiledGrid(rows, cols, self.tile)
+
+    def get_fire_area(self):
+        return self.grid.fire_area()
+
+    def attack_points(self):
+        t = self.tile
+        points = set()
+        for i, j in self.grid.fire:
+            r0, c0 = i * t, j * t
+            h, w = self.grid.tile_shape(i, j)
+            win = self.grid.region(r0 - 1, r0 + h + 1, c0 - 1, c0 + w + 1, fill=WALL)
+            fire = np.zeros(win.shape, dtype=bool)
+            fire[1:-1, 1:-1] = win[1:-1, 1:-1] == FIRE
+            near = np.zeros_like(fire)
+            near[:-1, :] |= fire[1:, :]
+            near[1:, :] |= fire[:-1, :]
+            near[:, :-1] |= fire[:, 1:]
+            near[:, 1:] |= fire[:, :-1]
+            for r, c in np.argwhere(near & (win == NORMAL)):
+                points.add((int(r) + r0 - 1, int(c) + c0 - 1))
+        return list(points)
+
+    def find_path_astar(self, start, target, avoid_obstacles=None):
+        """
+        A* с теми же стоимостями клеток, но с указателями на родителя вместо копии пути в каждом
+        узле очереди и поиском в прямоугольнике start/target с запасом ASTAR_MARGIN: на карте
+        в десятки миллионов клеток недостижимая цель иначе обходит её всю.
+        """
+        sr, sc = start; tr, tc = target
+        obstacles = set(avoid_obstacles) if avoid_obstacles else set()
+        obstacles.discard(target)
+        r_lo, r_hi = max(0, min(sr, tr) - ASTAR_MARGIN), min(self.rows, max(sr, tr) + ASTAR_MARGIN + 1)
+        c_lo, c_hi = max(0, min(sc, tc) - ASTAR_MARGIN), min(self.cols, max(sc, tc) + ASTAR_MARGIN + 1)
+        grid = self.grid
+        # Равные f разрешаются в пользу меньшей эвристики — поиск идёт к цели, а не по всему прямоугольнику
+        queue = [(abs(sr - tr) + abs(sc - tc), 0, 0, start)]
+        best = {start: 0}; parent = {start: None}
+        while queue:
+            _, _, cost, node = heapq.heappop(queue)
+            if node == target:
+                path = []
+                while node != start:
+                    path.append(node); node = parent[node]
+                return path[::-1]
+            if cost > best[node]:
+                continue
+            r, c = node
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if not (r_lo <= nr < r_hi and c_lo <= nc < c_hi) or (nr, nc) in obstacles:
+                    continue
+                cell = grid[nr, nc]
+                if cell == WALL or cell == BURNT or (cell == FIRE and (nr, nc) != target):
+                    continue
+                new_cost = cost + (COST_SMOKE if cell == SMOKE else COST_NORMAL)
+                if new_cost < best.get((nr, nc), float('inf')):
+                    best[(nr, nc)] = new_cost; parent[(nr, nc)] = node
+                    h = abs(nr - tr) + abs(nc - tc)
+                    heapq.heappush(queue, (new_cost + h, h, new_cost, (nr, nc)))
+        return []
+
+    def _spread_fire(self):
+        return spread_step(self.grid.fork(), self.stream)
+
+    def predict_future_grid(self, steps=20):
+        forecast = self.grid.fork()
+        for _ in range(steps):
+            spread_step(forecast, self.stream, spread_p=FORECAST_SPREAD_P, burn_p=0.0, smoke_clear_p=0.0)
+        return forecast
+
+    def load_map_from_json(self, filename):
+        super().load_map_from_json(filename)
+        self.grid = TiledGrid.from_array(self.grid, self.tile)
+
+
+def make_engine(rows, cols, seed=None):
+    """Обычный SimulationEngine или TiledSimulationEngine для больших карт."""
+    if rows * cols > DENSE_MAX_CELLS:
+        return TiledSimulationEngine(rows, cols, seed=seed)
+    return SimulationEngine(rows, cols, seed)
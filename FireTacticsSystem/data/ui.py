@@ -1,14 +1,17 @@
 import sys
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QFrame, QSplitter, 
-                             QFileDialog, QMessageBox)
-from PyQt5.QtCore import QTimer, Qt
+                             QFileDialog, QMessageBox, QSizePolicy)
+from PyQt5.QtCore import QTimer, Qt, QSize
 from PyQt5.QtGui import QPainter, QColor, QBrush, QPen
 
-from simulation import SimulationEngine, CellState, GRID_SIZE, CELL_SIZE
+from simulation import GRID_SIZE, CELL_SIZE
+from tilegrid import make_engine
 from ml_module import MLModule
+from grid_renderer import GridRenderer, Viewport, REAL_PALETTE, PREDICTION_PALETTE
+from forecast_worker import ForecastWorker
 
 # MapWidget оставляем прежним (он работает корректно)
 class MapWidget(QWidget):
@@ -16,34 +19,73 @@ class MapWidget(QWidget):
         super().__init__()
         self.sim = simulation
         self.mode = mode
-        self.setFixedSize(GRID_SIZE * CELL_SIZE, GRID_SIZE * CELL_SIZE)
+        # Карта может быть любого размера: виджет показывает окно, колесо - масштаб, средняя кнопка - сдвиг
+        self.setMinimumSize(200, 200); self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.view = Viewport(simulation.rows, simulation.cols); self.drag_pos = None
         self.selected_agent_idx = None; self.predicted_grid = None
-        self.cached_strategy = []; self.last_pred_step = -1
+        self.cached_strategy = []; self.pred_key = None; self.pred_generation = 0
+        self.renderer = GridRenderer(PREDICTION_PALETTE if mode == "PREDICTION" else REAL_PALETTE)
+        self.overlay_key = None
+        self.worker = None
+        if mode == "PREDICTION":
+            # Прогноз и стратегия считаются в фоне, paintEvent рисует только готовый результат
+            self.worker = ForecastWorker(parent=self)
+            self.worker.result_ready.connect(self.on_forecast)
+            self.worker.start()
 
-    def update_size(self): self.setFixedSize(self.sim.cols * CELL_SIZE, self.sim.rows * CELL_SIZE); self.update()
+    def sizeHint(self): return QSize(GRID_SIZE * CELL_SIZE, GRID_SIZE * CELL_SIZE)
+
+    def update_size(self): self.view.set_map(self.sim.rows, self.sim.cols); self.update()
+
+    def resizeEvent(self, event):
+        first = not self.view.width; self.view.resize(self.width(), self.height())
+        if first: self.view.set_map(self.sim.rows, self.sim.cols)  # при первом показе большая карта целиком
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event):
+        self.view.zoom_at(event.x(), event.y(), event.angleDelta().y() > 0); self.update()
+
+    def _overlay_state(self):
+        # Всё, что рисуется поверх сетки: при его изменении перерисовывается весь виджет
+        return (self.selected_agent_idx, tuple((a['r'], a['c'], tuple(a.get('path', [])), tuple(a['waypoints']))
+                                               for a in self.sim.agents))
+
+    def refresh(self):
+        """Вызывается по таймеру: перерисовывает только изменившиеся клетки или ничего."""
+        if self.mode == "PREDICTION":
+            # Новый снимок - только если состояние изменилось (шаг, правка карты, подразделения)
+            key = (id(self.sim), self.sim.time_step, self.sim.grid_version,
+                   tuple((a['r'], a['c']) for a in self.sim.agents))
+            if key != self.pred_key: self.pred_key = key; self.worker.submit(self.sim)
+            return
+        overlay = self._overlay_state()
+        dirty = self.renderer.update(self.sim.grid, self.view)
+        if dirty is None or overlay != self.overlay_key: self.overlay_key = overlay; self.update()
+        elif not dirty.isEmpty(): self.update(dirty)
 
     def paintEvent(self, event):
-        painter = QPainter(self); painter.setRenderHint(QPainter.Antialiasing)
+        painter = QPainter(self)
         if self.mode == "REAL":
-            self.draw_grid(painter, self.sim.grid); self.draw_agents_and_routes(painter)
+            self.draw_grid(painter, self.sim.grid, event.rect())
+            painter.setRenderHint(QPainter.Antialiasing); self.view.apply(painter); self.draw_agents_and_routes(painter)
         elif self.mode == "PREDICTION":
-            if self.sim.time_step != self.last_pred_step or self.predicted_grid is None:
-                self.predicted_grid = self.sim.predict_future_grid(steps=15)
-                self.cached_strategy = self.sim.get_optimal_strategy()
-                self.last_pred_step = self.sim.time_step
-            self.draw_grid(painter, self.predicted_grid, is_prediction=True)
+            if self.predicted_grid is None: return  # Первый прогноз ещё считается
+            self.draw_grid(painter, self.predicted_grid, event.rect())
+            painter.setRenderHint(QPainter.Antialiasing); self.view.apply(painter)
             self.draw_optimal_routes(painter); self.draw_agents_simple(painter)
 
-    def draw_grid(self, painter, grid, is_prediction=False):
-        painter.setPen(QPen(Qt.lightGray, 1)); rows, cols = grid.shape
-        for r in range(rows):
-            for c in range(cols):
-                state = grid[r][c]; color = Qt.white
-                if state == CellState.FIRE.value: color = QColor(139, 0, 0) if is_prediction else QColor(255, 69, 0)
-                elif state == CellState.SMOKE.value: color = QColor(220, 220, 220)
-                elif state == CellState.BURNT.value: color = QColor(80, 80, 80)
-                elif state == CellState.WALL.value: color = Qt.black
-                painter.setBrush(QBrush(color)); painter.drawRect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+    def on_forecast(self, generation, grid, strategy):
+        # Результат мог обогнать более поздний, уже показанный - старые поколения не рисуем
+        if generation <= self.pred_generation: return
+        self.pred_generation = generation; self.predicted_grid = grid; self.cached_strategy = strategy
+        self.update()
+
+    def stop_worker(self):
+        if self.worker is not None: self.worker.stop()
+
+    def draw_grid(self, painter, grid, rect):
+        # Буфер изображения синхронизируется с видимым окном сетки (копия без цикла), рисуется только область rect
+        self.renderer.update(grid, self.view); self.renderer.draw(painter, self.view, rect)
 
     def draw_agents_and_routes(self, painter):
         for i, agent in enumerate(self.sim.agents):
@@ -71,9 +113,17 @@ class MapWidget(QWidget):
         painter.setBrush(QBrush(QColor(0, 0, 255, 80))); painter.setPen(Qt.NoPen)
         for agent in self.sim.agents: painter.drawEllipse(agent['c']*CELL_SIZE+5, agent['r']*CELL_SIZE+5, CELL_SIZE-10, CELL_SIZE-10)
 
+    def mouseMoveEvent(self, event):
+        if self.drag_pos is not None:
+            self.view.pan(event.x() - self.drag_pos.x(), event.y() - self.drag_pos.y()); self.drag_pos = event.pos(); self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MiddleButton: self.drag_pos = None
+
     def mousePressEvent(self, event):
+        if event.button() == Qt.MiddleButton: self.drag_pos = event.pos(); return
         if self.mode == "REAL":
-            c = event.x() // CELL_SIZE; r = event.y() // CELL_SIZE
+            r, c = self.view.cell_at(event.x(), event.y())
             if 0 <= r < self.sim.rows and 0 <= c < self.sim.cols:
                 if event.button() == Qt.LeftButton:
                     clicked = -1
@@ -93,13 +143,14 @@ class MapWidget(QWidget):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, rows=GRID_SIZE, cols=GRID_SIZE):
         super().__init__()
         self.setWindowTitle("Система анализа и оценки тактики тушения")
         self.setGeometry(100, 100, 1300, 750)
-        self.sim = SimulationEngine()
+        self.sim = make_engine(rows, cols)  # большие карты - плиточная сетка
         self.ml = MLModule()
-        self.ml.train() 
+        self.ml.start() # Модели из кэша; если данных ещё не было - обучение в фоне
+        self.ml_waiting = False
         self.init_ui()
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_simulation)
@@ -156,19 +207,23 @@ class MainWindow(QMainWindow):
         splitter = QSplitter(Qt.Horizontal)
         self.map_real = MapWidget(self.sim, mode="REAL")
         container_real = QWidget(); l_real = QVBoxLayout(container_real)
-        l_real.addWidget(QLabel("<h3>Оперативная обстановка (Факт)</h3>")); l_real.addWidget(self.map_real); l_real.addStretch()
+        l_real.addWidget(QLabel("<h3>Оперативная обстановка (Факт)</h3>")); l_real.addWidget(self.map_real)
         
         self.map_pred = MapWidget(self.sim, mode="PREDICTION")
         container_pred = QWidget(); l_pred = QVBoxLayout(container_pred)
-        l_pred.addWidget(QLabel("<h3>Прогноз распространения</h3>")); l_pred.addWidget(self.map_pred); l_pred.addStretch()
+        l_pred.addWidget(QLabel("<h3>Прогноз распространения</h3>")); l_pred.addWidget(self.map_pred)
 
         splitter.addWidget(container_real); splitter.addWidget(container_pred)
         main_layout.addWidget(control_panel); main_layout.addWidget(splitter)
 
     def toggle_sim(self): self.sim.active = not self.sim.active
+
+    def closeEvent(self, event):
+        self.timer.stop(); self.map_pred.stop_worker()
+        super().closeEvent(event)
     
     def reset_sim(self):
-        self.sim = SimulationEngine(self.sim.rows, self.sim.cols)
+        self.sim = make_engine(self.sim.rows, self.sim.cols)
         self.map_real.sim = self.sim; self.map_pred.sim = self.sim
         self.map_real.selected_agent_idx = None; self.map_real.update(); self.map_pred.update()
         self.lbl_stats.setText("Сброс")
@@ -193,6 +248,11 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Нет данных", "Нет данных для анализа")
             return
         
+        if not self.ml.is_trained:
+            QMessageBox.information(self, "ML не готова", "ML-модель ещё обучается, повторите через несколько секунд")
+            return
+        
+        import matplotlib.pyplot as plt # Загружается только при первом отчете
         real_data = self.sim.history
         
         # --- 1. ВЫЧИСЛЕНИЕ МЕТРИК ---
@@ -261,7 +321,7 @@ class MainWindow(QMainWindow):
 
     def update_simulation(self):
         if self.sim.active: self.sim.step()
-        self.map_real.update(); self.map_pred.update()
+        self.map_real.refresh(); self.map_pred.refresh()
         
         # Обновление метрик в боковой панели
         area = self.sim.get_fire_area()
@@ -273,6 +333,17 @@ class MainWindow(QMainWindow):
             
         self.lbl_stats.setText(f"Время: {self.sim.time_step}\nПлощадь: {area}\nПик: {peak}\nУщерб(AUC): {auc}")
         
+        # Состояние ML: при изменении файла данных модели переобучаются в фоне
+        self.ml.refresh_if_changed()
+        if not self.ml.is_trained:
+            status = f"ошибка ({self.ml.error})" if self.ml.error else "не готова (обучение...)"
+            self.lbl_risk.setText(f"Риск (ML): <span style='color:gray'>{status}</span>")
+            self.ml_waiting = True
+            return
+        if self.ml_waiting:
+            self.lbl_risk.setText("Риск (ML): модель готова")
+            self.ml_waiting = False
+
         # Обновление риска (реже, чтобы не мигало)
         if self.sim.time_step % 10 == 0 and area > 0:
             _, risk = self.ml.predict(area, units, self.sim.fire_intensity)
@@ -281,7 +352,11 @@ class MainWindow(QMainWindow):
             self.lbl_risk.setText(f"Риск (ML): <span style='color:{col}; font-weight:bold'>{r_str}</span>")
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = MainWindow()
+    parser = argparse.ArgumentParser(description="Анализ тактики тушения")
+    parser.add_argument("--rows", type=int, default=GRID_SIZE)
+    parser.add_argument("--cols", type=int, default=GRID_SIZE)
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = MainWindow(args.rows, args.cols)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
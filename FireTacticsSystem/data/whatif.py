@@ -0,0 +1,146 @@
+from collections import namedtuple
+import numpy as np
+
+from simulation import SimulationEngine, CellState, SUPPRESS_P
+from rngstreams import DEFAULT_BIT_GENERATOR, RandomStream
+from tilegrid import TiledGrid, make_engine, spread_step
+
+TILE = 32  # сторона плитки веток от обычной карты: копируются только плитки, которые ветка изменила
+
+FIRE = CellState.FIRE.value
+SMOKE = CellState.SMOKE.value
+WALL = CellState.WALL.value
+
+# Подразделение ветки: неизменяемое, маршрут (кортеж) общий у всех веток, pos — индекс следующей клетки
+BranchAgent = namedtuple('BranchAgent', ['r', 'c', 'path', 'pos', 'waypoints'])
+
+
+def unique_tile_bytes(grids):
+    """Память плиток набора сеток с учётом разделения (каждая плитка считается один раз)."""
+    seen = {}
+    for g in grids:
+        for a in g.tiles.values():
+            seen[id(a)] = a.nbytes
+    return sum(seen.values())
+
+
+class SimulationBranch:
+    """
+    Ветка «что если» от состояния SimulationEngine: те же правила огня и движения подразделений,
+    но сетка — TiledGrid (копирование при записи), подразделения — неизменяемые BranchAgent,
+    случайность — собственный RandomStream ветки от дочернего SeedSequence.
+    fork() стоит O(число плиток), а память веток растёт только с числом плиток, в которых они разошлись.
+    """
+
+    def __init__(self, grid, agents, seed_seq, time_step=0, history=(), fire_intensity=1,
+                 bit_generator=DEFAULT_BIT_GENERATOR, astar=SimulationEngine.find_path_astar):
+        self.grid = grid
+        self.rows, self.cols = grid.shape
+        self.agents = agents
+        self.seed_seq = seed_seq
+        self.rng = RandomStream(seed_seq, bit_generator=bit_generator)
+        self.bit_generator = bit_generator
+        self.time_step = time_step
+        self.history = list(history)
+        self.fire_intensity = fire_intensity
+        self.astar = astar  # A* движка-источника (у TiledSimulationEngine — ограниченный ASTAR_MARGIN)
+
+    @classmethod
+    def from_engine(cls, sim, seed=None):
+        grid = sim.grid.fork() if isinstance(sim.grid, TiledGrid) else TiledGrid.from_array(sim.grid, TILE)
+        agents = [BranchAgent(a['r'], a['c'], tuple(a.get('path', [])), 0, tuple(a['waypoints'])) for a in sim.agents]
+        # Без сида ветка берёт следующий дочерний поток сценария и воспроизводится по его сиду
+        if seed is None:
+            seed_seq = sim.stream.seed_seq.spawn(1)[0]
+        else:
+            seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        return cls(grid, agents, seed_seq, sim.time_step, sim.history, sim.fire_intensity, sim.stream.bit_generator,
+                   type(sim).find_path_astar)
+
+    def fork(self, n=None):
+        """Одна ветка (n=None) или список из n; у каждой свой дочерний поток случайных чисел."""
+        children = []
+        for seq in self.seed_seq.spawn(1 if n is None else n):
+            children.append(SimulationBranch(self.grid.fork(), list(self.agents), seq, self.time_step,
+                                             self.history, self.fire_intensity, self.bit_generator, self.astar))
+        return children[0] if n is None else children
+
+    def to_engine(self):
+        """Полная копия в виде SimulationEngine (например, чтобы показать ветку в UI)."""
+        sim = make_engine(self.rows, self.cols, self.seed_seq.spawn(1)[0])
+        sim.grid = self.grid.fork() if isinstance(sim.grid, TiledGrid) else self.grid.to_array()
+        sim.time_step = self.time_step
+        sim.history = list(self.history)
+        sim.fire_intensity = self.fire_intensity
+        sim.agents = [{'r': a.r, 'c': a.c, 'type': None, 'path': list(a.path[a.pos:]), 'waypoints': list(a.waypoints)}
+                      for a in self.agents]
+        return sim
+
+    def apply_plan(self, strategy):
+        """Назначает маршруты в формате get_optimal_strategy: [{'start': (r, c), 'path': [...]}, ...]."""
+        paths = {tuple(p['start']): tuple(p['path']) for p in strategy}
+        self.agents = [a._replace(path=paths[(a.r, a.c)], pos=0) if (a.r, a.c) in paths else a for a in self.agents]
+
+    # --- Состояние ---
+    def get_fire_area(self):
+        return self.grid.fire_area()
+
+    def find_path_astar(self, start, target, avoid_obstacles=None):
+        # Тот же A*, что у движка-источника: он читает только rows, cols и grid[r, c]
+        return self.astar(self, start, target, avoid_obstacles)
+
+    # --- STEP ---
+    def _move_agents(self):
+        grid, rng = self.grid, self.rng
+        occupied = {(a.r, a.c) for a in self.agents}
+        moved = []
+        for a in self.agents:
+            r, c = a.r, a.c
+            fire_nearby = False
+            for nr in range(max(0, r - 1), min(self.rows, r + 2)):
+                for nc in range(max(0, c - 1), min(self.cols, c + 2)):
+                    if grid[nr, nc] == FIRE:
+                        fire_nearby = True
+                        if rng.random() < SUPPRESS_P:
+                            grid[nr, nc] = SMOKE
+            if fire_nearby:
+                moved.append(a)
+                continue
+
+            path, pos, waypoints = a.path, a.pos, a.waypoints
+            if waypoints:
+                target = waypoints[0]
+                if (r, c) == target:
+                    waypoints = waypoints[1:]; path, pos = (), 0
+                    target = waypoints[0] if waypoints else None
+                if target and pos >= len(path):
+                    path, pos = tuple(self.find_path_astar((r, c), target)), 0
+
+            if pos < len(path):
+                nr, nc = path[pos]
+                cell = grid[nr, nc]
+                blocked = (nr, nc) in occupied and (nr, nc) != (r, c)
+                passable = cell not in (WALL, FIRE) or (cell == FIRE and pos == len(path) - 1)
+                if not blocked and passable:
+                    occupied.remove((r, c)); occupied.add((nr, nc))
+                    r, c, pos = nr, nc, pos + 1
+                elif blocked:
+                    target = waypoints[0] if waypoints else path[-1]
+                    detour = self.find_path_astar((r, c), target, avoid_obstacles=occupied)
+                    if detour:
+                        path, pos = tuple(detour), 0
+                else:
+                    path, pos = (), 0
+            moved.append(BranchAgent(r, c, path, pos, waypoints))
+        self.agents = moved
+
+    def step(self):
+        self.time_step += 1
+        self.history.append(self.get_fire_area())
+        spread_step(self.grid, self.rng)
+        self._move_agents()
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+        return self
@@ -0,0 +1,237 @@
+# alerts.py — Потоковый движок тревог по показателям бойцов (main.py, app.py)
+
+import numpy as np
+
+LEVELS = ("OK", "WARNING", "CRITICAL")
+
+
+class Rule:
+    """
+    Правило тревоги. conditions — кортежи (признак, '>' или '<', порог срабатывания, порог сброса):
+    тревога поднимается по порогу срабатывания и держится, пока значение не пересечёт порог
+    сброса (гистерезис). Признак — поле показаний ('temp', 'pulse') или скорость его изменения
+    за окно ('pulse_slope', ед./с). mode='all' — все условия, 'any' — хотя бы одно.
+    cooldown_s — повторное срабатывание раньше этого срока после сброса не публикуется
+    (как и парный ему сброс), сам статус при этом остаётся точным.
+    """
+
+    def __init__(self, name, level, conditions, mode="all", cooldown_s=0.0):
+        if level not in LEVELS:
+            raise ValueError(f"Неизвестный уровень тревоги: {level}")
+        self.name = name
+        self.level = level
+        self.conditions = []
+        for cond in conditions:
+            feature, op, value = cond[:3]
+            clear = cond[3] if len(cond) > 3 else value
+            self.conditions.append((feature, op, float(value), float(clear)))
+        self.mode = mode
+        self.cooldown_s = cooldown_s
+
+
+# Правила статуса из app.simulation_tick
+APP_RULES = [
+    Rule("CRITICAL", "CRITICAL", [("temp", ">", 50, 49), ("pulse", ">", 140, 135)], mode="all", cooldown_s=10),
+    Rule("WARNING", "WARNING", [("temp", ">", 42, 41), ("pulse", ">", 160, 155)], mode="any", cooldown_s=10),
+]
+
+# Тревоги маркеров карты из main.create_map
+MAIN_RULES = [
+    Rule("Высокая температура!", "WARNING", [("temp", ">", 60, 58)], cooldown_s=30),
+    Rule("Высокий пульс!", "WARNING", [("pulse", ">", 140, 135)], cooldown_s=30),
+    Rule("Резкий рост пульса!", "WARNING", [("pulse_slope", ">", 1.0, 0.5)], cooldown_s=30),
+]
+
+
+def _compare(values, op, threshold):
+    return values > threshold if op == ">" else values < threshold
+
+
+class AlertEngine:
+    """
+    Обрабатывает пачки показаний векторизованно. Для каждого бойца хранится кольцевой буфер
+    последних capacity показаний (для признаков по окну window_s, например наклон пульса
+    за 30 с) и состояние каждого правила. События публикуются только при смене состояния.
+    """
+
+    def __init__(self, rules, window_s=30.0, capacity=64):
+        self.rules = list(rules)
+        self.window_s = window_s
+        self.capacity = capacity
+        features = {feature for rule in self.rules for feature, *_ in rule.conditions}
+        self.fields = sorted({f[:-len("_slope")] if f.endswith("_slope") else f for f in features})
+        self.slope_fields = sorted(f[:-len("_slope")] for f in features if f.endswith("_slope"))
+        self._rule_level = np.array([LEVELS.index(rule.level) for rule in self.rules], dtype=np.int8)
+
+        self._index = {}
+        self._ids = []
+        self._allocate(16)
+        self._subscribers = {}
+        self._next_token = 0
+
+    # --- состояние ---
+    def _allocate(self, n):
+        n_rules = len(self.rules)
+        old = getattr(self, "_n_alloc", 0)
+        self._n_alloc = n
+        active = np.zeros((n, n_rules), dtype=bool)
+        muted = np.zeros((n, n_rules), dtype=bool)
+        last_clear = np.full((n, n_rules), -np.inf)
+        buf_t = np.full((n, self.capacity), np.nan)
+        buf_v = {f: np.full((n, self.capacity), np.nan, dtype=np.float32) for f in self.slope_fields}
+        head = np.zeros(n, dtype=np.int64)
+        if old:
+            active[:old] = self._active
+            muted[:old] = self._muted
+            last_clear[:old] = self._last_clear
+            buf_t[:old] = self._buf_t
+            for f in self.slope_fields:
+                buf_v[f][:old] = self._buf_v[f]
+            head[:old] = self._head
+        self._active, self._muted, self._last_clear = active, muted, last_clear
+        self._buf_t, self._buf_v, self._head = buf_t, buf_v, head
+
+    def _indices(self, unit_ids):
+        index = self._index
+        out = np.empty(len(unit_ids), dtype=np.int64)
+        for k, uid in enumerate(unit_ids):
+            i = index.get(uid)
+            if i is None:
+                i = index[uid] = len(self._ids)
+                self._ids.append(uid)
+            out[k] = i
+        if len(self._ids) > self._n_alloc:
+            self._allocate(max(len(self._ids), 2 * self._n_alloc))
+        return out
+
+    # --- подписки ---
+    def subscribe(self, callback, rules=None, min_level="WARNING"):
+        """callback(event) вызывается на каждое событие; можно отфильтровать по именам правил и уровню."""
+
+        token = self._next_token
+        self._next_token += 1
+        self._subscribers[token] = (callback, set(rules) if rules else None, LEVELS.index(min_level))
+        return token
+
+    def unsubscribe(self, token):
+        self._subscribers.pop(token, None)
+
+    def _publish(self, events):
+        for callback, names, min_level in list(self._subscribers.values()):
+            for event in events:
+                if (names is None or event["rule"] in names) and LEVELS.index(event["level"]) >= min_level:
+                    callback(event)
+
+    # --- обработка ---
+    def _slopes(self, idx, t):
+        """Наклон МНК за последние window_s секунд по кольцевому буферу (ед./с)."""
+
+        T = self._buf_t[idx]
+        mask = T >= (t - self.window_s)[:, None]
+        n = mask.sum(axis=1)
+        Tm = np.where(mask, T, 0.0)
+        t_mean = Tm.sum(axis=1) / np.maximum(n, 1)
+        dt = np.where(mask, T - t_mean[:, None], 0.0)
+        denom = (dt * dt).sum(axis=1)
+        out = {}
+        for f in self.slope_fields:
+            V = np.where(mask, self._buf_v[f][idx], 0.0)
+            v_mean = V.sum(axis=1) / np.maximum(n, 1)
+            num = (dt * np.where(mask, V - v_mean[:, None], 0.0)).sum(axis=1)
+            out[f + "_slope"] = np.where(denom > 0, num / np.where(denom > 0, denom, 1.0), 0.0)
+        return out
+
+    def _step(self, idx, t, values):
+        """Одно показание на бойца (idx уникальны): запись в буфер и проверка правил."""
+
+        pos = self._head[idx] % self.capacity
+        self._buf_t[idx, pos] = t
+        for f in self.slope_fields:
+            self._buf_v[f][idx, pos] = values[f]
+        self._head[idx] += 1
+
+        features = dict(values)
+        if self.slope_fields:
+            features.update(self._slopes(idx, t))
+
+        events = []
+        for r, rule in enumerate(self.rules):
+            combine = np.logical_and if rule.mode == "all" else np.logical_or
+            raise_m = hold_m = None
+            for feature, op, value, clear in rule.conditions:
+                x = features[feature]
+                up, hold = _compare(x, op, value), _compare(x, op, clear)
+                raise_m = up if raise_m is None else combine(raise_m, up)
+                hold_m = hold if hold_m is None else combine(hold_m, hold)
+
+            was = self._active[idx, r]
+            now = np.where(was, hold_m, raise_m)
+            self._active[idx, r] = now
+            raised = np.flatnonzero(now & ~was)
+            cleared = np.flatnonzero(was & ~now)
+            if cleared.size:
+                self._last_clear[idx[cleared], r] = t[cleared]
+                # Сброс заглушённого повтора тоже не публикуем
+                muted = self._muted[idx[cleared], r]
+                self._muted[idx[cleared], r] = False
+                cleared = cleared[~muted]
+            if raised.size and rule.cooldown_s:
+                recent = t[raised] - self._last_clear[idx[raised], r] < rule.cooldown_s
+                self._muted[idx[raised[recent]], r] = True
+                raised = raised[~recent]
+            for state, sel in (("raised", raised), ("cleared", cleared)):
+                for k in sel.tolist():
+                    events.append({
+                        "unit": self._ids[idx[k]],
+                        "rule": rule.name,
+                        "level": rule.level,
+                        "state": state,
+                        "time": float(t[k]),
+                        "values": {f: float(features[f][k]) for f, *_ in rule.conditions},
+                    })
+        return events
+
+    def process(self, unit_ids, times, **fields):
+        """
+        Обрабатывает пачку показаний: unit_ids, times (с) и массивы полей (temp=..., pulse=...).
+        Несколько показаний одного бойца в пачке обрабатываются по порядку. Возвращает события.
+        """
+
+        idx = self._indices(unit_ids)
+        times = np.broadcast_to(np.asarray(times, dtype=float), idx.shape)
+        values = {f: np.asarray(fields[f], dtype=float) for f in self.fields}
+
+        # Номер показания бойца внутри пачки: за один проход — не больше одного на бойца
+        order = np.argsort(idx, kind="stable")
+        sorted_idx = idx[order]
+        first = np.searchsorted(sorted_idx, sorted_idx)
+        rank = np.empty_like(idx)
+        rank[order] = np.arange(idx.size) - first
+
+        events = []
+        for r in range(int(rank.max()) + 1 if idx.size else 0):
+            sel = np.flatnonzero(rank == r)
+            events.extend(self._step(idx[sel], times[sel], {f: v[sel] for f, v in values.items()}))
+        if events and self._subscribers:
+            self._publish(events)
+        return events
+
+    def process_units(self, units_list, timestamp, key="name"):
+        """Обёртка для списков словарей бойцов (main.py / app.py)."""
+
+        return self.process([u[key] for u in units_list], timestamp,
+                            **{f: [u[f] for u in units_list] for f in self.fields})
+
+    # --- запросы ---
+    def active_rules(self, unit_id):
+        i = self._index.get(unit_id)
+        if i is None:
+            return []
+        return [rule.name for rule, on in zip(self.rules, self._active[i]) if on]
+
+    def statuses(self, unit_ids):
+        """Наивысший уровень активных тревог по каждому бойцу ('OK', если тревог нет)."""
+
+        idx = self._indices(unit_ids)
+        levels = np.where(self._active[idx], self._rule_level[None, :], 0).max(axis=1, initial=0)
+        return [LEVELS[lv] for lv in levels.tolist()]
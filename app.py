@@ -1,9 +1,12 @@
 import time
-import random
 import csv
 import threading
+import numpy as np
 from flask import Flask, render_template, jsonify, request
 
+from alerts import APP_RULES, AlertEngine
+from rngstreams import RandomStream
+
 app = Flask(__name__)
 
 # --- КОНФИГУРАЦИЯ ---
@@ -13,6 +16,12 @@ FIRE_SPREAD_THRESHOLD = 40  # Огонь распространяется тол
 EXTINGUISH_POWER = 20       # Мощность тушения за один "тик"
 SENSOR_LOG_FILE = 'sensor_logs.csv'
 EVENT_LOG_FILE = 'fire_events.csv'
+ALERT_LOG_FILE = 'alert_events.csv'
+SEED = None                 # None — новый сид при каждом запуске; он пишется в колонку Seed всех логов
+
+# Поток симуляции и отдельный поток для запросов Flask (другой поток ОС)
+stream = RandomStream(SEED)
+request_stream = stream.spawn(1)[0]
 
 # --- ИНИЦИАЛИЗАЦИЯ ДАННЫХ ---
 fire_grid = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
@@ -34,7 +43,7 @@ for squad in squads_info:
             'x': squad['start_x'],
             'y': squad['start_y'],
             'temp': 36.6,
-            'pulse': random.randint(60, 80),
+            'pulse': stream.integers(60, 81),
             'action': 'wait',
             'status': 'OK'
         })
@@ -43,24 +52,96 @@ for squad in squads_info:
 def init_logs():
     with open(SENSOR_LOG_FILE, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['Timestamp', 'Squad', 'ID', 'Temp', 'Pulse', 'Status', 'X', 'Y'])
+        writer.writerow(['Timestamp', 'Squad', 'ID', 'Temp', 'Pulse', 'Status', 'X', 'Y', 'Seed'])
     
     with open(EVENT_LOG_FILE, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['Timestamp', 'Squad', 'ID', 'X', 'Y', 'Extinguished_Amount'])
+        writer.writerow(['Timestamp', 'Squad', 'ID', 'X', 'Y', 'Extinguished_Amount', 'Seed'])
+
+    with open(ALERT_LOG_FILE, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Timestamp', 'ID', 'Rule', 'State', 'Temp', 'Pulse', 'Seed'])
+
 
-init_logs()
+# Статус бойцов (OK/WARNING/CRITICAL) по потоковым правилам с гистерезисом
+alert_engine = AlertEngine(APP_RULES)
+alerts_buffer = []
+alert_engine.subscribe(lambda e: alerts_buffer.append([
+    time.strftime("%H:%M:%S", time.localtime(e['time'])), e['unit'], e['rule'], e['state'],
+    round(e['values'].get('temp', 0), 1), e['values'].get('pulse', '')]))
 
 # --- ЛОГИКА ЭМУЛЯЦИИ ---
-def get_neighbors(x, y):
-    neighbors = []
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            if dx == 0 and dy == 0: continue
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < GRID_SIZE and 0 <= ny < GRID_SIZE:
-                neighbors.append((nx, ny))
-    return neighbors
+def spread_fire(grid, size=GRID_SIZE, rng=None):
+    """Один тик огня: возвращает новую сетку (исходная не меняется). Одно случайное число на клетку."""
+    rng = rng or stream
+    cells = np.asarray(grid)[:size, :size]
+    # Огонь разгорается сам по себе, но медленно
+    new_grid = np.where((cells > 0) & (cells < 100), np.minimum(100, cells + 2), cells)
+
+    # Распространение только от сильного огня (> Threshold) на пустые клетки, 8 соседей;
+    # каждый сильный сосед поджигает с шансом FIRE_SPREAD_CHANCE независимо
+    strong = np.pad(cells > FIRE_SPREAD_THRESHOLD, 1).astype(np.int8)
+    sources = sum(strong[1 + dy:1 + dy + size, 1 + dx:1 + dx + size]
+                  for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx)
+    ignite_p = 1 - (1 - FIRE_SPREAD_CHANCE) ** sources
+    new_grid[(cells == 0) & (rng.random(cells.shape) < ignite_p)] = 10  # Начальное возгорание
+    return new_grid.tolist()
+
+def update_firefighters(grid, units, timestamp, size=GRID_SIZE, rng=None):
+    """Один тик пожарных: движение к ближайшему огню и тушение (grid меняется на месте). Возвращает события тушения."""
+    rng = rng or stream
+    events_buffer = [] # Буфер для записи событий тушения
+
+    for ff in units:
+        # Поиск ближайшего огня
+        nearest_fire = None
+        min_dist = 999
+
+        for y in range(size):
+            for x in range(size):
+                if grid[y][x] > 0:
+                    dist = ((ff['x']-x)**2 + (ff['y']-y)**2)**0.5
+                    if dist < min_dist:
+                        min_dist = dist
+                        nearest_fire = (x, y)
+
+        # Действия
+        if nearest_fire:
+            fx, fy = nearest_fire
+            if min_dist <= 1.5:
+                # ТУШЕНИЕ
+                ff['action'] = 'extinguishing'
+                old_fire_val = grid[fy][fx]
+                # Тушим огонь
+                grid[fy][fx] = max(0, grid[fy][fx] - EXTINGUISH_POWER)
+
+                # Записываем событие (сколько потушили)
+                diff = old_fire_val - grid[fy][fx]
+                if diff > 0:
+                    events_buffer.append([timestamp, ff['squad'], ff['id'], fx, fy, round(diff, 1)])
+
+                # Нагрузка
+                ff['temp'] += rng.uniform(0.2, 0.6)
+                ff['pulse'] += rng.integers(2, 7)
+            else:
+                # ДВИЖЕНИЕ
+                ff['action'] = 'moving'
+                if ff['x'] < fx: ff['x'] += 1
+                elif ff['x'] > fx: ff['x'] -= 1
+
+                if ff['y'] < fy: ff['y'] += 1
+                elif ff['y'] > fy: ff['y'] -= 1
+
+                ff['pulse'] += rng.integers(0, 4)
+        else:
+            # ОТДЫХ / ПАТРУЛЬ
+            ff['action'] = 'patrolling'
+            ff['temp'] = max(36.6, ff['temp'] - 0.2)
+            ff['pulse'] = max(70, ff['pulse'] - 3)
+
+        # Проверка лимитов (чтобы не умереть мгновенно)
+        ff['pulse'] = min(210, ff['pulse'])
+    return events_buffer
 
 def simulation_tick():
     global fire_grid, firefighters
@@ -68,85 +149,18 @@ def simulation_tick():
         timestamp = time.strftime("%H:%M:%S")
 
         # 1. Логика огня (стала медленнее)
-        new_grid = [row[:] for row in fire_grid]
-        for y in range(GRID_SIZE):
-            for x in range(GRID_SIZE):
-                if fire_grid[y][x] > 0:
-                    # Огонь разгорается сам по себе, но медленно
-                    if fire_grid[y][x] < 100:
-                        new_grid[y][x] = min(100, fire_grid[y][x] + 2)
-                    
-                    # Распространение только если огонь сильный (> Threshold)
-                    if fire_grid[y][x] > FIRE_SPREAD_THRESHOLD:
-                        for nx, ny in get_neighbors(x, y):
-                            # Если клетка пустая и выпал шанс
-                            if fire_grid[ny][nx] == 0 and random.random() < FIRE_SPREAD_CHANCE:
-                                new_grid[ny][nx] = 10 # Начальное возгорание
-        fire_grid = new_grid
+        fire_grid = spread_fire(fire_grid)
 
         # 2. Логика пожарных
-        events_buffer = [] # Буфер для записи событий тушения
+        events_buffer = update_firefighters(fire_grid, firefighters, timestamp)
         sensors_buffer = [] # Буфер для датчиков
 
-        for ff in firefighters:
-            # Поиск ближайшего огня
-            nearest_fire = None
-            min_dist = 999
-            
-            for y in range(GRID_SIZE):
-                for x in range(GRID_SIZE):
-                    if fire_grid[y][x] > 0:
-                        dist = ((ff['x']-x)**2 + (ff['y']-y)**2)**0.5
-                        if dist < min_dist:
-                            min_dist = dist
-                            nearest_fire = (x, y)
-            
-            # Действия
-            if nearest_fire:
-                fx, fy = nearest_fire
-                if min_dist <= 1.5:
-                    # ТУШЕНИЕ
-                    ff['action'] = 'extinguishing'
-                    old_fire_val = fire_grid[fy][fx]
-                    # Тушим огонь
-                    fire_grid[fy][fx] = max(0, fire_grid[fy][fx] - EXTINGUISH_POWER)
-                    
-                    # Записываем событие (сколько потушили)
-                    diff = old_fire_val - fire_grid[fy][fx]
-                    if diff > 0:
-                        events_buffer.append([timestamp, ff['squad'], ff['id'], fx, fy, round(diff, 1)])
-
-                    # Нагрузка
-                    ff['temp'] += random.uniform(0.2, 0.6)
-                    ff['pulse'] += random.randint(2, 6)
-                else:
-                    # ДВИЖЕНИЕ
-                    ff['action'] = 'moving'
-                    if ff['x'] < fx: ff['x'] += 1
-                    elif ff['x'] > fx: ff['x'] -= 1
-                    
-                    if ff['y'] < fy: ff['y'] += 1
-                    elif ff['y'] > fy: ff['y'] -= 1
-                    
-                    ff['pulse'] += random.randint(0, 3)
-            else:
-                # ОТДЫХ / ПАТРУЛЬ
-                ff['action'] = 'patrolling'
-                ff['temp'] = max(36.6, ff['temp'] - 0.2)
-                ff['pulse'] = max(70, ff['pulse'] - 3)
-
-            # Проверка лимитов (чтобы не умереть мгновенно)
-            ff['pulse'] = min(210, ff['pulse'])
-            
-            # Анализ состояния
-            if ff['temp'] > 50 and ff['pulse'] > 140:
-                ff['status'] = 'CRITICAL'
-            elif ff['temp'] > 42 or ff['pulse'] > 160:
-                ff['status'] = 'WARNING'
-            else:
-                ff['status'] = 'OK'
-            
-            sensors_buffer.append([timestamp, ff['squad'], ff['id'], round(ff['temp'],1), ff['pulse'], ff['status'], ff['x'], ff['y']])
+        # Анализ состояния: одна пачка показаний на тик
+        alert_engine.process_units(firefighters, time.time(), key='id')
+        statuses = alert_engine.statuses([ff['id'] for ff in firefighters])
+        for ff, status in zip(firefighters, statuses):
+            ff['status'] = status
+            sensors_buffer.append([timestamp, ff['squad'], ff['id'], round(ff['temp'],1), ff['pulse'], ff['status'], ff['x'], ff['y'], stream.label])
 
         # 3. Запись логов (пакетная запись эффективнее)
         try:
@@ -157,15 +171,33 @@ def simulation_tick():
             if events_buffer:
                 with open(EVENT_LOG_FILE, 'a', newline='', encoding='utf-8') as f:
                     writer = csv.writer(f)
-                    writer.writerows(events_buffer)
+                    writer.writerows(row + [stream.label] for row in events_buffer)
+
+            if alerts_buffer:
+                with open(ALERT_LOG_FILE, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerows(row + [stream.label] for row in alerts_buffer)
+                alerts_buffer.clear()
         except Exception as e:
             print(f"Ошибка записи логов: {e}")
 
         time.sleep(1)
 
-# Запуск потока симуляции
-sim_thread = threading.Thread(target=simulation_tick, daemon=True)
-sim_thread.start()
+# Запуск потока симуляции: при старте сервера или первом запросе (импорт модуля ничего не запускает)
+sim_thread = None
+_start_lock = threading.Lock()
+
+def start_simulation():
+    global sim_thread
+    with _start_lock:
+        if sim_thread is None:
+            init_logs()
+            sim_thread = threading.Thread(target=simulation_tick, daemon=True)
+            sim_thread.start()
+
+@app.before_request
+def ensure_simulation():
+    start_simulation()
 
 # --- WEB МАРШРУТЫ ---
 @app.route('/')
@@ -179,9 +211,10 @@ def get_data():
 @app.route('/api/spark', methods=['POST'])
 def spark():
     data = request.json
-    x, y = data.get('x', random.randint(0, GRID_SIZE-1)), data.get('y', random.randint(0, GRID_SIZE-1))
+    x, y = data.get('x', request_stream.integers(0, GRID_SIZE)), data.get('y', request_stream.integers(0, GRID_SIZE))
     fire_grid[y][x] = 80 # Сразу сильный очаг
     return jsonify({'status': 'fire started'})
 
 if __name__ == '__main__':
+    start_simulation()
     app.run(debug=True, port=5000)
\ No newline at end of file
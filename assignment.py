@@ -0,0 +1,212 @@
+# assignment.py — Глобальное распределение бойцов по очагам (main.py)
+
+import math
+
+import numpy as np
+
+METERS_PER_DEG = 111_320  # как в main._degrees_to_meters
+
+
+def cost_matrix(unit_lat, unit_lon, fire_lat, fire_lon, radius, intensity,
+                speed_m_s=1.2, intensity_scale=100.0):
+    """
+    Матрица стоимости (бойцы x очаги): время пути до кромки очага,
+    взвешенное интенсивностью (к сильному очагу ехать "дешевле").
+    """
+
+    lat0 = math.radians(float(np.mean(fire_lat)) if len(fire_lat) else 0.0)
+    dy = (fire_lat[None, :] - unit_lat[:, None]) * METERS_PER_DEG
+    dx = (fire_lon[None, :] - unit_lon[:, None]) * METERS_PER_DEG * math.cos(lat0)
+    to_edge = np.maximum(np.hypot(dx, dy) - radius[None, :], 0.0)
+    return to_edge / speed_m_s / (1.0 + intensity[None, :] / intensity_scale)
+
+
+def fire_capacities(n_units, radius, intensity):
+    """
+    Делит бойцов между очагами пропорционально угрозе (интенсивность x радиус)
+    методом наибольших остатков. Каждый очаг получает хотя бы одного бойца, если их хватает.
+    """
+
+    n_fires = len(radius)
+    caps = np.zeros(n_fires, dtype=np.int64)
+    if n_fires == 0 or n_units == 0:
+        return caps
+    threat = np.maximum(radius * intensity, 1e-9)
+    if n_units < n_fires:
+        caps[np.argsort(-threat)[:n_units]] = 1
+        return caps
+
+    caps[:] = 1
+    rest = n_units - n_fires
+    share = threat / threat.sum() * rest
+    caps += np.floor(share).astype(np.int64)
+    left = n_units - caps.sum()
+    if left:
+        caps[np.argsort(-(share - np.floor(share)))[:left]] += 1
+    return caps
+
+
+def _update_edges(cost, choice, fires, W, U):
+    """
+    Рёбра графа очагов: W[a, b] — минимальная добавка к стоимости при переводе одного бойца
+    с очага a на очаг b, U[a, b] — этот боец. Пересчитываются только строки из fires.
+    """
+
+    cols = np.arange(cost.shape[1])
+    for a in fires:
+        members = np.flatnonzero(choice == a)
+        if members.size == 0:
+            W[a] = np.inf
+            U[a] = -1
+            continue
+        delta = cost[members] - cost[members, a][:, None]
+        best = delta.argmin(axis=0)
+        W[a] = delta[best, cols]
+        U[a] = members[best]
+        W[a, a] = np.inf
+
+
+def _bellman_ford(W, dist):
+    """Кратчайшие пути по матрице W (Беллман–Форд, векторизованно). dist — начальные расстояния."""
+
+    n = len(W)
+    pred = np.full(n, -1, dtype=np.int64)
+    cols = np.arange(n)
+    for _ in range(n):
+        cand = dist[:, None] + W
+        src = cand.argmin(axis=0)
+        best = cand[src, cols]
+        upd = best < dist - 1e-9
+        if not upd.any():
+            return dist, pred, None
+        dist = np.where(upd, best, dist)
+        pred = np.where(upd, src, pred)
+    # Релаксация не остановилась за n шагов — есть отрицательный цикл
+    return dist, pred, int(np.flatnonzero(upd)[0])
+
+
+def _walk(pred, node, stop=None):
+    """Восстанавливает путь по предкам (до stop или до повторения вершины)."""
+
+    path = [node]
+    while True:
+        node = int(pred[node])
+        if node < 0 or node == stop:
+            break
+        if node in path:
+            return path[path.index(node):][::-1]
+        path.append(node)
+    return path[::-1]
+
+
+def _shift(choice, U, nodes, closed=False):
+    """Переводит по одному бойцу вдоль рёбер пути (или цикла) nodes."""
+
+    edges = list(zip(nodes[:-1], nodes[1:]))
+    if closed:
+        edges.append((nodes[-1], nodes[0]))
+    movers = [(int(U[a, b]), b) for a, b in edges]
+    for unit, b in movers:
+        choice[unit] = b
+
+
+def _min_cost_assignment(cost, caps, choice, max_iter):
+    """
+    Назначение с ограничением вместимости как поток минимальной стоимости
+    (последовательные кратчайшие пути) на графе из очагов. Бойцов тысячи, очагов — единицы
+    или десятки, поэтому граф маленький, а рёбра пересчитываются только у затронутых очагов.
+    """
+
+    n_fires = cost.shape[1]
+    W = np.full((n_fires, n_fires), np.inf)
+    U = np.full((n_fires, n_fires), -1, dtype=np.int64)
+    _update_edges(cost, choice, range(n_fires), W, U)
+
+    for _ in range(max_iter):
+        # Тёплый старт: сначала убираем отрицательные циклы (прошлое назначение могло устареть)
+        _, pred, node = _bellman_ford(W, np.zeros(n_fires))
+        if node is not None:
+            cycle = _walk(pred, node)
+            weight = sum(W[a, b] for a, b in zip(cycle, cycle[1:] + cycle[:1]))
+            if not weight < -1e-9:
+                break
+            _shift(choice, U, cycle, closed=True)
+            _update_edges(cost, choice, set(cycle), W, U)
+            continue
+
+        counts = np.bincount(choice, minlength=n_fires)
+        over = np.flatnonzero(counts > caps)
+        if over.size == 0:
+            break
+        dist = np.full(n_fires, np.inf)
+        dist[over[0]] = 0.0
+        dist, pred, _ = _bellman_ford(W, dist)
+        under = np.flatnonzero(counts < caps)
+        target = int(under[dist[under].argmin()])
+        path = _walk(pred, target, stop=over[0])
+        path = [int(over[0])] + path
+        _shift(choice, U, path)
+        _update_edges(cost, choice, set(path), W, U)
+    return choice
+
+
+class AssignmentSolver:
+    """
+    Распределение бойцов по очагам с ограничением вместимости (поток минимальной стоимости).
+    Между тиками сохраняется прошлое назначение, поэтому повторное решение при небольших
+    изменениях занимает несколько итераций вместо полного пересчёта.
+    """
+
+    def __init__(self, speed_m_s=1.2, intensity_scale=100.0, max_iter=1_000_000):
+        self.speed_m_s = speed_m_s
+        self.intensity_scale = intensity_scale
+        self.max_iter = max_iter
+        self._targets = {}  # ключ бойца -> id очага с прошлого тика
+
+    def reset(self):
+        self._targets.clear()
+
+    def solve(self, unit_keys, unit_lat, unit_lon, fire_ids, fire_lat, fire_lon, radius, intensity):
+        """Возвращает индекс очага для каждого бойца (-1, если очагов нет)."""
+
+        n_units, n_fires = len(unit_keys), len(fire_ids)
+        if n_units == 0 or n_fires == 0:
+            self.reset()
+            return np.full(n_units, -1, dtype=np.int64)
+
+        cost = cost_matrix(unit_lat, unit_lon, fire_lat, fire_lon, radius, intensity,
+                           self.speed_m_s, self.intensity_scale)
+        caps = fire_capacities(n_units, radius, intensity)
+
+        # Начальное назначение: прошлый очаг бойца, если он ещё открыт, иначе ближайший по стоимости
+        choice = cost.argmin(axis=1)
+        if self._targets:
+            index = {fid: j for j, fid in enumerate(fire_ids) if caps[j]}
+            prev = np.array([index.get(self._targets.get(key), -1) for key in unit_keys], dtype=np.int64)
+            choice = np.where(prev >= 0, prev, choice)
+        closed = caps == 0
+        if closed.any():
+            open_cost = np.where(closed[None, :], np.inf, cost)
+            choice = np.where(closed[choice], open_cost.argmin(axis=1), choice)
+            cost = np.where(closed[None, :], 1e18, cost)
+
+        choice = _min_cost_assignment(cost, caps, choice, self.max_iter)
+
+        self._targets = {key: fire_ids[j] for key, j in zip(unit_keys, choice.tolist())}
+        return choice
+
+    def assign(self, units_list, fires_list):
+        """Обёртка над solve для списков словарей из main.py: очаг (или None) для каждого бойца."""
+
+        active = [f for f in fires_list if f["active"]]
+        targets = self.solve(
+            [u["name"] for u in units_list],
+            np.array([u["lat"] for u in units_list], dtype=float),
+            np.array([u["lon"] for u in units_list], dtype=float),
+            [f["id"] for f in active],
+            np.array([f["lat"] for f in active], dtype=float),
+            np.array([f["lon"] for f in active], dtype=float),
+            np.array([f["radius"] for f in active], dtype=float),
+            np.array([f["intensity"] for f in active], dtype=float),
+        )
+        return [active[j] if j >= 0 else None for j in targets.tolist()]
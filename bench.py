@@ -0,0 +1,298 @@
+# bench.py — Замеры горячих путей симуляции и ML, сравнение с сохранённым базовым прогоном
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "FireTacticsSystem", "data"))
+
+DEFAULT_SIZES = "30,100"
+DEFAULT_THRESHOLD = 0.10  # медиана (или пик памяти) хуже базовой больше чем на 10% — регрессия
+BENCHMARKS = {}           # имя -> (подготовка(size, seed) -> функция без аргументов, смысл size)
+
+
+def benchmark(name, size_means):
+    """Регистрирует замер: подготовка не входит во время, функция вызывается на свежем состоянии."""
+
+    def register(setup):
+        BENCHMARKS[name] = (setup, size_means)
+        return setup
+    return register
+
+
+# ===== Сценарии =====
+def _sim_engine(size, seed, fire_share=0.02, wall_share=0.05):
+    from simulation import SimulationEngine, CellState
+
+    rng = np.random.default_rng(seed)
+    sim = SimulationEngine(size, size, seed)
+    cells = rng.random((size, size))
+    sim.grid[cells < wall_share] = CellState.WALL.value
+    # Очаг — квадрат в центре площадью fire_share от карты
+    half = max(1, int(size * fire_share ** 0.5) // 2)
+    mid = size // 2
+    sim.grid[mid - half:mid + half, mid - half:mid + half] = CellState.FIRE.value
+    sim.grid[0, 0] = sim.grid[size - 1, size - 1] = CellState.NORMAL.value
+    free = np.argwhere(sim.grid == CellState.NORMAL.value)
+    for r, c in free[rng.choice(len(free), size=max(3, size // 10), replace=False)]:
+        sim.add_agent(int(r), int(c))
+    sim.active = True
+    return sim
+
+
+@benchmark("SimulationEngine.step", "сторона сетки")
+def bench_sim_step(size, seed):
+    sim = _sim_engine(size, seed)
+    return sim.step
+
+
+@benchmark("SimulationEngine.find_path_astar", "сторона сетки")
+def bench_astar(size, seed):
+    sim = _sim_engine(size, seed)
+    return lambda: sim.find_path_astar((0, 0), (size - 1, size - 1))
+
+
+@benchmark("SimulationEngine.get_optimal_strategy", "сторона сетки")
+def bench_strategy(size, seed):
+    return _sim_engine(size, seed).get_optimal_strategy
+
+
+@benchmark("SimulationEngine.predict_future_grid", "сторона сетки")
+def bench_forecast(size, seed):
+    sim = _sim_engine(size, seed)
+    return lambda: sim.predict_future_grid(steps=15)
+
+
+def _app_state(size, seed, n_units=10):
+    random.seed(seed)
+    grid = [[0] * size for _ in range(size)]
+    for _ in range(max(1, size * size // 50)):
+        grid[random.randrange(size)][random.randrange(size)] = random.randint(10, 100)
+    units = [{'id': i, 'squad': 'Альфа', 'x': random.randrange(size), 'y': random.randrange(size),
+              'temp': 36.6, 'pulse': 70, 'action': 'wait', 'status': 'OK'} for i in range(n_units)]
+    return grid, units
+
+
+@benchmark("app.spread_fire", "сторона сетки")
+def bench_app_fire(size, seed):
+    import app
+    grid, _ = _app_state(size, seed)
+    return lambda: app.spread_fire(grid, size)
+
+
+@benchmark("app.update_firefighters", "сторона сетки")
+def bench_app_units(size, seed):
+    import app
+    grid, units = _app_state(size, seed)
+    return lambda: app.update_firefighters(grid, units, "00:00:00", size)
+
+
+def _main_state(size, seed):
+    import main
+
+    random.seed(seed)
+    fires = [{"id": i, "name": f"Очаг {i}", "active": True, "radius": 60.0, "intensity": 90.0,
+              "spread_rate": 0.9, "decay_rate": 0.05,
+              "lat": main.center_lat + random.uniform(-0.003, 0.003),
+              "lon": main.center_lon + random.uniform(-0.003, 0.003)} for i in range(1, max(1, size // 5) + 1)]
+    units = [{"name": f"Боец {i}", "temp": 22.0, "pulse": 75.0, "moving": True, "status": "на выезде",
+              "target_fire": None,
+              "lat": main.center_lat + random.uniform(-0.005, 0.005),
+              "lon": main.center_lon + random.uniform(-0.005, 0.005)} for i in range(size)]
+    main.update_units(units, fires)  # назначить цели, чтобы update_fires видел работающих бойцов
+    return main, fires, units
+
+
+@benchmark("main.update_fires", "число бойцов (очагов в 5 раз меньше)")
+def bench_main_fires(size, seed):
+    main, fires, units = _main_state(size, seed)
+    return lambda: main.update_fires(fires, units)
+
+
+@benchmark("main.update_units", "число бойцов (очагов в 5 раз меньше)")
+def bench_main_units(size, seed):
+    main, fires, units = _main_state(size, seed)
+    return lambda: main.update_units(units, fires)
+
+
+_trained = {}
+
+
+def _trained_ml(seed):
+    # Обучение дорогое и в замер не входит: одна модель на сид на весь прогон
+    if seed not in _trained:
+        import synthetic
+        from ml_module import MLModule, SYNTHETIC_ROWS
+
+        directory = tempfile.mkdtemp(prefix="bench_ml_")
+        data_path = os.path.join(directory, "fires.csv")
+        synthetic.write_csv(data_path, SYNTHETIC_ROWS, seed=seed)
+        ml = MLModule(data_path=data_path)
+        ml.train()
+        _trained[seed] = ml
+    return _trained[seed]
+
+
+@benchmark("MLModule.predict", "число вызовов")
+def bench_ml_predict(size, seed):
+    import synthetic
+
+    ml = _trained_ml(seed)
+    rng = np.random.default_rng(seed)
+    queries = list(zip(rng.integers(*synthetic.AREA_RANGE, size).tolist(),
+                       rng.integers(*synthetic.UNITS_RANGE, size).tolist(),
+                       rng.integers(*synthetic.INTENSITY_RANGE, size).tolist()))
+
+    def run():
+        for q in queries:
+            ml.predict(*q)
+    return run
+
+
+# ===== Замер =====
+def measure(name, size, seed=0, repeat=5, warmup=1):
+    """Время (каждый повтор на свежем состоянии, без сборщика мусора) и пик памяти Python отдельным прогоном."""
+
+    setup, _ = BENCHMARKS[name]
+    for _ in range(warmup):
+        setup(size, seed)()
+
+    timings = []
+    for _ in range(repeat):
+        fn = setup(size, seed)
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    # tracemalloc замедляет выполнение, поэтому память меряется вне замеров времени
+    fn = setup(size, seed)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name, "size": size, "seed": seed, "repeat": repeat, "warmup": warmup,
+        "min_s": min(timings), "median_s": statistics.median(timings), "mean_s": statistics.fmean(timings),
+        "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_all(names=None, sizes=(30, 100), seed=0, repeat=5, warmup=1):
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Неизвестные замеры: {', '.join(sorted(unknown))}")
+    results = []
+    for name in names:
+        for size in sizes:
+            row = measure(name, size, seed=seed, repeat=repeat, warmup=warmup)
+            print(f"{name:40s} size={size:<6d} median={row['median_s'] * 1000:10.3f} мс  "
+                  f"peak={row['peak_kb']:10.1f} КБ")
+            results.append(row)
+    return {
+        "meta": {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                 "numpy": np.__version__, "platform": platform.platform(), "cpu_count": os.cpu_count(),
+                 "seed": seed, "repeat": repeat, "warmup": warmup},
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Сравнивает замеры с базовыми по (имя, size): медиана времени и пик памяти.
+    Возвращает строки сравнения; status == "regression", если хуже порога.
+    """
+
+    base = {(r["name"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for r in report["results"]:
+        b = base.get((r["name"], r["size"]))
+        if b is None:
+            rows.append({"name": r["name"], "size": r["size"], "status": "new"})
+            continue
+        time_ratio = r["median_s"] / b["median_s"] if b["median_s"] > 0 else 1.0
+        mem_ratio = r["peak_kb"] / b["peak_kb"] if b["peak_kb"] > 0 else 1.0
+        if time_ratio > 1 + threshold or mem_ratio > 1 + threshold:
+            status = "regression"
+        elif time_ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"name": r["name"], "size": r["size"], "status": status,
+                     "time_ratio": round(time_ratio, 3), "memory_ratio": round(mem_ratio, 3)})
+    return rows
+
+
+def print_comparison(rows):
+    for row in rows:
+        if row["status"] == "new":
+            print(f"{row['name']:40s} size={row['size']:<6d} нет в базовом прогоне")
+        else:
+            flag = "  <-- РЕГРЕССИЯ" if row["status"] == "regression" else ""
+            print(f"{row['name']:40s} size={row['size']:<6d} время x{row['time_ratio']:<7.3f} "
+                  f"память x{row['memory_ratio']:<7.3f} {row['status']}{flag}")
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности симуляции и ML")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_run = sub.add_parser("run", help="выполнить замеры и сохранить JSON")
+    p_run.add_argument("-b", "--bench", action="append", help="имя замера (можно несколько), по умолчанию все")
+    p_run.add_argument("--sizes", default=DEFAULT_SIZES)
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--repeat", type=int, default=5)
+    p_run.add_argument("--warmup", type=int, default=1)
+    p_run.add_argument("-o", "--output", default="bench_results.json")
+    p_run.add_argument("--baseline", default=None, help="сравнить с сохранённым прогоном")
+    p_cmp = sub.add_parser("compare", help="сравнить два сохранённых прогона")
+    p_cmp.add_argument("results")
+    p_cmp.add_argument("baseline")
+    for p in (p_run, p_cmp):
+        p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    sub.add_parser("list", help="список замеров")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, (_, size_means) in BENCHMARKS.items():
+            print(f"{name:40s} size = {size_means}")
+        sys.exit(0)
+
+    if args.command == "run":
+        report = run_all(args.bench, [int(s) for s in args.sizes.split(",")], seed=args.seed,
+                         repeat=args.repeat, warmup=args.warmup)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты: {args.output}")
+        baseline = _load(args.baseline) if args.baseline else None
+    else:
+        report, baseline = _load(args.results), _load(args.baseline)
+
+    if baseline is not None:
+        rows = compare(report, baseline, args.threshold)
+        print_comparison(rows)
+        if any(row["status"] == "regression" for row in rows):
+            sys.exit(1)
@@ -0,0 +1,271 @@
+# forest_export.py — Компактный массивный формат лесов sklearn и быстрый вычислитель без sklearn
+
+import json
+import os
+
+import numpy as np
+
+prange = range  # заменяется на numba.prange в _get_kernels
+
+FOREST_FORMAT = 1
+META_FILE = "forest.json"
+ARRAYS = ("feature", "threshold", "left", "right", "missing_left", "value", "roots")
+BLOCK_ROWS = 8192  # строк за проход в NumPy-варианте (ограничивает память под индексы узлов)
+KERNEL_BLOCK = 16384  # строк на блок в скомпилированном обходе
+
+
+def _predict_kernel(X, feature, threshold, left, right, missing_left, roots, value, out):
+    # Строки идут блоками, внутри блока — дерево за деревом: узлы одного дерева остаются в кэше,
+    # а для каждой строки деревья суммируются в том же порядке, что у sklearn
+    n_rows = X.shape[0]
+    for b in prange((n_rows + KERNEL_BLOCK - 1) // KERNEL_BLOCK):
+        start = b * KERNEL_BLOCK
+        stop = min(start + KERNEL_BLOCK, n_rows)
+        for t in range(roots.shape[0]):
+            for i in range(start, stop):
+                node = roots[t]
+                while left[node] != node:
+                    x = X[i, feature[node]]
+                    if x <= threshold[node] or (x != x and missing_left[node]):
+                        node = left[node]
+                    else:
+                        node = right[node]
+                for k in range(value.shape[1]):
+                    out[i, k] += value[node, k]
+
+
+_kernels = None
+
+
+def _get_kernels():
+    """
+    Если установлен numba, обход деревьев компилируется; без него работает векторизованный NumPy.
+    numba подключается при первом предсказании, а не при импорте: открытие леса остаётся дешёвым.
+    """
+
+    global _kernels, prange
+    if _kernels is None:
+        try:
+            import numba
+        except ImportError:
+            _kernels = ()
+        else:
+            prange = numba.prange
+            # Лес предсказывает и из фоновых потоков (обучение в ml_module): после параллельного запуска
+            # не из главного потока слой TBB не даёт процессу завершиться, поэтому первым пробуем OpenMP
+            if "NUMBA_THREADING_LAYER" not in os.environ and "NUMBA_THREADING_LAYER_PRIORITY" not in os.environ:
+                numba.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+            _kernels = (numba.njit(cache=True)(_predict_kernel),
+                        numba.njit(parallel=True, cache=True)(_predict_kernel))
+    return _kernels
+
+
+class CompiledForest:
+    """
+    Лес в виде плоских массивов узлов всех деревьев подряд: признак, порог, потомки, значения листьев.
+    Листья ссылаются сами на себя, поэтому обход — фиксированное число шагов без ветвлений.
+    Сравнение и порядок суммирования по деревьям те же, что в sklearn, — результат совпадает бит в бит.
+    """
+
+    def __init__(self, arrays, meta):
+        self.arrays = {name: np.asarray(arrays[name]) for name in ARRAYS}
+        self.meta = meta
+        self.kind = meta["kind"]
+        self.n_features_in_ = meta["n_features"]
+        self.n_estimators = len(self.arrays["roots"])
+        self.max_depth = meta["max_depth"]
+        if self.kind == "classifier":
+            self.classes_ = np.asarray(meta["classes"])
+        self.n_jobs = None  # как у sklearn: 1 — в одном потоке, иначе на всех ядрах (если есть numba)
+        self.parallel_min_rows = 2000
+
+    def _sum_numpy(self, X, out):
+        a = self.arrays
+        feature, threshold, left, right = a["feature"], a["threshold"], a["left"], a["right"]
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            rows = np.arange(len(block))[:, None]
+            idx = np.broadcast_to(a["roots"], (len(block), self.n_estimators)).copy()
+            has_nan = np.isnan(block).any()
+            for _ in range(self.max_depth):
+                x = block[rows, feature[idx]]
+                go_left = x <= threshold[idx]
+                if has_nan:
+                    go_left |= np.isnan(x) & a["missing_left"][idx]
+                idx = np.where(go_left, left[idx], right[idx])
+            leaf_values = a["value"][idx]
+            acc = out[start:start + BLOCK_ROWS]
+            for t in range(self.n_estimators):
+                acc += leaf_values[:, t]
+
+    def _average(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Ожидается матрица (n, {self.n_features_in_}), получено {X.shape}")
+
+        out = np.zeros((len(X), self.arrays["value"].shape[1]), dtype=np.float64)
+        kernels = _get_kernels()
+        if kernels:
+            parallel = self.n_jobs != 1 and len(X) >= self.parallel_min_rows
+            kernel = kernels[1] if parallel else kernels[0]
+            a = self.arrays
+            kernel(X, a["feature"], a["threshold"], a["left"], a["right"], a["missing_left"],
+                   a["roots"], a["value"], out)
+        else:
+            self._sum_numpy(X, out)
+        out /= self.n_estimators
+        return out
+
+    def predict_proba(self, X):
+        if self.kind != "classifier":
+            raise AttributeError("predict_proba есть только у классификатора")
+        return self._average(X)
+
+    def predict(self, X):
+        out = self._average(X)
+        if self.kind == "classifier":
+            return self.classes_[out.argmax(axis=1)]
+        return out[:, 0] if out.shape[1] == 1 else out
+
+    def save(self, directory):
+        """Пишет массивы в directory/*.npy (открываются через memmap) и описание в forest.json."""
+
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), self.arrays[name])
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        return directory
+
+
+def compile_forest(model):
+    """Переводит обученный RandomForestClassifier/Regressor в CompiledForest."""
+
+    trees = [est.tree_ for est in model.estimators_]
+    is_classifier = hasattr(model, "classes_")
+    if is_classifier and model.n_outputs_ != 1:
+        raise ValueError("Поддерживаются только классификаторы с одним выходом")
+
+    counts = np.array([t.node_count for t in trees], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    if offsets[-1] >= np.iinfo(np.int32).max:
+        raise ValueError("Слишком много узлов для int32-индексов: ограничьте глубину деревьев")
+
+    feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+    for tree, offset in zip(trees, offsets[:-1]):
+        own = np.arange(tree.node_count, dtype=np.int64) + offset
+        leaf = tree.children_left == -1
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, np.inf, tree.threshold))
+        left.append(np.where(leaf, own, tree.children_left + offset))
+        right.append(np.where(leaf, own, tree.children_right + offset))
+        missing = getattr(tree, "missing_go_to_left", None)
+        missing_left.append(np.zeros(tree.node_count, dtype=bool) if missing is None else missing.astype(bool))
+        if is_classifier:
+            # Как DecisionTreeClassifier.predict_proba: нормировка значений узла на их сумму
+            v = tree.value[:, 0, :].astype(np.float64)
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0.0] = 1.0
+            value.append(v / norm)
+        else:
+            value.append(tree.value[:, :, 0].astype(np.float64))
+
+    arrays = {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "missing_left": np.concatenate(missing_left),
+        "value": np.ascontiguousarray(np.concatenate(value)),
+        "roots": offsets[:-1].astype(np.int32),
+    }
+    meta = {
+        "format": FOREST_FORMAT,
+        "kind": "classifier" if is_classifier else "regressor",
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max(t.max_depth for t in trees)),
+        "n_nodes": int(offsets[-1]),
+    }
+    if is_classifier:
+        meta["classes"] = model.classes_.tolist()
+    return CompiledForest(arrays, meta)
+
+
+def load_forest(directory, mmap_mode="r"):
+    """Открывает лес, сохранённый CompiledForest.save (по умолчанию без чтения массивов в память)."""
+
+    with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FOREST_FORMAT:
+        raise ValueError(f"Несовместимая версия формата леса: {meta.get('format')}")
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+    return CompiledForest(arrays, meta)
+
+
+def _last_trees(forest, n_trees):
+    """Последние n_trees деревьев леса (деревья лежат подряд, узлы перенумеровываются с нуля)."""
+
+    a = forest.arrays
+    first = len(a["roots"]) - n_trees
+    if first <= 0:
+        return {name: np.asarray(a[name]) for name in ARRAYS}
+    offset = int(a["roots"][first])
+    out = {name: np.asarray(a[name][offset:]) for name in ("feature", "threshold", "missing_left", "value")}
+    out["left"] = a["left"][offset:] - offset
+    out["right"] = a["right"][offset:] - offset
+    out["roots"] = a["roots"][first:] - offset
+    return out
+
+
+def merge_forests(forests, max_trees=None):
+    """
+    Объединяет леса в один (среднее по всем деревьям, как у одного большого леса).
+    max_trees — оставить только последние деревья: старые вытесняются новыми.
+    Классы классификаторов выравниваются по объединению (лес, не видевший класс, даёт ему 0).
+    """
+
+    forests = [f for f in forests if f is not None]
+    kinds = {f.kind for f in forests}
+    if len(kinds) != 1 or len({f.n_features_in_ for f in forests}) != 1:
+        raise ValueError("Объединять можно только леса одного типа с одинаковыми признаками")
+    kind = kinds.pop()
+
+    if kind == "classifier":
+        classes = np.unique(np.concatenate([f.classes_ for f in forests]))
+    keep = [f.n_estimators for f in forests]
+    if max_trees is not None:
+        # Вытеснение с самых старых лесов
+        excess = sum(keep) - max_trees
+        for i in range(len(keep)):
+            drop = min(max(excess, 0), keep[i])
+            keep[i] -= drop
+            excess -= drop
+
+    parts = []
+    offset = 0
+    for forest, n in zip(forests, keep):
+        if n == 0:
+            continue
+        part = _last_trees(forest, n)
+        if kind == "classifier":
+            value = np.zeros((len(part["value"]), len(classes)), dtype=np.float64)
+            value[:, np.searchsorted(classes, forest.classes_)] = part["value"]
+            part["value"] = value
+        for name in ("left", "right", "roots"):
+            part[name] = (part[name] + offset).astype(np.int32)
+        offset += len(part["feature"])
+        parts.append(part)
+    if offset >= np.iinfo(np.int32).max:
+        raise ValueError("Слишком много узлов для int32-индексов: уменьшите max_trees")
+
+    arrays = {name: np.concatenate([p[name] for p in parts]) for name in ARRAYS}
+    meta = {
+        "format": FOREST_FORMAT,
+        "kind": kind,
+        "n_features": forests[0].n_features_in_,
+        "max_depth": max(f.max_depth for f, n in zip(forests, keep) if n > 0),
+        "n_nodes": int(offset),
+    }
+    if kind == "classifier":
+        meta["classes"] = classes.tolist()
+    return CompiledForest(arrays, meta)
@@ -0,0 +1,140 @@
+# ingest.py — Потоковая загрузка fdny_incidents.csv в кэш признаков Parquet
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SOURCE_CSV = "fdny_incidents.csv"
+STORE_DIR = "feature_store"
+CHUNK_ROWS = 500_000
+DATETIME_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+# Колонки исходного файла (в нижнем регистре) -> имя в хранилище
+RENAME = {
+    'incident_date_time': 'incident_time',
+    'arrival_date_time': 'arrival_time',
+    'borough_desc': 'borough',
+    'incident_type_desc': 'incident_type',
+    'units_onscene': 'units',
+    'total_incident_duration': 'duration_sec',
+}
+DTYPES = {
+    'incident_date_time': 'string',
+    'arrival_date_time': 'string',
+    'borough_desc': 'category',
+    'incident_type_desc': 'category',
+    'units_onscene': 'float32',
+    'total_incident_duration': 'float64',
+}
+SCHEMA = pa.schema([
+    ('incident_time', pa.timestamp('s')),
+    ('arrival_time', pa.timestamp('s')),
+    ('borough', pa.dictionary(pa.int32(), pa.string())),
+    ('incident_type', pa.dictionary(pa.int32(), pa.string())),
+    ('units', pa.float32()),
+    ('duration_sec', pa.float64()),
+    ('response_time', pa.float64()),
+    ('month', pa.int8()),
+    ('hour', pa.int8()),
+    ('is_night', pa.int8()),
+    ('year', pa.int16()),
+])
+
+
+def file_hash(path, block_size=1 << 20, store_dir=STORE_DIR):
+    """SHA-1 содержимого файла. Результат кэшируется по (размер, mtime), чтобы не читать файл повторно."""
+
+    stat = os.stat(path)
+    cache_path = os.path.join(store_dir, "hashes.json")
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    if key in cache:
+        return cache[key]
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    os.makedirs(store_dir, exist_ok=True)
+    cache[key] = digest
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    return digest
+
+
+def _prepare_chunk(chunk):
+    """Типизация и производные признаки одного чанка (всё векторизованно)."""
+
+    chunk.columns = chunk.columns.str.lower()
+    chunk = chunk.rename(columns=RENAME)
+    for col in ['incident_time', 'arrival_time']:
+        chunk[col] = pd.to_datetime(chunk[col], format=DATETIME_FORMAT, errors='coerce').astype('datetime64[s]')
+    chunk['response_time'] = (chunk['arrival_time'] - chunk['incident_time']).dt.total_seconds()
+
+    hour = chunk['incident_time'].dt.hour
+    chunk['month'] = chunk['incident_time'].dt.month.fillna(0).astype('int8')
+    chunk['hour'] = hour.fillna(0).astype('int8')
+    chunk['is_night'] = np.where((hour < 6) | (hour >= 22), 1, 0).astype('int8')
+    chunk['year'] = chunk['incident_time'].dt.year.fillna(0).astype('int16')
+    for col in ['borough', 'incident_type']:
+        chunk[col] = chunk[col].astype(str).astype('category')
+    return chunk[SCHEMA.names]
+
+
+def build_feature_store(csv_path=SOURCE_CSV, store_dir=STORE_DIR, chunk_rows=CHUNK_ROWS):
+    """
+    Читает CSV чанками (только нужные колонки, явные типы) и пишет Parquet,
+    разбитый по годам, в store_dir/<sha1 файла>/. Возвращает путь к набору.
+    """
+
+    digest = file_hash(csv_path, store_dir=store_dir)
+    target = os.path.join(store_dir, digest)
+    if os.path.exists(os.path.join(target, "_SUCCESS")):
+        return target
+
+    # Имена колонок в файле могут быть в любом регистре
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [c for c in header if c.lower() in DTYPES]
+    dtypes = {c: DTYPES[c.lower()] for c in usecols}
+
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    rows = 0
+    reader = pd.read_csv(csv_path, usecols=usecols, dtype=dtypes, chunksize=chunk_rows)
+    for i, chunk in enumerate(reader):
+        table = pa.Table.from_pandas(_prepare_chunk(chunk), schema=SCHEMA, preserve_index=False)
+        pq.write_to_dataset(table, tmp, partition_cols=['year'],
+                            basename_template=f"part-{i:05d}-{{i}}.parquet")
+        rows += len(chunk)
+        print(f"Обработано строк: {rows}", end="\r")
+    print()
+
+    with open(os.path.join(tmp, "_SUCCESS"), "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(csv_path), "sha1": digest, "rows": rows}, f)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return target
+
+
+def load_features(csv_path=SOURCE_CSV, columns=None, store_dir=STORE_DIR):
+    """Загружает признаки из кэша (строит его при первом обращении или смене файла)."""
+
+    path = build_feature_store(csv_path, store_dir)
+    df = pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+    if 'year' in df.columns and df['year'].dtype.name == 'category':
+        df['year'] = df['year'].astype('int16')
+    return df
+
+
+if __name__ == "__main__":
+    print(f"Кэш признаков: {build_feature_store()}")
@@ -0,0 +1,357 @@
+# kpi.py — KPI выездов по файлам формата fires.csv / fire.txt (ранг, подразделения, время этапов)
+
+import argparse
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # без pyarrow блоки разбираются через pandas (в разы медленнее)
+    pa = None
+
+STORE_DIR = "kpi_store"
+BLOCK_BYTES = 8 << 20     # файл читается блоками целых строк
+HIST_MAX_MIN = 1440       # до суток гистограмма длительностей по минутам, дальше — логарифмическая
+LOG_BINS_PER_DOUBLING = 32  # интервалов на удвоение после суток (ширина ~2.2% значения)
+LOG_DOUBLINGS = 10          # логарифмические интервалы покрывают до 1024 суток
+# Начала интервалов гистограммы; последний интервал — «больше покрытого диапазона»
+HIST_EDGES = np.concatenate([
+    np.arange(HIST_MAX_MIN, dtype=np.float64),
+    HIST_MAX_MIN * 2.0 ** (np.arange(LOG_DOUBLINGS * LOG_BINS_PER_DOUBLING + 1) / LOG_BINS_PER_DOUBLING),
+])
+N_BINS = len(HIST_EDGES)
+# Значение квантиля в интервале: начало минутного, середина (геометрическая) логарифмического
+HIST_VALUES = HIST_EDGES.copy()
+HIST_VALUES[HIST_MAX_MIN:-1] = np.sqrt(HIST_EDGES[HIST_MAX_MIN:-1] * HIST_EDGES[HIST_MAX_MIN + 1:])
+HEAD_BYTES = 4096         # по началу файла видно, что его переписали, а не дописали
+
+# Заголовок файла -> имя колонки
+HEADER = {
+    'id_пожара': 'id',
+    'ранг_пожара': 'rank',
+    'кол_подразделений': 'units',
+    'время_выезда': 'dispatch',
+    'время_прибытия': 'arrival',
+    'время_локализации': 'localization',
+    'время_ликвидации': 'liquidation',
+}
+TIME_COLUMNS = ['dispatch', 'arrival', 'localization', 'liquidation']
+# Длительности (минуты): имя -> (начало, конец)
+METRICS = {
+    'response_min': ('dispatch', 'arrival'),          # выезд -> прибытие
+    'localization_min': ('arrival', 'localization'),  # прибытие -> локализация
+    'liquidation_min': ('localization', 'liquidation'),
+    'total_min': ('dispatch', 'liquidation'),
+}
+DIMENSIONS = ['rank', 'units', 'hour', 'year']
+MISSING = -1  # ключ срезов для пустых и неразборчивых значений
+
+
+def parse_header(line):
+    """Имена колонок по строке заголовка (порядок колонок в файле любой)."""
+
+    names = [h.strip().lstrip('\ufeff').lower() for h in line.split(',')]
+    missing = [h for h in HEADER if h not in names]
+    if missing:
+        raise ValueError(f"В заголовке нет колонок: {', '.join(missing)}")
+    return [HEADER.get(h, h) for h in names]
+
+
+COLUMN_TYPES = {'id': np.int64, 'rank': np.int16, 'units': np.int16}
+
+
+def _typed(frame):
+    """Колонки блока в типизированные массивы: id int64, ранг и подразделения int16, время datetime64[s]."""
+
+    cols = {}
+    for name, dtype in COLUMN_TYPES.items():
+        values = pd.to_numeric(frame[name], errors='coerce')
+        cols[name] = values.fillna(MISSING).to_numpy(dtype=dtype)
+    for name in TIME_COLUMNS:
+        cols[name] = pd.to_datetime(frame[name], format='ISO8601', errors='coerce').to_numpy(dtype='datetime64[s]')
+    return cols
+
+
+def _parse_block(data, names):
+    """Блок целых строк в колонки. Быстрый путь — pyarrow; блок с неразборчивыми значениями — через pandas."""
+
+    if pa is not None:
+        types = {name: pa.from_numpy_dtype(dtype) for name, dtype in COLUMN_TYPES.items()}
+        types.update(dict.fromkeys(TIME_COLUMNS, pa.timestamp('s')))
+        try:
+            table = pa_csv.read_csv(
+                io.BytesIO(data),
+                read_options=pa_csv.ReadOptions(column_names=names),
+                convert_options=pa_csv.ConvertOptions(column_types=types, include_columns=list(types),
+                                                      timestamp_parsers=[pa_csv.ISO8601, '%Y-%m-%d %H:%M'],
+                                                      strings_can_be_null=True))
+        except pa.ArrowInvalid:
+            pass
+        else:
+            cols = {name: pc.fill_null(table[name], MISSING).to_numpy() for name in COLUMN_TYPES}
+            cols.update({name: table[name].to_numpy(zero_copy_only=False) for name in TIME_COLUMNS})
+            return cols
+    frame = pd.read_csv(io.BytesIO(data), header=None, names=names, dtype=dict.fromkeys(TIME_COLUMNS, str))
+    return _typed(frame)
+
+
+def read_incidents(path, offset=0, names=None, block_bytes=BLOCK_BYTES):
+    """
+    Потоковое чтение файла с байта offset: выдаёт (колонки, байт после блока) по блокам целых строк.
+    С offset=0 имена колонок берутся из заголовка, иначе их нужно передать (names).
+    Недописанная последняя строка (без перевода строки) не читается.
+    """
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        if offset == 0:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                return
+            names = parse_header(line.decode("utf-8-sig"))
+            offset = f.tell()
+        tail = b""
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                return
+            data = tail + block
+            cut = data.rfind(b"\n") + 1
+            data, tail = data[:cut], data[cut:]
+            if not data.strip():
+                offset += len(data)
+                continue
+            offset += len(data)
+            yield _parse_block(data, names), offset
+
+
+def durations(cols):
+    """Длительности этапов в минутах (float64); пропуск или конец раньше начала — NaN."""
+
+    out = {}
+    for metric, (start, end) in METRICS.items():
+        delta = (cols[end] - cols[start]).astype('timedelta64[s]').astype(np.float64) / 60.0
+        delta[np.isnat(cols[start]) | np.isnat(cols[end]) | (delta < 0)] = np.nan
+        out[metric] = delta
+    return out
+
+
+def keys(cols):
+    """Ключи срезов строк: ранг, число подразделений, час и год выезда."""
+
+    dispatch = cols['dispatch']
+    known = ~np.isnat(dispatch)
+    hour = np.full(len(dispatch), MISSING, dtype=np.int64)
+    year = np.full(len(dispatch), MISSING, dtype=np.int64)
+    hour[known] = (dispatch[known].astype('datetime64[h]') - dispatch[known].astype('datetime64[D]')).astype(np.int64)
+    year[known] = dispatch[known].astype('datetime64[Y]').astype(np.int64) + 1970
+    return {'rank': cols['rank'].astype(np.int64), 'units': cols['units'].astype(np.int64), 'hour': hour, 'year': year}
+
+
+class _Slice:
+    """Агрегаты одного среза: по ключу и метрике — число, сумма, сумма квадратов, мин, макс, гистограмма (HIST_EDGES)."""
+
+    def __init__(self, n_metrics):
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros((0, n_metrics), dtype=np.int64)
+        self.sum = np.zeros((0, n_metrics))
+        self.sumsq = np.zeros((0, n_metrics))
+        self.min = np.zeros((0, n_metrics))
+        self.max = np.zeros((0, n_metrics))
+        self.hist = np.zeros((0, n_metrics, N_BINS), dtype=np.int64)
+        self._index = {}
+
+    def _positions(self, values):
+        uniq, inverse = np.unique(values, return_inverse=True)
+        new = [int(k) for k in uniq if int(k) not in self._index]
+        if new:
+            n = len(new)
+            for k in new:
+                self._index[k] = len(self._index)
+            self.keys = np.concatenate([self.keys, np.array(new, dtype=np.int64)])
+            for name, fill in (('count', 0), ('sum', 0.0), ('sumsq', 0.0), ('min', np.inf), ('max', -np.inf), ('hist', 0)):
+                old = getattr(self, name)
+                setattr(self, name, np.concatenate([old, np.full((n,) + old.shape[1:], fill, dtype=old.dtype)]))
+        lookup = np.array([self._index[int(k)] for k in uniq], dtype=np.int64)
+        return lookup[inverse.reshape(-1)]
+
+    def update(self, values, metrics):
+        pos = self._positions(values)
+        n_keys, n_bins = len(self.keys), N_BINS
+        for m, x in enumerate(metrics):
+            ok = ~np.isnan(x)
+            p, x = pos[ok], x[ok]
+            self.count[:, m] += np.bincount(p, minlength=n_keys)
+            self.sum[:, m] += np.bincount(p, weights=x, minlength=n_keys)
+            self.sumsq[:, m] += np.bincount(p, weights=x * x, minlength=n_keys)
+            np.minimum.at(self.min[:, m], p, x)
+            np.maximum.at(self.max[:, m], p, x)
+            bins = np.searchsorted(HIST_EDGES, x, side='right') - 1
+            self.hist[:, m, :] += np.bincount(p * n_bins + bins, minlength=n_keys * n_bins).reshape(n_keys, n_bins)
+
+    def state(self, prefix):
+        return {f"{prefix}.{name}": getattr(self, name) for name in ('keys', 'count', 'sum', 'sumsq', 'min', 'max', 'hist')}
+
+    def load(self, state, prefix):
+        for name in ('keys', 'count', 'sum', 'sumsq', 'min', 'max', 'hist'):
+            setattr(self, name, state[f"{prefix}.{name}"])
+        self._index = {int(k): i for i, k in enumerate(self.keys)}
+
+
+class KPIRollup:
+    """
+    Предагрегированные KPI по срезам (ранг, подразделения, час, год выезда) и по всем строкам.
+    update() добавляет блок строк за O(строк блока); запросы читают только агрегаты:
+    среднее, стандартное отклонение, мин/макс — точно, квантили — по гистограмме: с шагом в минуту
+    до суток и с шагом ~2.2% дальше.
+    """
+
+    def __init__(self):
+        self.metrics = list(METRICS)
+        self.rows = 0
+        self.slices = {dim: _Slice(len(self.metrics)) for dim in DIMENSIONS + ['all']}
+
+    def update(self, cols):
+        n = len(cols['id'])
+        if n == 0:
+            return
+        values = durations(cols)
+        metrics = [values[m] for m in self.metrics]
+        dims = keys(cols)
+        dims['all'] = np.zeros(n, dtype=np.int64)
+        for dim, s in self.slices.items():
+            s.update(dims[dim], metrics)
+        self.rows += n
+
+    def summary(self, by=None, metric='response_min', quantiles=(0.5, 0.9)):
+        """Таблица KPI метрики по срезу by (None — по всем строкам), строки по возрастанию ключа."""
+
+        s = self.slices[by or 'all']
+        m = self.metrics.index(metric)
+        count = s.count[:, m]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = s.sum[:, m] / count
+            std = np.sqrt(np.maximum((s.sumsq[:, m] - s.sum[:, m] * mean) / (count - 1), 0.0))
+        table = pd.DataFrame({'count': count, 'mean': mean, 'std': std,
+                              'min': np.where(count > 0, s.min[:, m], np.nan),
+                              'max': np.where(count > 0, s.max[:, m], np.nan)},
+                             index=pd.Index(s.keys, name=by or 'all'))
+        for q in quantiles:
+            table[f"p{round(q * 100)}"] = self.quantile(by, metric, q, s=s)
+        return table.sort_index()
+
+    def quantile(self, by, metric, q, s=None):
+        """
+        Квантиль по каждому ключу среза из гистограммы (HIST_VALUES): до суток для целых минут точно,
+        дальше — с погрешностью до ~1.1%. За пределами гистограммы — NaN, а не максимум.
+        """
+
+        s = s or self.slices[by or 'all']
+        m = self.metrics.index(metric)
+        cum = np.cumsum(s.hist[:, m, :], axis=1)
+        total = cum[:, -1]
+        idx = np.argmax(cum >= np.maximum(np.ceil(q * total), 1)[:, None], axis=1)
+        value = np.clip(HIST_VALUES[idx], s.min[:, m], s.max[:, m])
+        return np.where((total > 0) & (idx < N_BINS - 1), value, np.nan)
+
+    def state(self):
+        out = {'rows': np.array(self.rows)}
+        for dim, s in self.slices.items():
+            out.update(s.state(dim))
+        return out
+
+    def load(self, state):
+        self.rows = int(state['rows'])
+        for dim, s in self.slices.items():
+            s.load(state, dim)
+        return self
+
+
+def _head_hash(path, length):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(min(length, HEAD_BYTES))).hexdigest()
+
+
+class IncidentKPI:
+    """
+    KPI по файлу выездов с сохранением агрегатов в store_dir. refresh() дочитывает только строки,
+    дописанные с прошлого раза (по сохранённому смещению); если файл переписан — строит агрегаты заново.
+    """
+
+    def __init__(self, path, store_dir=STORE_DIR):
+        self.path = path
+        key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        self.state_path = os.path.join(store_dir, f"{key}.npz")
+        self.meta_path = os.path.join(store_dir, f"{key}.json")
+        self.rollup = KPIRollup()
+        self.meta = {"source": os.path.abspath(path), "offset": 0, "names": None, "head_sha1": None}
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.state_path) and os.path.exists(self.meta_path)):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(self.state_path) as state:
+            if state['all.hist'].shape[-1] != N_BINS:
+                return  # агрегаты с другими интервалами гистограммы — строятся заново
+            self.rollup = KPIRollup().load(state)
+        self.meta = meta
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp.npz"
+        np.savez(tmp, **self.rollup.state())
+        os.replace(tmp, self.state_path)
+        with open(self.meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def refresh(self):
+        """Учитывает новые строки файла; возвращает их число."""
+
+        offset = self.meta["offset"]
+        size = os.path.getsize(self.path)
+        if offset and (size < offset or _head_hash(self.path, offset) != self.meta["head_sha1"]):
+            self.rollup = KPIRollup()
+            offset = 0
+        if offset == size:
+            return 0
+
+        before = self.rollup.rows
+        names = self.meta["names"] if offset else None
+        if offset == 0:
+            with open(self.path, "r", encoding="utf-8-sig") as f:
+                names = parse_header(f.readline())
+        for cols, offset in read_incidents(self.path, offset, names):
+            self.rollup.update(cols)
+        self.meta.update(offset=offset, names=names, head_sha1=_head_hash(self.path, offset))
+        self._save()
+        return self.rollup.rows - before
+
+    def summary(self, by=None, metric='response_min'):
+        self.refresh()
+        return self.rollup.summary(by, metric)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KPI выездов по файлу формата fires.csv")
+    parser.add_argument("path", nargs="?", default="fires.csv")
+    parser.add_argument("--by", choices=DIMENSIONS, default=None, help="срез (по умолчанию — все строки)")
+    parser.add_argument("--metric", choices=list(METRICS), default=None, help="метрика (по умолчанию — все)")
+    parser.add_argument("--store", default=STORE_DIR)
+    args = parser.parse_args()
+
+    kpi = IncidentKPI(args.path, args.store)
+    added = kpi.refresh()
+    print(f"Строк: {kpi.rollup.rows} (новых: {added})")
+    for metric in [args.metric] if args.metric else list(METRICS):
+        print(f"\n{metric}:")
+        print(kpi.rollup.summary(args.by, metric).round(1).to_string())
@@ -1,13 +1,18 @@
 import math
 import os
 import time
-import random
 import json
 import webbrowser
 
 import folium
 from folium import Element
 
+from alerts import MAIN_RULES, AlertEngine
+from assignment import AssignmentSolver
+from raster_fire import RasterFireModel, RasterTerrain
+from rngstreams import RandomStream
+from trajectory import TrajectoryRecorder
+
 # Попробуем подключить PyYAML для чтения YAML (если не установлен, скрипт продолжит без него)
 try:
     import yaml
@@ -30,6 +35,20 @@ else:
     # Координаты по умолчанию (например, центр Москвы)
     center_lat, center_lon = 55.751244, 37.618423
 
+# ===== Параметры модели (можно переопределить в конфиге, секция "params") =====
+DEFAULT_PARAMS = {
+    "speed_m_s": 1.2,             # средняя скорость движения
+    "engage_distance": 25.0,      # дистанция, с которой боец начинает тушение
+    "ambient_temp": 22.0,
+    "suppression_power": 1.2,     # базовая мощность тушения одного бойца
+    "intensity_suppression": 2.0, # коэффициент снижения интенсивности
+    "radius_suppression": 0.6,    # коэффициент уменьшения радиуса
+}
+PARAMS = {**DEFAULT_PARAMS, **(config.get("params") or {})}
+
+# Сид случайной расстановки ("seed" в конфиге; без него — новый при каждом запуске, пишется в траекторию)
+stream = RandomStream(config.get("seed"))
+
 def _degrees_to_meters(lat_diff, lon_diff, lat_origin):
     """Преобразует разницу широты/долготы в метры (приближённо)."""
 
@@ -54,13 +73,14 @@ def haversine_distance(lat1, lon1, lat2, lon2):
 
 
 # ===== Начальные сценарии пожара и бойцов =====
-def create_initial_fires():
+def create_initial_fires(rng=None):
+    rng = rng or stream
     fires_cfg = config.get("fires")
     fires_list = []
     if isinstance(fires_cfg, list) and fires_cfg:
         for i, f in enumerate(fires_cfg, start=1):
-            lat = f.get("lat", center_lat + random.uniform(-0.002, 0.002))
-            lon = f.get("lon", center_lon + random.uniform(-0.002, 0.002))
+            lat = f.get("lat", center_lat + rng.uniform(-0.002, 0.002))
+            lon = f.get("lon", center_lon + rng.uniform(-0.002, 0.002))
             fires_list.append({
                 "id": f.get("id", i),
                 "name": f.get("name", f"Очаг {i}"),
@@ -88,7 +108,8 @@ def create_initial_fires():
     return fires_list
 
 
-def create_initial_units():
+def create_initial_units(rng=None):
+    rng = rng or stream
     units_list = []
     if "firefighters" in config and isinstance(config["firefighters"], list):
         base_units = config["firefighters"]
@@ -97,8 +118,8 @@ def create_initial_units():
         for i in range(5):
             base_units.append({
                 "name": f"Боец {i+1}",
-                "lat": center_lat + random.uniform(-0.005, 0.005),
-                "lon": center_lon + random.uniform(-0.005, 0.005),
+                "lat": center_lat + rng.uniform(-0.005, 0.005),
+                "lon": center_lon + rng.uniform(-0.005, 0.005),
             })
 
     for i, unit in enumerate(base_units, start=1):
@@ -118,9 +139,6 @@ def create_initial_units():
     return units_list
 
 
-fires = create_initial_fires()
-units = create_initial_units()
-
 def choose_target_fire(unit, fires_list):
     """Назначает ближайший активный пожар в качестве цели."""
 
@@ -135,15 +153,23 @@ def choose_target_fire(unit, fires_list):
     return closest
 
 
-def update_fires(fires_list, units_list, dt_seconds=5):
-    """Распространение и ослабление очагов с учётом работы бойцов."""
+def update_fires(fires_list, units_list, dt_seconds=5, raster_model=None, params=None):
+    """
+    Распространение и ослабление очагов с учётом работы бойцов.
+    С raster_model (raster_fire.RasterFireModel) кромка растёт по ветру/горючему/рельефу,
+    а radius становится эквивалентным по площади.
+    """
 
+    p = params or PARAMS
     for fire in fires_list:
         if not fire["active"]:
             continue
 
         # Расширение радиуса от ветра/топлива
-        fire["radius"] += fire["spread_rate"] * dt_seconds
+        if raster_model is not None:
+            raster_model.advance(fire, dt_seconds)
+        else:
+            fire["radius"] += fire["spread_rate"] * dt_seconds
 
         # Снижение интенсивности от естественного выгорания
         fire["intensity"] = max(0.0, fire["intensity"] - fire["decay_rate"] * dt_seconds)
@@ -155,26 +181,45 @@ def update_fires(fires_list, units_list, dt_seconds=5):
             if distance <= fire["radius"] + 5:
                 # Чем ближе, тем сильнее влияние воды и пены
                 proximity_factor = max(0.5, (fire["radius"] - distance) / max(fire["radius"], 1))
-                suppression_power = 1.2 * proximity_factor
-                fire["intensity"] = max(0.0, fire["intensity"] - suppression_power * dt_seconds * 2)
-                fire["radius"] = max(10.0, fire["radius"] - suppression_power * dt_seconds * 0.6)
+                suppression_power = p["suppression_power"] * proximity_factor
+                fire["intensity"] = max(0.0, fire["intensity"] - suppression_power * dt_seconds * p["intensity_suppression"])
+                shrink = suppression_power * dt_seconds * p["radius_suppression"]
+                if raster_model is not None:
+                    raster_model.suppress(fire, max(0.0, min(shrink, fire["radius"] - 10.0)))
+                else:
+                    fire["radius"] = max(10.0, fire["radius"] - shrink)
 
         if fire["intensity"] <= 1.0:
             fire["active"] = False
             fire["radius"] = max(fire["radius"], 20.0)
+            if raster_model is not None:
+                raster_model.release(fire)
 
     return fires_list
 
 
-def update_units(units_list, fires_list, dt_seconds=5):
-    """Обновляет координаты и показатели бойцов исходя из симуляции пожара."""
+def update_units(units_list, fires_list, dt_seconds=5, assigner=None, params=None):
+    """
+    Обновляет координаты и показатели бойцов исходя из симуляции пожара.
+    Если передан assigner (assignment.AssignmentSolver), цели назначаются глобально,
+    иначе каждый боец едет к ближайшему очагу.
+    """
 
-    speed_m_s = 1.2  # средняя скорость движения
-    engage_distance = 25.0
-    ambient_temp = 22.0
+    p = params or PARAMS
+    speed_m_s = p["speed_m_s"]
+    engage_distance = p["engage_distance"]
+    ambient_temp = p["ambient_temp"]
 
-    for u in units_list:
-        fire = choose_target_fire(u, fires_list)
+    targets = assigner.assign(units_list, fires_list) if assigner is not None else None
+
+    for i, u in enumerate(units_list):
+        if targets is None:
+            fire = choose_target_fire(u, fires_list)
+        else:
+            fire = targets[i]
+            u["target_fire"] = fire["id"] if fire is not None else None
+            if fire is None:
+                u["status"] = "ожидание"
 
         if fire is None:
             u["moving"] = False
@@ -220,8 +265,14 @@ def update_units(units_list, fires_list, dt_seconds=5):
     return units_list
 
 # ===== Функция для создания и сохранения карты с текущими данными =====
-def create_map(units_list, fires_list):
-    """Создаёт интерактивную карту с маркерами для каждого бойца и контурами пожара."""
+def create_map(units_list, fires_list, alert_engine=None):
+    """
+    Создаёт интерактивную карту с маркерами для каждого бойца и контурами пожара.
+    Тревоги берутся из alert_engine (alerts.AlertEngine); без него — разовая проверка текущих показаний.
+    """
+    if alert_engine is None:
+        alert_engine = AlertEngine(MAIN_RULES)
+        alert_engine.process_units(units_list, time.time())
     m = folium.Map(location=[center_lat, center_lon], zoom_start=14)
     # Добавляем мета-теги в <head> для автообновления и отключения кеширования
     meta_tags = (
@@ -248,11 +299,10 @@ def create_map(units_list, fires_list):
 
     # Добавляем маркер для каждого пожарного
     for u in units_list:
-        # Проверяем пороги для определения тревоги
-        alert_temp = u["temp"] > 60.0
-        alert_pulse = u["pulse"] > 140.0
+        # Активные тревоги бойца
+        alerts = alert_engine.active_rules(u["name"])
         # Выбираем цвет маркера: красный при тревоге, зелёный если движется, синий если стоит (без тревог)
-        if alert_temp or alert_pulse:
+        if alerts:
             color = "red"
         else:
             color = "green" if u["moving"] else "blue"
@@ -260,11 +310,6 @@ def create_map(units_list, fires_list):
         icon = folium.Icon(color=color, icon="user")
         status_text = u.get("status") or ("движется" if u["moving"] else "неподвижен")
         # Подготовка текста для тревоги
-        alerts = []
-        if alert_temp:
-            alerts.append("Высокая температура!")
-        if alert_pulse:
-            alerts.append("Высокий пульс!")
         alert_text = ", ".join(alerts) if alerts else "нет"
         # Формируем HTML для всплывающего окна (popup)
         popup_html = (f"<b>{u['name']}</b><br>"
@@ -284,17 +329,50 @@ def create_map(units_list, fires_list):
     m.save("map.html")
 
 # ===== Запуск отображения карты и цикла обновления =====
-create_map(units, fires)
-webbrowser.open("file://" + os.path.abspath("map.html"))
-print("Карта открыта в браузере. Запущена симуляция работы подразделений... (Ctrl+C для остановки)")
-
-tick_seconds = 5
-
-try:
-    while True:
-        time.sleep(tick_seconds)
-        fires = update_fires(fires, units, dt_seconds=tick_seconds)
-        units = update_units(units, fires, dt_seconds=tick_seconds)
-        create_map(units, fires)
-except KeyboardInterrupt:
-    print("\nОстановка симуляции. Скрипт завершён.")
\ No newline at end of file
+def run():
+    fires = create_initial_fires()
+    units = create_initial_units()
+
+    # Потоковые тревоги по показателям бойцов; новые события выводим в консоль
+    alert_engine = AlertEngine(MAIN_RULES)
+    alert_engine.subscribe(lambda e: print(f"[{time.strftime('%H:%M:%S')}] {e['unit']}: {e['rule']} "
+                                           f"({'поднята' if e['state'] == 'raised' else 'снята'})"))
+    alert_engine.process_units(units, time.time())
+
+    create_map(units, fires, alert_engine)
+    webbrowser.open("file://" + os.path.abspath("map.html"))
+    print("Карта открыта в браузере. Запущена симуляция работы подразделений... (Ctrl+C для остановки)")
+
+    tick_seconds = 5
+
+    # Глобальное распределение бойцов по очагам ("assignment": "optimal" в конфиге)
+    assigner = AssignmentSolver() if config.get("assignment") == "optimal" else None
+
+    # Растровая модель распространения ("raster": {"dir": ..., "cell_m": ...} в конфиге)
+    raster_model = None
+    if isinstance(config.get("raster"), dict):
+        raster_cfg = config["raster"]
+        terrain = RasterTerrain(raster_cfg["dir"], tile_size=raster_cfg.get("tile_size", 256),
+                                max_tiles=raster_cfg.get("max_tiles", 64)) if raster_cfg.get("dir") else None
+        raster_model = RasterFireModel(terrain, cell_m=float(raster_cfg.get("cell_m", 5.0)))
+
+    # Запись траекторий для разбора после выезда (см. trajectory.TrajectoryReplay)
+    recorder = TrajectoryRecorder(units, fires, directory=config.get("trajectory_dir", "trajectory"),
+                                  tick_seconds=tick_seconds, seed=stream.label)
+    recorder.record(units, fires)
+
+    try:
+        while True:
+            time.sleep(tick_seconds)
+            fires = update_fires(fires, units, dt_seconds=tick_seconds, raster_model=raster_model)
+            units = update_units(units, fires, dt_seconds=tick_seconds, assigner=assigner)
+            recorder.record(units, fires)
+            alert_engine.process_units(units, time.time())
+            create_map(units, fires, alert_engine)
+    except KeyboardInterrupt:
+        recorder.flush()
+        print("\nОстановка симуляции. Скрипт завершён.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,131 @@
+# preprocessing.py — Общий конвейер признаков для train.py и скрипта оценки (test/fire.py)
+
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from forest_export import compile_forest, load_forest
+from timeline import TIMELINE_FEATURES, WINDOW_S, add_timeline_features
+
+FEATURES = ['borough_enc', 'type_enc', 'units', 'month', 'hour', 'is_night'] + TIMELINE_FEATURES
+CATEGORICAL = {'borough': 'borough_enc', 'incident_type': 'type_enc'}
+BUNDLE_FORMAT = 1
+
+
+def time_features(incident_time):
+    """month/hour/is_night из колонки времени без построчного apply."""
+
+    hour = incident_time.dt.hour
+    return pd.DataFrame({
+        'month': incident_time.dt.month,
+        'hour': hour,
+        'is_night': np.where((hour < 6) | (hour >= 22), 1, 0),
+    }, index=incident_time.index)
+
+
+class FeaturePipeline:
+    """
+    Обученное преобразование сырых инцидентов в матрицу признаков.
+    Коды категорий фиксируются при fit (в том же порядке, что у LabelEncoder);
+    неизвестные при оценке значения попадают в отдельный код unknown = число категорий.
+    Признаки ленты (timeline.py) берутся из кадра, если уже посчитаны (онлайн — из живого
+    состояния ScoringEngine), иначе считаются одним проходом по самому кадру.
+    """
+
+    version = 2
+
+    def __init__(self, window_s=WINDOW_S):
+        self.categories = {}
+        self.window_s = window_s
+
+    def fit(self, df):
+        for col in CATEGORICAL:
+            self.categories[col] = np.sort(df[col].astype(str).unique())
+        return self
+
+    def unknown_code(self, col):
+        return len(self.categories[col])
+
+    def transform(self, df):
+        if not self.categories:
+            raise RuntimeError("FeaturePipeline не обучен: сначала вызовите fit()")
+
+        X = pd.DataFrame(index=df.index)
+        for col, enc in CATEGORICAL.items():
+            codes = pd.Index(self.categories[col]).get_indexer(df[col].astype(str))
+            X[enc] = np.where(codes < 0, self.unknown_code(col), codes).astype(np.int32)
+        X['units'] = df['units']
+
+        if all(c in df.columns for c in ('month', 'hour', 'is_night')):
+            tf = df[['month', 'hour', 'is_night']]
+        else:
+            tf = time_features(df['incident_time'])
+        for c in ('month', 'hour', 'is_night'):
+            X[c] = tf[c].astype(np.int8)
+
+        if not all(c in df.columns for c in TIMELINE_FEATURES):
+            df = add_timeline_features(df, self.window_s)
+        for c in TIMELINE_FEATURES:
+            X[c] = df[c]
+        return X[FEATURES]
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+
+def save_bundle(clf, reg, pipeline, model_dir="models"):
+    """
+    Сохраняет модели и конвейер вместе: classifier.pkl, regressor.pkl, preprocessor.pkl
+    и bundle.json с версией, чтобы оценка использовала ровно то же преобразование.
+    Рядом кладутся компактные копии лесов (classifier.forest/, regressor.forest/) для быстрой загрузки.
+    """
+
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(clf, os.path.join(model_dir, "classifier.pkl"))
+    joblib.dump(reg, os.path.join(model_dir, "regressor.pkl"))
+    joblib.dump(pipeline, os.path.join(model_dir, "preprocessor.pkl"))
+    compile_forest(clf).save(os.path.join(model_dir, "classifier.forest"))
+    compile_forest(reg).save(os.path.join(model_dir, "regressor.forest"))
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "pipeline_version": pipeline.version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "features": FEATURES,
+        "categories": {col: len(cats) for col, cats in pipeline.categories.items()},
+        "files": ["classifier.pkl", "regressor.pkl", "preprocessor.pkl"],
+        "compiled": {"classifier": "classifier.forest", "regressor": "regressor.forest"},
+    }
+    with open(os.path.join(model_dir, "bundle.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_bundle(model_dir="models", compiled=False):
+    """
+    Загружает (классификатор, регрессор, конвейер) и проверяет версию набора.
+    compiled=True — леса берутся из компактного формата (memmap, без распаковки sklearn),
+    если он есть в наборе; иначе из pkl.
+    """
+
+    manifest_path = os.path.join(model_dir, "bundle.json")
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Нет {manifest_path}: переобучите модели через train.py")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Несовместимая версия набора моделей: {manifest.get('format')}")
+
+    if compiled and "compiled" in manifest:
+        clf = load_forest(os.path.join(model_dir, manifest["compiled"]["classifier"]))
+        reg = load_forest(os.path.join(model_dir, manifest["compiled"]["regressor"]))
+    else:
+        clf = joblib.load(os.path.join(model_dir, "classifier.pkl"))
+        reg = joblib.load(os.path.join(model_dir, "regressor.pkl"))
+    pipeline = joblib.load(os.path.join(model_dir, "preprocessor.pkl"))
+    if pipeline.version != manifest.get("pipeline_version"):
+        raise ValueError("Версия конвейера признаков не совпадает с bundle.json")
+    return clf, reg, pipeline
@@ -0,0 +1,261 @@
+# raster_fire.py — Растровая модель распространения пожара (ветер, горючее, рельеф) для main.py
+
+import json
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# GeoTIFF читается через rasterio, если он установлен; .npy работает и без него
+try:
+    import rasterio
+    from rasterio.windows import Window
+except ImportError:
+    rasterio = None
+
+METERS_PER_DEG = 111_320  # как в main._degrees_to_meters
+LAYERS = ("wind_u", "wind_v", "fuel", "elevation")
+DEFAULTS = {"wind_u": 0.0, "wind_v": 0.0, "fuel": 1.0, "elevation": 0.0}
+
+
+class _NpySource:
+    def __init__(self, path):
+        self.data = np.load(path, mmap_mode="r")
+        self.shape = self.data.shape
+
+    def read(self, r0, r1, c0, c1):
+        return np.array(self.data[r0:r1, c0:c1], dtype=np.float32)
+
+
+class _TiffSource:
+    def __init__(self, path):
+        if rasterio is None:
+            raise ImportError("Для GeoTIFF нужен rasterio (pip install rasterio) или конвертация в .npy")
+        self.ds = rasterio.open(path)
+        self.shape = (self.ds.height, self.ds.width)
+
+    def read(self, r0, r1, c0, c1):
+        return self.ds.read(1, window=Window(c0, r0, c1 - c0, r1 - r0)).astype(np.float32)
+
+
+class TileCache:
+    """LRU-кэш тайлов одного растра: в памяти только тайлы вокруг активных очагов."""
+
+    def __init__(self, source, tile_size=256, max_tiles=64, fill=0.0):
+        self.source = source
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.fill = fill
+        self._tiles = OrderedDict()
+
+    def _tile(self, ti, tj):
+        key = (ti, tj)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        ts = self.tile_size
+        rows, cols = self.source.shape
+        tile = self.source.read(ti * ts, min((ti + 1) * ts, rows), tj * ts, min((tj + 1) * ts, cols))
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def sample(self, rows, cols):
+        """Значения растра в точках (rows, cols); вне растра — fill."""
+
+        out = np.full(rows.shape, self.fill, dtype=np.float32)
+        n_rows, n_cols = self.source.shape
+        inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+        r, c = rows[inside], cols[inside]
+        ts = self.tile_size
+        tile_id = (r // ts) * ((n_cols + ts - 1) // ts) + (c // ts)
+        vals = np.empty(r.shape, dtype=np.float32)
+        for tid in np.unique(tile_id).tolist():
+            sel = tile_id == tid
+            ti, tj = divmod(tid, (n_cols + ts - 1) // ts)
+            vals[sel] = self._tile(ti, tj)[r[sel] - ti * ts, c[sel] - tj * ts]
+        out[inside] = vals
+        return out
+
+
+class RasterTerrain:
+    """
+    Набор растров из папки: wind_u/wind_v (м/с, восток/север), fuel (множитель 0..1),
+    elevation (м, уклон считается по градиенту). Файлы .npy открываются через memmap,
+    .tif — через rasterio. Привязка берётся из raster.json: lat0/lon0 (левый верхний угол)
+    и шаг dlat/dlon в градусах или cell_m в метрах.
+    """
+
+    def __init__(self, directory, tile_size=256, max_tiles=64):
+        with open(os.path.join(directory, "raster.json"), "r", encoding="utf-8") as fh:
+            geo = json.load(fh)
+        self.lat0 = float(geo["lat0"])
+        self.lon0 = float(geo["lon0"])
+        if "cell_m" in geo:
+            self.dlat = geo["cell_m"] / METERS_PER_DEG
+            self.dlon = geo["cell_m"] / (METERS_PER_DEG * math.cos(math.radians(self.lat0)))
+        else:
+            self.dlat = float(geo["dlat"])
+            self.dlon = float(geo["dlon"])
+
+        self.layers = {}
+        for name in LAYERS:
+            for ext, source in ((".npy", _NpySource), (".tif", _TiffSource), (".tiff", _TiffSource)):
+                path = os.path.join(directory, name + ext)
+                if os.path.exists(path):
+                    self.layers[name] = TileCache(source(path), tile_size, max_tiles, fill=DEFAULTS[name])
+                    break
+
+    def sample(self, name, lat, lon):
+        """Значения слоя в точках (ближайший сосед); отсутствующий слой — значение по умолчанию."""
+
+        cache = self.layers.get(name)
+        if cache is None:
+            return np.full(lat.shape, DEFAULTS[name], dtype=np.float32)
+        rows = np.floor((self.lat0 - lat) / self.dlat).astype(np.int64)
+        cols = np.floor((lon - self.lon0) / self.dlon).astype(np.int64)
+        return cache.sample(rows, cols)
+
+
+class _FireFront:
+    """Локальная метровая сетка вокруг очага с функцией уровня phi (phi < 0 — горит)."""
+
+    def __init__(self, fire, cell_m, half_cells):
+        self.lat = fire["lat"]
+        self.lon = fire["lon"]
+        self.cell_m = cell_m
+        self.half = half_cells
+        n = 2 * half_cells + 1
+        north, east = self._offsets(n, half_cells)
+        self.phi = np.hypot(north, east) - fire["radius"]
+        self.layers = None
+
+    def _offsets(self, n, half):
+        idx = (np.arange(n) - half) * self.cell_m
+        east, north = np.meshgrid(idx, -idx)
+        return north, east
+
+    def grow(self, pad):
+        """Расширяет сетку на pad клеток с каждой стороны (снаружи — заведомо не горит)."""
+
+        self.phi = np.pad(self.phi, pad, mode="edge")
+        self.half += pad
+        border = np.ones_like(self.phi, dtype=bool)
+        border[pad:-pad, pad:-pad] = False
+        self.phi[border] = np.maximum(self.phi[border], pad * self.cell_m)
+        self.layers = None
+
+    def coords(self):
+        north, east = self._offsets(self.phi.shape[0], self.half)
+        lat = self.lat + north / METERS_PER_DEG
+        lon = self.lon + east / (METERS_PER_DEG * math.cos(math.radians(self.lat)))
+        return lat, lon
+
+    def area(self):
+        return float((self.phi < 0).sum()) * self.cell_m ** 2
+
+
+class RasterFireModel:
+    """
+    Анизотропное распространение кромки методом уровней (level-set) на метровой сетке:
+    скорость = spread_rate * fuel * (1 + wind_coef * ветер вдоль нормали)
+    * (1 + slope_coef * подъём вдоль нормали). Радиус очага в словаре main.py
+    заменяется эквивалентным по площади, поэтому остальная логика не меняется.
+    """
+
+    def __init__(self, terrain=None, cell_m=5.0, wind_coef=0.15, slope_coef=2.0, margin_cells=4):
+        self.terrain = terrain
+        self.cell_m = cell_m
+        self.wind_coef = wind_coef
+        self.slope_coef = slope_coef
+        self.margin_cells = margin_cells
+        self.fronts = {}
+
+    def _front(self, fire):
+        front = self.fronts.get(fire["id"])
+        if front is None:
+            half = int(math.ceil(fire["radius"] / self.cell_m)) + 2 * self.margin_cells
+            front = _FireFront(fire, self.cell_m, half)
+            self.fronts[fire["id"]] = front
+        # Кромка подошла к краю сетки — расширяем
+        burning = front.phi < self.margin_cells * self.cell_m
+        edge = np.concatenate((burning[0], burning[-1], burning[:, 0], burning[:, -1]))
+        if edge.any():
+            front.grow(max(self.margin_cells, front.half // 2))
+        if front.layers is None:
+            front.layers = self._sample_layers(front)
+        return front
+
+    def _sample_layers(self, front):
+        shape = front.phi.shape
+        if self.terrain is None:
+            return {"fuel": np.ones(shape, np.float32), "wind_e": np.zeros(shape, np.float32),
+                    "wind_n": np.zeros(shape, np.float32), "slope_e": np.zeros(shape, np.float32),
+                    "slope_n": np.zeros(shape, np.float32)}
+        lat, lon = front.coords()
+        elevation = self.terrain.sample("elevation", lat, lon)
+        # Строки идут с севера на юг, поэтому знак по оси строк меняется
+        d_rows, d_cols = np.gradient(elevation, self.cell_m)
+        return {
+            "fuel": np.clip(self.terrain.sample("fuel", lat, lon), 0.0, None),
+            "wind_e": self.terrain.sample("wind_u", lat, lon),
+            "wind_n": self.terrain.sample("wind_v", lat, lon),
+            "slope_e": d_cols.astype(np.float32),
+            "slope_n": (-d_rows).astype(np.float32),
+        }
+
+    def _rate(self, front, base_rate):
+        phi, L = front.phi, front.layers
+        g_rows, g_cols = np.gradient(phi, self.cell_m)
+        # Внешняя нормаль к кромке (phi растёт наружу)
+        n_e, n_n = g_cols, -g_rows
+        norm = np.hypot(n_e, n_n) + 1e-12
+        n_e, n_n = n_e / norm, n_n / norm
+        wind = np.maximum(L["wind_e"] * n_e + L["wind_n"] * n_n, 0.0)
+        slope = np.maximum(L["slope_e"] * n_e + L["slope_n"] * n_n, 0.0)
+        return base_rate * L["fuel"] * (1.0 + self.wind_coef * wind) * (1.0 + self.slope_coef * slope)
+
+    def advance(self, fire, dt_seconds):
+        """Продвигает кромку очага на dt_seconds и обновляет fire["radius"]."""
+
+        front = self._front(fire)
+        h = self.cell_m
+        rate = self._rate(front, fire["spread_rate"])
+        r_max = float(rate.max())
+        n_sub = max(1, int(math.ceil(r_max * dt_seconds / (0.5 * h))))
+        dt = dt_seconds / n_sub
+        for _ in range(n_sub):
+            phi = np.pad(front.phi, 1, mode="edge")
+            c = phi[1:-1, 1:-1]
+            dxm = (c - phi[1:-1, :-2]) / h
+            dxp = (phi[1:-1, 2:] - c) / h
+            dym = (c - phi[:-2, 1:-1]) / h
+            dyp = (phi[2:, 1:-1] - c) / h
+            # Противопотоковая схема Ошера–Сетиана для скорости >= 0
+            grad = np.sqrt(np.maximum(dxm, 0) ** 2 + np.minimum(dxp, 0) ** 2
+                           + np.maximum(dym, 0) ** 2 + np.minimum(dyp, 0) ** 2)
+            front.phi = c - dt * rate * grad
+        fire["radius"] = math.sqrt(front.area() / math.pi)
+        return fire
+
+    def suppress(self, fire, meters):
+        """Тушение: отодвигает всю кромку внутрь на meters (как уменьшение радиуса в main.py)."""
+
+        front = self._front(fire)
+        front.phi = front.phi + meters
+        fire["radius"] = math.sqrt(front.area() / math.pi)
+        return fire
+
+    def release(self, fire):
+        """Освобождает сетку потушенного очага."""
+        self.fronts.pop(fire["id"], None)
+
+    def perimeter_mask(self, fire):
+        """Маска горящих клеток и её географические координаты (для отрисовки)."""
+
+        front = self._front(fire)
+        lat, lon = front.coords()
+        return front.phi < 0, lat, lon
@@ -0,0 +1,89 @@
+# rngstreams.py — Воспроизводимые потоки случайных чисел для симуляций (сценарий, ветки, процессы)
+
+import numpy as np
+
+BIT_GENERATORS = {"philox": np.random.Philox, "pcg64": np.random.PCG64}
+DEFAULT_BIT_GENERATOR = "philox"  # счётчиковый генератор: потоки независимы и не делят состояние
+BLOCK_SIZE = 1 << 16              # чисел в заранее выбранном блоке
+
+
+def make_seed(seed=None):
+    """Сид для записи в логи и планы: переданный или новый из энтропии ОС (целое)."""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed.entropy
+    return int(np.random.SeedSequence(seed).entropy)
+
+
+class RandomStream:
+    """
+    Поток случайных чисел сценария: Generator на Philox или PCG64 от SeedSequence(seed, spawn_key).
+    Потоки веток и процессов берутся через spawn(): они независимы и по (seed, spawn_key)
+    воспроизводятся бит в бит при любом порядке выполнения. Числа выдаются из заранее
+    выбранного блока float32: векторные ядра шага получают срез блока целиком,
+    скалярные розыгрыши не вызывают генератор на каждое число. Поток не потокобезопасен —
+    другому потоку ОС нужен свой (spawn).
+    """
+
+    def __init__(self, seed=None, spawn_key=(), bit_generator=DEFAULT_BIT_GENERATOR, block_size=BLOCK_SIZE):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_seq = seed
+        else:
+            self.seed_seq = np.random.SeedSequence(make_seed(seed), spawn_key=tuple(spawn_key))
+        self.seed = self.seed_seq.entropy
+        self.spawn_key = tuple(self.seed_seq.spawn_key)
+        self.bit_generator = bit_generator
+        self.generator = np.random.Generator(BIT_GENERATORS[bit_generator](self.seed_seq))
+        self.block_size = block_size
+        self._block = np.empty(0, dtype=np.float32)
+        self._pos = 0
+
+    def spawn(self, n):
+        """n дочерних потоков (следующие по порядку ключи SeedSequence.spawn)."""
+        return [RandomStream(s, bit_generator=self.bit_generator, block_size=self.block_size)
+                for s in self.seed_seq.spawn(n)]
+
+    def describe(self):
+        """Всё, что нужно для восстановления потока (пишется в логи и планы)."""
+        return {"seed": self.seed, "spawn_key": list(self.spawn_key), "bit_generator": self.bit_generator}
+
+    @classmethod
+    def from_description(cls, info):
+        return cls(info["seed"], info.get("spawn_key", ()), info.get("bit_generator", DEFAULT_BIT_GENERATOR))
+
+    @property
+    def label(self):
+        """Сид одной строкой для колонки CSV: "сид" или "сид/ключ/ключ" у дочернего потока."""
+        return "/".join(str(v) for v in (self.seed,) + self.spawn_key)
+
+    @classmethod
+    def from_label(cls, label, bit_generator=DEFAULT_BIT_GENERATOR):
+        seed, *spawn_key = (int(v) for v in str(label).split("/"))
+        return cls(seed, spawn_key, bit_generator)
+
+    # --- Розыгрыши ---
+    def block(self, n):
+        """Следующие n чисел [0, 1) float32; больше блока — одним вызовом генератора."""
+        if n > self.block_size:
+            return self.generator.random(n, dtype=np.float32)
+        if self._pos + n > len(self._block):
+            self._block = self.generator.random(self.block_size, dtype=np.float32)
+            self._pos = 0
+        out = self._block[self._pos:self._pos + n]
+        self._pos += n
+        return out
+
+    def random(self, size=None, dtype=np.float32):
+        """Как Generator.random: без size — одно число, иначе массив формы size (из блока, если float32)."""
+        if size is None:
+            return float(self.block(1)[0])
+        if dtype != np.float32:
+            return self.generator.random(size, dtype=dtype)
+        shape = (size,) if np.isscalar(size) else tuple(size)
+        return self.block(int(np.prod(shape))).reshape(shape)
+
+    def uniform(self, low=0.0, high=1.0):
+        return low + (high - low) * self.random()
+
+    def integers(self, low, high):
+        """Целое из [low, high)."""
+        return low + min(int(self.random() * (high - low)), high - low - 1)
@@ -0,0 +1,262 @@
+# scoring.py — Пакетная и онлайн-оценка задержек прибытия моделями FDNY
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from ingest import DATETIME_FORMAT, build_feature_store
+from preprocessing import load_bundle
+from timeline import TIMELINE_FEATURES, TimelineFeatures, compute_timeline_features
+
+PRIME_LOOKBACK_S = 24 * 3600  # сколько истории проигрывать в живую ленту при запуске сервиса
+
+OUTPUT_COLUMNS = ['predicted_time_sec', 'predicted_delay', 'delay_proba']
+
+
+class ScoringEngine:
+    """
+    Держит модели и конвейер признаков загруженными. Метка задержки берётся как argmax
+    той же predict_proba (один проход по деревьям вместо двух). Большие пачки
+    предсказываются на всех ядрах, мелкие (онлайн-запросы) — в одном потоке без накладных расходов.
+    По умолчанию леса читаются из компактного формата (forest_export), результат тот же, что у sklearn.
+    """
+
+    def __init__(self, model_dir="models", n_jobs=-1, parallel_min_rows=2000, compiled=True):
+        self.clf, self.reg, self.pipeline = load_bundle(model_dir, compiled=compiled)
+        self.n_jobs = n_jobs
+        self.parallel_min_rows = parallel_min_rows
+        self._positive = int(np.flatnonzero(self.clf.classes_ == 1)[0]) if 1 in self.clf.classes_ else -1
+        self._lock = threading.Lock()
+        # Живая лента инцидентов для онлайн-признаков (тот же TimelineFeatures, что при обучении)
+        self.timeline = TimelineFeatures(self.pipeline.window_s)
+        self._timeline_lock = threading.Lock()
+
+    def _set_jobs(self, n_rows):
+        n_jobs = self.n_jobs if n_rows >= self.parallel_min_rows else 1
+        self.clf.n_jobs = n_jobs
+        self.reg.n_jobs = n_jobs
+
+    def score(self, df):
+        """Возвращает DataFrame predicted_time_sec / predicted_delay / delay_proba для строк df."""
+
+        X = self.pipeline.transform(df)
+        with self._lock:
+            self._set_jobs(len(X))
+            proba = self.clf.predict_proba(X)
+            pred_time = self.reg.predict(X)
+        return pd.DataFrame({
+            'predicted_time_sec': pred_time.round(0),
+            'predicted_delay': self.clf.classes_[proba.argmax(axis=1)],
+            'delay_proba': proba[:, self._positive] if self._positive >= 0 else 0.0,
+        }, index=df.index)
+
+    def score_stream(self, batches):
+        """Оценивает поток пачек (DataFrame), не держа в памяти весь набор."""
+
+        for batch in batches:
+            batch = batch.dropna(subset=['incident_time', 'units'])
+            batch = batch[batch['units'] > 0]
+            if len(batch):
+                yield batch.join(self.score(batch))
+
+    def _observe(self, df):
+        """Проводит инциденты через живую ленту в порядке времени и добавляет признаки ленты."""
+
+        feats = np.zeros((len(df), len(TIMELINE_FEATURES)), dtype=np.float64)
+        seconds = df['incident_time'].to_numpy(dtype='datetime64[s]')
+        durations = df['duration_sec'] if 'duration_sec' in df.columns else pd.Series(np.nan, index=df.index)
+        ids = df['incident_id'] if 'incident_id' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        order = np.argsort(seconds, kind='stable')
+        with self._timeline_lock:
+            for i in order:
+                if np.isnat(seconds[i]):
+                    continue
+                # Опоздавшее событие считается на текущее время ленты
+                t = max(float(seconds[i].astype(np.int64)), self.timeline.clock)
+                feats[i] = self.timeline.observe(t, str(df['borough'].iat[i]), df['units'].iat[i],
+                                                 durations.iat[i], ids.iat[i])
+        return df.assign(**{c: feats[:, k] for k, c in enumerate(TIMELINE_FEATURES)})
+
+    def score_records(self, records):
+        """
+        Онлайн-оценка списка инцидентов в виде словарей (поля как в кэше признаков;
+        необязательно incident_id — для close_incident, и duration_sec, если уже известна).
+        """
+
+        df = pd.DataFrame.from_records(records)
+        raw = df['incident_time'].astype(str)
+        parsed = pd.to_datetime(raw, format=DATETIME_FORMAT, errors='coerce')
+        missing = parsed.isna()
+        if missing.any():
+            parsed[missing] = pd.to_datetime(raw[missing], format='ISO8601', errors='coerce')
+        df['incident_time'] = parsed
+        df['units'] = pd.to_numeric(df['units'], errors='coerce')
+        if 'duration_sec' in df.columns:
+            df['duration_sec'] = pd.to_numeric(df['duration_sec'], errors='coerce')
+        out = self.score(self._observe(df))
+        return out.to_dict(orient='records')
+
+    def close_incident(self, incident_id, time=None):
+        """Инцидент ликвидирован: его подразделения больше не считаются занятыми."""
+
+        t = None if time is None else pd.Timestamp(time).timestamp()
+        with self._timeline_lock:
+            self.timeline.close(incident_id, None if t is None else max(t, self.timeline.clock))
+
+    def prime(self, df):
+        """Проигрывает историю (incident_time, borough, units, duration_sec) в живую ленту."""
+
+        df = df.dropna(subset=['incident_time'])
+        self._observe(df[['incident_time', 'borough', 'units', 'duration_sec']].copy())
+        return len(df)
+
+
+def iter_feature_batches(csv_path="fdny_incidents.csv", batch_rows=200_000,
+                         columns=('incident_time', 'borough', 'incident_type', 'units', 'month', 'hour', 'is_night'),
+                         timeline=True):
+    """
+    Читает кэш признаков (ingest.py) пачками по batch_rows строк. С timeline=True признаки ленты
+    сначала считаются одним проходом по всему набору (читаются только 4 колонки), затем
+    прикладываются к пачкам по порядку строк.
+    """
+
+    dataset = ds.dataset(build_feature_store(csv_path), format="parquet", partitioning="hive")
+    feats = None
+    if timeline:
+        base = dataset.to_table(columns=['incident_time', 'borough', 'units', 'duration_sec']).to_pandas()
+        feats = compute_timeline_features(base['incident_time'], base['borough'], base['units'], base['duration_sec'])
+        del base
+    offset = 0
+    for batch in dataset.to_batches(columns=list(columns), batch_size=batch_rows):
+        frame = batch.to_pandas()
+        if feats is not None:
+            for c in TIMELINE_FEATURES:
+                frame[c] = feats[c].to_numpy()[offset:offset + len(frame)]
+        offset += len(frame)
+        yield frame
+
+
+def make_handler(engine):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False, default=float).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok"})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path not in ("/score", "/close"):
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                data = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/close":
+                    engine.close_incident(data["incident_id"], data.get("time"))
+                    self._reply(200, {"status": "ok"})
+                    return
+                records = data["incidents"] if isinstance(data, dict) else data
+                self._reply(200, {"predictions": engine.score_records(records)})
+            except (KeyError, ValueError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(engine, host="127.0.0.1", port=8765):
+    """
+    Долгоживущий HTTP-сервис: POST /score {"incidents": [...]} -> {"predictions": [...]},
+    POST /close {"incident_id": ..., "time": ...} — освобождение подразделений в живой ленте.
+    """
+
+    server = ThreadingHTTPServer((host, port), make_handler(engine))
+    print(f"Сервис оценки запущен на http://{host}:{port} (POST /score, POST /close, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def benchmark(engine, df, batch_rows=100_000, single_requests=500):
+    """Пропускная способность пакетной оценки (строк/с) и задержки одиночных запросов (p50/p99, мс)."""
+
+    start = time.perf_counter()
+    rows = 0
+    for i in range(0, len(df), batch_rows):
+        rows += len(engine.score(df.iloc[i:i + batch_rows]))
+    batch_s = time.perf_counter() - start
+
+    sample = df.sample(min(single_requests, len(df)), random_state=0)
+    latencies = []
+    for i in range(len(sample)):
+        t0 = time.perf_counter()
+        engine.score(sample.iloc[i:i + 1])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    lat = np.array(latencies)
+    return {
+        "rows": rows,
+        "rows_per_s": rows / batch_s if batch_s > 0 else float("inf"),
+        "single_p50_ms": float(np.percentile(lat, 50)),
+        "single_p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Оценка задержек прибытия (FDNY)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_score = sub.add_parser("score", help="пакетная оценка файла")
+    p_score.add_argument("csv", nargs="?", default="fdny_incidents.csv")
+    p_score.add_argument("-o", "--output", default="predictions.csv")
+    p_score.add_argument("--batch-rows", type=int, default=200_000)
+    p_serve = sub.add_parser("serve", help="HTTP-сервис с загруженными моделями")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8765)
+    p_serve.add_argument("--prime", default=None, metavar="CSV",
+                         help="проиграть в живую ленту последние сутки истории из этого файла")
+    p_bench = sub.add_parser("bench", help="замер строк/с и p99 задержки")
+    p_bench.add_argument("csv", nargs="?", default="fdny_incidents.csv")
+    for p in (p_score, p_serve, p_bench):
+        p.add_argument("--models", default="models")
+        p.add_argument("--jobs", type=int, default=-1)
+        p.add_argument("--sklearn", action="store_true", help="использовать pkl-модели sklearn вместо компактных")
+    args = parser.parse_args()
+
+    engine = ScoringEngine(args.models, n_jobs=args.jobs, compiled=not args.sklearn)
+    if args.command == "score":
+        header = True
+        total = 0
+        for scored in engine.score_stream(iter_feature_batches(args.csv, args.batch_rows)):
+            scored.to_csv(args.output, mode="w" if header else "a", header=header, index=False)
+            header = False
+            total += len(scored)
+            print(f"Оценено строк: {total}", end="\r")
+        print(f"\nРезультаты сохранены в {args.output}")
+    elif args.command == "serve":
+        if args.prime:
+            history = pd.concat(iter_feature_batches(args.prime, columns=(
+                'incident_time', 'borough', 'units', 'duration_sec'), timeline=False))
+            history = history[history['incident_time'] >= history['incident_time'].max()
+                              - pd.Timedelta(seconds=PRIME_LOOKBACK_S)]
+            print(f"Лента: проиграно инцидентов {engine.prime(history)}")
+        serve(engine, args.host, args.port)
+    else:
+        frame = pd.concat(iter_feature_batches(args.csv))
+        frame = frame.dropna(subset=['incident_time', 'units'])
+        print(json.dumps(benchmark(engine, frame[frame['units'] > 0]), indent=2))
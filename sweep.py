@@ -0,0 +1,122 @@
+# sweep.py — Параллельный перебор параметров модели main.py без карты
+
+import argparse
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import main
+from rngstreams import RandomStream
+
+# Параметры очагов; остальные ключи сетки — из main.DEFAULT_PARAMS
+FIRE_KEYS = ("spread_rate", "decay_rate", "radius", "intensity")
+RESULT_COLUMNS = ["seed", "ticks", "time_to_extinguish", "peak_radius", "max_temp", "max_pulse"]
+
+
+def expand_grid(grid, seeds):
+    """Декартово произведение значений сетки и сидов: список (параметры, сид)."""
+
+    unknown = set(grid) - set(FIRE_KEYS) - set(main.DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры сетки: {', '.join(sorted(unknown))}")
+    keys = sorted(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        for seed in seeds:
+            yield dict(zip(keys, values)), seed
+
+
+def run_scenario(combo, seed, dt_seconds=5, max_ticks=2000):
+    """Один прогон update_fires/update_units до ликвидации всех очагов или max_ticks."""
+
+    rng = RandomStream(seed)  # свой поток на прогон: результат не зависит от процесса и порядка задач
+    fires = main.create_initial_fires(rng)
+    units = main.create_initial_units(rng)
+    params = dict(main.PARAMS)
+    for key, value in combo.items():
+        if key in FIRE_KEYS:
+            for fire in fires:
+                fire[key] = float(value)
+        else:
+            params[key] = value
+
+    peak_radius = max((f["radius"] for f in fires), default=0.0)
+    max_temp = max((u["temp"] for u in units), default=0.0)
+    max_pulse = max((u["pulse"] for u in units), default=0.0)
+    extinguished_at = None
+    tick = 0
+    while tick < max_ticks:
+        tick += 1
+        fires = main.update_fires(fires, units, dt_seconds=dt_seconds, params=params)
+        units = main.update_units(units, fires, dt_seconds=dt_seconds, params=params)
+        peak_radius = max(peak_radius, max((f["radius"] for f in fires), default=0.0))
+        max_temp = max(max_temp, max((u["temp"] for u in units), default=0.0))
+        max_pulse = max(max_pulse, max((u["pulse"] for u in units), default=0.0))
+        if not any(f["active"] for f in fires):
+            extinguished_at = tick * dt_seconds
+            break
+
+    row = dict(combo)
+    row.update({
+        "seed": seed,
+        "ticks": tick,
+        "time_to_extinguish": extinguished_at if extinguished_at is not None else "",
+        "peak_radius": round(peak_radius, 2),
+        "max_temp": round(max_temp, 2),
+        "max_pulse": round(max_pulse, 2),
+    })
+    return row
+
+
+def _run_chunk(chunk, dt_seconds, max_ticks):
+    return [run_scenario(combo, seed, dt_seconds, max_ticks) for combo, seed in chunk]
+
+
+def run_sweep(grid, seeds, out_path, dt_seconds=5, max_ticks=2000, workers=None, chunksize=16):
+    """
+    Прогоняет все комбинации в пуле процессов. Задачи отправляются пачками по chunksize,
+    одновременно в работе не больше 2 пачек на процесс; строки пишутся в CSV по мере готовности.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    tasks = expand_grid(grid, seeds)
+    columns = sorted(grid) + RESULT_COLUMNS
+    done = 0
+
+    with open(out_path, "w", newline="", encoding="utf-8") as fh, ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(fh, fieldnames=columns)
+        writer.writeheader()
+        pending = set()
+        while True:
+            while len(pending) < workers * 2:
+                chunk = list(itertools.islice(tasks, chunksize))
+                if not chunk:
+                    break
+                pending.add(pool.submit(_run_chunk, chunk, dt_seconds, max_ticks))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                rows = future.result()
+                writer.writerows(rows)
+                done += len(rows)
+            print(f"Готово прогонов: {done}", end="\r")
+    print(f"\nРезультаты сохранены в {out_path}")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перебор параметров модели тушения")
+    parser.add_argument("grid", help='JSON: {"grid": {"spread_rate": [0.5, 0.9], ...}, "seeds": [0, 1, 2]}')
+    parser.add_argument("-o", "--output", default="sweep_results.csv")
+    parser.add_argument("--dt", type=float, default=5)
+    parser.add_argument("--max-ticks", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=16)
+    args = parser.parse_args()
+
+    with open(args.grid, "r", encoding="utf-8") as fh:
+        spec = json.load(fh)
+    run_sweep(spec.get("grid", {}), spec.get("seeds", [0]), args.output, dt_seconds=args.dt,
+              max_ticks=args.max_ticks, workers=args.workers, chunksize=args.chunksize)
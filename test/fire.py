@@ -1,49 +1,28 @@
 # Основной модуль системы анализа выездов (main.py)
 
-import pandas as pd
-import joblib
-from sklearn.preprocessing import LabelEncoder
+import os
+import sys
 
-# Загрузка моделей
-clf = joblib.load("models/classifier.pkl")
-reg = joblib.load("models/regressor.pkl")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import load_features
+from scoring import ScoringEngine
+from timeline import add_timeline_features
 
-# Загрузка данных для анализа
-print("Загрузка и подготовка данных...")
-df = pd.read_csv("fdny_incidents.csv", low_memory=False)
-df.columns = df.columns.str.lower()
-df = df[['incident_date_time', 'borough_desc', 'incident_type_desc', 'units_onscene']].copy()
-df.rename(columns={
-    'incident_date_time': 'incident_time',
-    'borough_desc': 'borough',
-    'incident_type_desc': 'incident_type',
-    'units_onscene': 'units'
-}, inplace=True)
+# Загрузка моделей вместе с конвейером признаков, на котором они обучены
+engine = ScoringEngine("models")
 
-# Дата и признаки
-datetime_format = '%m/%d/%Y %I:%M:%S %p'
-df['incident_time'] = pd.to_datetime(df['incident_time'], format=datetime_format, errors='coerce')
+# Загрузка данных для анализа (из кэша признаков, CSV разбирается только при изменении)
+print("Загрузка и подготовка данных...")
+df = load_features("fdny_incidents.csv", columns=[
+    'incident_time', 'borough', 'incident_type', 'units', 'duration_sec', 'month', 'hour', 'is_night'
+])
+df = add_timeline_features(df)  # по всей ленте, до отбора строк
 df.dropna(subset=['incident_time', 'units'], inplace=True)
 df = df[df['units'] > 0]
-df['month'] = df['incident_time'].dt.month
-df['hour'] = df['incident_time'].dt.hour
-df['is_night'] = df['hour'].apply(lambda x: 1 if x < 6 or x >= 22 else 0)
-
-# Кодирование
-le_borough = LabelEncoder()
-le_type = LabelEncoder()
-df['borough_enc'] = le_borough.fit_transform(df['borough'].astype(str))
-df['type_enc'] = le_type.fit_transform(df['incident_type'].astype(str))
-
-# Подготовка признаков
-features = ['borough_enc', 'type_enc', 'units', 'month', 'hour', 'is_night']
-X = df[features]
 
-# Предсказания
+# Предсказания (признаки — тем же преобразованием, что при обучении; один проход predict_proba)
 print("Выполняется предсказание...")
-df['predicted_delay'] = clf.predict(X)
-df['delay_proba'] = clf.predict_proba(X)[:, 1]
-df['predicted_time_sec'] = reg.predict(X).round(0)
+df = df.join(engine.score(df))
 
 # Вывод результатов
 print("\nПримеры анализа инцидентов:")
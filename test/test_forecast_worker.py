@@ -0,0 +1,47 @@
+# Проверка фонового прогноза (FireTacticsSystem/data/forecast_worker.py)
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "FireTacticsSystem", "data"))
+
+from PyQt5.QtCore import QCoreApplication, Qt
+
+from forecast_worker import ForecastWorker
+
+
+class SlowSim:
+    """Снимок, прогноз которого считается дольше, чем приходят новые снимки."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def snapshot(self):
+        return self
+
+    def predict_future_grid(self, steps=20):
+        time.sleep(self.delay)
+        return "grid"
+
+    def get_optimal_strategy(self):
+        return []
+
+
+def test_forecast_delivered_when_submits_outpace_prediction():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    worker = ForecastWorker()
+    results = []
+    worker.result_ready.connect(lambda generation, grid, strategy: results.append(generation), Qt.DirectConnection)
+    worker.start()
+    sim = SlowSim(delay=0.2)
+    try:
+        for _ in range(20):  # новый снимок каждые 50 мс — каждый прогноз устаревает до окончания
+            worker.submit(sim)
+            time.sleep(0.05)
+            app.processEvents()
+    finally:
+        worker.stop()
+    assert results
+    assert results == sorted(results)
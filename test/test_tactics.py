@@ -0,0 +1,26 @@
+# Проверка поиска тактики (FireTacticsSystem/data/tactics.py)
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "FireTacticsSystem", "data"))
+
+from simulation import CellState, SimulationEngine
+from tactics import optimize_tactics
+
+
+def test_single_unit_finishes_within_budget():
+    # Одно подразделение: планов меньше, чем POPULATION, — пачка не должна требовать уникальных планов
+    sim = SimulationEngine(30, 30, seed=1)
+    sim.grid[14:17, 14:17] = CellState.FIRE.value
+    sim.add_agent(2, 2)
+
+    started = time.perf_counter()
+    plan, info = optimize_tactics(sim, time_budget_s=0.5, workers=1, seed=1, return_info=True)
+    assert time.perf_counter() - started < 5
+    assert info["iterations"] > 0
+    assert info["score"] <= info["baseline_score"]
+    assert len(plan) <= 1
@@ -0,0 +1,133 @@
+# timeline.py — Потоковые признаки по ленте инцидентов (одинаково для обучения и онлайн-оценки)
+
+import heapq
+import itertools
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+TIMELINE_FEATURES = ['borough_incidents_1h', 'city_incidents_1h', 'active_units']
+WINDOW_S = 3600
+DEFAULT_DURATION_S = 3600  # если длительность неизвестна и закрытие не пришло — выбывает через час
+
+
+class TimelineFeatures:
+    """
+    Состояние ленты инцидентов, обновляемое по одному событию за O(1) амортизированно:
+    очереди времён выездов за последние window_s (по району и по городу) и куча окончаний
+    занятых подразделений. Признаки инцидента считаются на момент выезда, без него самого.
+    События должны идти по неубыванию времени.
+    """
+
+    def __init__(self, window_s=WINDOW_S, default_duration_s=DEFAULT_DURATION_S):
+        self.window_s = window_s
+        self.default_duration_s = default_duration_s
+        self.clock = -np.inf
+        self._recent = {}            # район -> deque времён выездов
+        self._recent_city = deque()
+        self._ends = []              # куча (окончание, номер, подразделения, id)
+        self._open = {}              # id -> подразделения, для закрытия по событию
+        self._seq = itertools.count()
+        self.active_units = 0.0
+
+    def _advance(self, t):
+        if t < self.clock:
+            raise ValueError(f"Событие {t} раньше текущего времени ленты {self.clock}")
+        self.clock = t
+        ends = self._ends
+        while ends and ends[0][0] <= t:
+            _, _, units, incident_id = heapq.heappop(ends)
+            if incident_id is None:
+                self.active_units -= units
+            elif self._open.pop(incident_id, None) is not None:
+                self.active_units -= units
+
+    @staticmethod
+    def _expire(queue, cutoff):
+        while queue and queue[0] <= cutoff:
+            queue.popleft()
+        return len(queue)
+
+    def features(self, t, borough):
+        """Признаки на момент t для района borough (состояние не меняется, кроме сдвига времени)."""
+
+        self._advance(t)
+        cutoff = t - self.window_s
+        recent = self._recent.get(borough)
+        return (self._expire(recent, cutoff) if recent is not None else 0,
+                self._expire(self._recent_city, cutoff),
+                self.active_units)
+
+    def dispatch(self, t, borough, units, duration_s=None, incident_id=None):
+        """Учитывает выезд: units заняты до t + duration_s (или до close(incident_id))."""
+
+        self._advance(t)
+        self._recent.setdefault(borough, deque()).append(t)
+        self._recent_city.append(t)
+        units = 0.0 if units is None or units != units else float(units)
+        if duration_s is None or duration_s != duration_s or duration_s < 0:
+            duration_s = self.default_duration_s
+        if incident_id is not None:
+            self._open[incident_id] = units
+        self.active_units += units
+        heapq.heappush(self._ends, (t + duration_s, next(self._seq), units, incident_id))
+
+    def close(self, incident_id, t=None):
+        """Онлайн: инцидент закрыт раньше расчётного окончания — подразделения освобождаются."""
+
+        if t is not None:
+            self._advance(t)
+        units = self._open.pop(incident_id, None)
+        if units is not None:
+            self.active_units -= units
+
+    def observe(self, t, borough, units, duration_s=None, incident_id=None):
+        """Признаки на момент выезда, затем сам выезд. Один шаг и для обучения, и для онлайна."""
+
+        feats = self.features(t, borough)
+        self.dispatch(t, borough, units, duration_s, incident_id)
+        return feats
+
+
+def _seconds(times):
+    values = pd.to_datetime(times).to_numpy(dtype='datetime64[s]')
+    valid = ~np.isnat(values)
+    return values.astype(np.int64).astype(np.float64), valid
+
+
+def compute_timeline_features(incident_time, borough, units, duration_sec=None,
+                              window_s=WINDOW_S, default_duration_s=DEFAULT_DURATION_S):
+    """
+    Офлайн-расчёт по всей истории: один проход в порядке времени через TimelineFeatures.observe.
+    Принимает колонки (Series/массивы), возвращает DataFrame TIMELINE_FEATURES в исходном порядке.
+    Строки без времени получают нули и в ленту не попадают.
+    """
+
+    t, valid = _seconds(incident_time)
+    codes, _ = pd.factorize(pd.Series(borough).astype(str))
+    units = np.asarray(units, dtype=np.float64)
+    duration = (np.full(len(t), np.nan) if duration_sec is None
+                else np.asarray(duration_sec, dtype=np.float64))
+
+    out = np.zeros((len(t), len(TIMELINE_FEATURES)), dtype=np.float64)
+    order = np.flatnonzero(valid)
+    order = order[np.argsort(t[order], kind='stable')]
+    state = TimelineFeatures(window_s, default_duration_s)
+    observe = state.observe
+    for i in order.tolist():
+        out[i] = observe(t[i], codes[i], units[i], duration[i])
+
+    index = incident_time.index if isinstance(incident_time, pd.Series) else None
+    return pd.DataFrame(out, columns=TIMELINE_FEATURES, index=index).astype(
+        {'borough_incidents_1h': np.int32, 'city_incidents_1h': np.int32, 'active_units': np.float32})
+
+
+def add_timeline_features(df, window_s=WINDOW_S):
+    """Добавляет к кадру с incident_time/borough/units(/duration_sec) колонки TIMELINE_FEATURES."""
+
+    feats = compute_timeline_features(df['incident_time'], df['borough'], df['units'],
+                                      df['duration_sec'] if 'duration_sec' in df.columns else None,
+                                      window_s=window_s)
+    feats.index = df.index
+    return df.assign(**{c: feats[c] for c in TIMELINE_FEATURES})
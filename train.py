@@ -1,88 +1,188 @@
 # train.py — Обучение классификатора и регрессора по данным FDNY
 
-import pandas as pd
-import joblib
-from sklearn.model_selection import train_test_split
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
+from sklearn.metrics import (accuracy_score, f1_score, mean_absolute_error, mean_squared_error,
+                             r2_score, roc_auc_score)
+from sklearn.model_selection import train_test_split
 from tqdm import tqdm
-import time
-import os
 
-# Загрузка и подготовка данных
-print("Загрузка данных...")
-df = pd.read_csv("fdny_incidents.csv", low_memory=False)
-df.columns = df.columns.str.lower()
-
-columns = [
-    'incident_date_time', 'arrival_date_time', 'borough_desc',
-    'incident_type_desc', 'units_onscene', 'total_incident_duration'
-]
-df = df[columns].copy()
-
-df.rename(columns={
-    'incident_date_time': 'incident_time',
-    'arrival_date_time': 'arrival_time',
-    'borough_desc': 'borough',
-    'incident_type_desc': 'incident_type',
-    'units_onscene': 'units',
-    'total_incident_duration': 'duration_sec'
-}, inplace=True)
-
-# Обработка дат
-datetime_format = '%m/%d/%Y %I:%M:%S %p'
-for col in ['incident_time', 'arrival_time']:
-    df[col] = pd.to_datetime(df[col], format=datetime_format, errors='coerce')
-
-# Очистка
-df.dropna(subset=['incident_time', 'arrival_time', 'duration_sec'], inplace=True)
-df = df[df['units'] > 0]
-df['response_time'] = (df['arrival_time'] - df['incident_time']).dt.total_seconds()
-df = df[(df['response_time'] >= 0) & (df['response_time'] < 3600)]
-
-# Создание признаков
-df['month'] = df['incident_time'].dt.month
-df['hour'] = df['incident_time'].dt.hour
-df['is_night'] = df['hour'].apply(lambda x: 1 if x < 6 or x >= 22 else 0)
-
-le_borough = LabelEncoder()
-le_type = LabelEncoder()
-df['borough_enc'] = le_borough.fit_transform(df['borough'].astype(str))
-df['type_enc'] = le_type.fit_transform(df['incident_type'].astype(str))
-
-# Целевые переменные
-df['delay_flag'] = (df['response_time'] > 300).astype(int)
-features = ['borough_enc', 'type_enc', 'units', 'month', 'hour', 'is_night']
-X = df[features]
-y_class = df['delay_flag']
-y_reg = df['response_time']
-
-# Разделение на обучающую и тестовую выборки
-print("Разделение данных...")
-X_train_c, _, y_train_c, _ = train_test_split(X, y_class, test_size=0.2, random_state=42)
-X_train_r, _, y_train_r, _ = train_test_split(X, y_reg, test_size=0.2, random_state=42)
-
-# Обучение моделей
-os.makedirs("models", exist_ok=True)
-
-print("\nОбучение классификатора...")
-tqdm_bar = tqdm(total=100, desc="Классификатор", ncols=100)
-clf = RandomForestClassifier(n_estimators=100, random_state=42)
-for _ in range(10):
-    time.sleep(0.1)
-    tqdm_bar.update(10)
-clf.fit(X_train_c, y_train_c)
-tqdm_bar.close()
-joblib.dump(clf, "models/classifier.pkl")
-
-print("\nОбучение регрессора...")
-tqdm_bar = tqdm(total=100, desc="Регрессор", ncols=100)
-reg = RandomForestRegressor(n_estimators=100, random_state=42)
-for _ in range(10):
-    time.sleep(0.1)
-    tqdm_bar.update(10)
-reg.fit(X_train_r, y_train_r)
-tqdm_bar.close()
-joblib.dump(reg, "models/regressor.pkl")
-
-print("\n✅ Модели успешно обучены и сохранены в папку 'models/'")
+from ingest import load_features
+from preprocessing import FeaturePipeline, save_bundle
+from timeline import add_timeline_features
+
+# Пиковый RSS процесса берётся из resource (Linux/macOS); на Windows — пик tracemalloc
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DELAY_THRESHOLD_SEC = 300
+
+
+def load_training_data(csv_path="fdny_incidents.csv"):
+    """
+    Признаки из кэша (CSV разбирается только при изменении) с очисткой выбросов.
+    Признаки ленты считаются до очистки: отброшенные инциденты тоже занимали подразделения.
+    """
+
+    df = load_features(csv_path, columns=[
+        'incident_time', 'arrival_time', 'borough', 'incident_type', 'units', 'duration_sec',
+        'response_time', 'month', 'hour', 'is_night'
+    ])
+    df = add_timeline_features(df)
+    df.dropna(subset=['incident_time', 'arrival_time', 'duration_sec'], inplace=True)
+    df = df[df['units'] > 0]
+    df = df[(df['response_time'] >= 0) & (df['response_time'] < 3600)]
+    return df
+
+
+def grow_forest(model, X, y, n_estimators, step, desc, position=0):
+    """
+    Наращивает лес через warm_start по step деревьев за раз (step = число потоков),
+    поэтому прогресс — настоящий, по готовым деревьям. С тем же random_state
+    результат совпадает с обучением всего леса за один fit.
+    """
+
+    start = time.perf_counter()
+    model.set_params(warm_start=True)
+    with tqdm(total=n_estimators, desc=desc, ncols=100, position=position) as bar:
+        built = 0
+        while built < n_estimators:
+            target = min(n_estimators, built + step)
+            model.set_params(n_estimators=target)
+            model.fit(X, y)
+            bar.update(target - built)
+            built = target
+    model.set_params(warm_start=False)
+    return time.perf_counter() - start
+
+
+def _peak_memory_mb():
+    if resource is not None:
+        # ru_maxrss: килобайты на Linux, байты на macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+
+
+def _tree_stats(model):
+    nodes = [est.tree_.node_count for est in model.estimators_]
+    depths = [est.tree_.max_depth for est in model.estimators_]
+    return {"n_estimators": len(nodes), "nodes": int(sum(nodes)), "max_depth": int(max(depths))}
+
+
+def evaluate(clf, reg, X_test, y_class, y_reg):
+    """Метрики на отложенной выборке."""
+
+    proba = clf.predict_proba(X_test)
+    positive = list(clf.classes_).index(1) if 1 in clf.classes_ else None
+    pred_class = clf.classes_[proba.argmax(axis=1)]
+    pred_time = reg.predict(X_test)
+    report = {
+        "classifier": {
+            "accuracy": round(float(accuracy_score(y_class, pred_class)), 4),
+            "f1": round(float(f1_score(y_class, pred_class, zero_division=0)), 4),
+        },
+        "regressor": {
+            "mae_sec": round(float(mean_absolute_error(y_reg, pred_time)), 2),
+            "rmse_sec": round(float(np.sqrt(mean_squared_error(y_reg, pred_time))), 2),
+            "r2": round(float(r2_score(y_reg, pred_time)), 4),
+        },
+    }
+    if positive is not None and len(np.unique(y_class)) == 2:
+        report["classifier"]["roc_auc"] = round(float(roc_auc_score(y_class, proba[:, positive])), 4)
+    return report
+
+
+def train(csv_path="fdny_incidents.csv", model_dir="models", n_estimators=100, max_depth=None,
+          min_samples_leaf=1, max_samples=None, test_size=0.2, n_jobs=-1, random_state=42):
+    """
+    Обучает оба леса одновременно (ядра делятся между ними поровну) на одном общем
+    разбиении, сохраняет набор моделей и отчёт models/training_report.json.
+    """
+
+    if resource is None:
+        tracemalloc.start()
+
+    print("Загрузка данных...")
+    df = load_training_data(csv_path)
+
+    # Кодирование признаков (конвейер сохраняется вместе с моделями)
+    pipeline = FeaturePipeline()
+    X = pipeline.fit_transform(df)
+    y_class = (df['response_time'] > DELAY_THRESHOLD_SEC).astype(int)
+    y_reg = df['response_time']
+
+    print("Разделение данных...")
+    X_train, X_test, yc_train, yc_test, yr_train, yr_test = train_test_split(
+        X, y_class, y_reg, test_size=test_size, random_state=random_state)
+
+    cores = os.cpu_count() or 1
+    total_jobs = cores if n_jobs is None or n_jobs < 0 else n_jobs
+    jobs_each = max(1, total_jobs // 2)
+    size_params = {"max_depth": max_depth, "min_samples_leaf": min_samples_leaf, "max_samples": max_samples}
+    clf = RandomForestClassifier(random_state=random_state, n_jobs=jobs_each, **size_params)
+    reg = RandomForestRegressor(random_state=random_state, n_jobs=jobs_each, **size_params)
+
+    print(f"\nОбучение классификатора и регрессора ({jobs_each} потоков на модель)...")
+    # Построение деревьев отпускает GIL, поэтому два потока реально работают параллельно
+    lock = threading.Lock()
+    tqdm.set_lock(lock)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        clf_job = pool.submit(grow_forest, clf, X_train, yc_train, n_estimators, jobs_each, "Классификатор", 0)
+        reg_job = pool.submit(grow_forest, reg, X_train, yr_train, n_estimators, jobs_each, "Регрессор", 1)
+        fit_times = {"classifier": clf_job.result(), "regressor": reg_job.result()}
+    peak_fit_mb = _peak_memory_mb()
+
+    print("\nОценка на отложенной выборке...")
+    report = evaluate(clf, reg, X_test, yc_test, yr_test)
+    for name, model in (("classifier", clf), ("regressor", reg)):
+        report[name]["fit_time_s"] = round(fit_times[name], 2)
+        report[name].update(_tree_stats(model))
+    report["data"] = {"train_rows": len(X_train), "test_rows": len(X_test), "features": list(X.columns)}
+    report["params"] = dict(size_params, n_estimators=n_estimators, n_jobs_per_model=jobs_each,
+                            random_state=random_state)
+    report["peak_memory_mb"] = peak_fit_mb
+    report["peak_memory_source"] = "ru_maxrss" if resource is not None else "tracemalloc"
+
+    save_bundle(clf, reg, pipeline, model_dir)
+    with open(os.path.join(model_dir, "training_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if resource is None:
+        tracemalloc.stop()
+    return report
+
+
+def _fraction_or_count(value):
+    number = float(value)
+    return number if number < 1 or "." in value else int(number)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обучение моделей задержки прибытия (FDNY)")
+    parser.add_argument("csv", nargs="?", default="fdny_incidents.csv")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None, help="ограничение глубины деревьев")
+    parser.add_argument("--min-samples-leaf", type=int, default=1)
+    parser.add_argument("--max-samples", type=_fraction_or_count, default=None,
+                        help="размер бутстреп-выборки на дерево: доля (0.3) или число строк")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--jobs", type=int, default=-1, help="всего потоков на обе модели (-1 — все ядра)")
+    args = parser.parse_args()
+
+    report = train(args.csv, args.models, n_estimators=args.n_estimators, max_depth=args.max_depth,
+                   min_samples_leaf=args.min_samples_leaf, max_samples=args.max_samples,
+                   test_size=args.test_size, n_jobs=args.jobs)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"\n✅ Модели успешно обучены и сохранены в папку '{args.models}/'")
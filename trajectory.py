@@ -0,0 +1,236 @@
+# trajectory.py — Запись и воспроизведение траекторий бойцов и очагов (main.py)
+
+import json
+import os
+import time
+
+import numpy as np
+
+# Колонки, которые пишутся на каждом тике
+UNIT_COLUMNS = {
+    "lat": np.float64,
+    "lon": np.float64,
+    "temp": np.float32,
+    "pulse": np.float32,
+    "status": np.uint8,
+}
+FIRE_COLUMNS = {
+    "radius": np.float32,
+    "intensity": np.float32,
+    "active": np.bool_,
+}
+META_FILE = "meta.json"
+
+
+def _chunk_path(directory, column, chunk_idx):
+    return os.path.join(directory, f"{column}_{chunk_idx:05d}.npy")
+
+
+class TrajectoryRecorder:
+    """
+    Пишет состояние бойцов и очагов по тикам в заранее выделенные колоночные массивы.
+    Заполненный чанк сбрасывается на диск в .npy (читается потом через memmap),
+    поэтому в памяти всегда держится не больше одного чанка.
+    """
+
+    def __init__(self, units_list, fires_list, directory="trajectory", chunk_ticks=1024, tick_seconds=5, seed=None):
+        self.directory = directory
+        self.seed = seed  # сид расстановки (rngstreams.RandomStream.label), для повтора выезда
+        self.chunk_ticks = int(chunk_ticks)
+        self.tick_seconds = tick_seconds
+        self.unit_names = [u["name"] for u in units_list]
+        self.fire_info = [{"id": f["id"], "name": f["name"], "lat": f["lat"], "lon": f["lon"]} for f in fires_list]
+        self.status_names = []
+        self._status_codes = {}
+
+        n_units = len(units_list)
+        n_fires = len(fires_list)
+        self._time = np.zeros(self.chunk_ticks, dtype=np.float64)
+        self._units = {col: np.zeros((self.chunk_ticks, n_units), dtype=dt) for col, dt in UNIT_COLUMNS.items()}
+        self._fires = {col: np.zeros((self.chunk_ticks, n_fires), dtype=dt) for col, dt in FIRE_COLUMNS.items()}
+        self._row = 0
+        self._chunk_idx = 0
+        self.n_ticks = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _status_code(self, status):
+        code = self._status_codes.get(status)
+        if code is None:
+            code = len(self.status_names)
+            self.status_names.append(status)
+            self._status_codes[status] = code
+        return code
+
+    def record(self, units_list, fires_list, timestamp=None):
+        """Добавляет один тик. Порядок бойцов и очагов должен совпадать с исходным."""
+
+        row = self._row
+        self._time[row] = time.time() if timestamp is None else timestamp
+
+        u = self._units
+        for i, unit in enumerate(units_list):
+            u["lat"][row, i] = unit["lat"]
+            u["lon"][row, i] = unit["lon"]
+            u["temp"][row, i] = unit["temp"]
+            u["pulse"][row, i] = unit["pulse"]
+            u["status"][row, i] = self._status_code(unit.get("status") or "")
+
+        f = self._fires
+        for i, fire in enumerate(fires_list):
+            f["radius"][row, i] = fire["radius"]
+            f["intensity"][row, i] = fire["intensity"]
+            f["active"][row, i] = fire["active"]
+
+        self._row += 1
+        self.n_ticks += 1
+        if self._row == self.chunk_ticks:
+            self._spill()
+
+    def _spill(self):
+        """Сбрасывает заполненную часть текущего чанка на диск."""
+
+        rows = self._row
+        if rows == 0:
+            return
+        np.save(_chunk_path(self.directory, "time", self._chunk_idx), self._time[:rows])
+        for col, arr in self._units.items():
+            np.save(_chunk_path(self.directory, "unit_" + col, self._chunk_idx), arr[:rows])
+        for col, arr in self._fires.items():
+            np.save(_chunk_path(self.directory, "fire_" + col, self._chunk_idx), arr[:rows])
+        self._write_meta()
+        # Неполный чанк (при flush) перезапишется целиком при следующем сбросе
+        if rows == self.chunk_ticks:
+            self._chunk_idx += 1
+            self._row = 0
+
+    def _write_meta(self):
+        meta = {
+            "chunk_ticks": self.chunk_ticks,
+            "n_ticks": self.n_ticks,
+            "tick_seconds": self.tick_seconds,
+            "seed": self.seed,
+            "unit_names": self.unit_names,
+            "fires": self.fire_info,
+            "status_names": self.status_names,
+        }
+        with open(os.path.join(self.directory, META_FILE), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, ensure_ascii=False)
+
+    def flush(self):
+        """Сохраняет на диск всё записанное (в т.ч. неполный чанк)."""
+        self._spill()
+
+
+class TrajectoryReplay:
+    """Воспроизведение записи: переход к любому тику за O(1) через memmap чанков."""
+
+    def __init__(self, directory="trajectory"):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        self.chunk_ticks = meta["chunk_ticks"]
+        self.n_ticks = meta["n_ticks"]
+        self.tick_seconds = meta["tick_seconds"]
+        self.seed = meta.get("seed")
+        self.unit_names = meta["unit_names"]
+        self.fires = meta["fires"]
+        self.status_names = meta["status_names"]
+        self._mmaps = {}
+
+    def __len__(self):
+        return self.n_ticks
+
+    def _column(self, column, chunk_idx):
+        key = (column, chunk_idx)
+        arr = self._mmaps.get(key)
+        if arr is None:
+            arr = np.load(_chunk_path(self.directory, column, chunk_idx), mmap_mode="r")
+            self._mmaps[key] = arr
+        return arr
+
+    def _locate(self, tick):
+        if tick < 0:
+            tick += self.n_ticks
+        if not 0 <= tick < self.n_ticks:
+            raise IndexError(f"Тик {tick} вне записи (0..{self.n_ticks - 1})")
+        return divmod(tick, self.chunk_ticks)
+
+    def seek(self, tick):
+        """Возвращает состояние на тике в формате списков units/fires из main.py."""
+
+        chunk_idx, row = self._locate(tick)
+        col = lambda name: self._column(name, chunk_idx)[row]
+
+        lat, lon = col("unit_lat"), col("unit_lon")
+        temp, pulse, status = col("unit_temp"), col("unit_pulse"), col("unit_status")
+        units = [{
+            "name": name,
+            "lat": float(lat[i]),
+            "lon": float(lon[i]),
+            "temp": float(temp[i]),
+            "pulse": float(pulse[i]),
+            "status": self.status_names[status[i]],
+        } for i, name in enumerate(self.unit_names)]
+
+        radius, intensity, active = col("fire_radius"), col("fire_intensity"), col("fire_active")
+        fires = [dict(info, radius=float(radius[i]), intensity=float(intensity[i]), active=bool(active[i]))
+                 for i, info in enumerate(self.fires)]
+
+        return {"tick": tick, "time": float(col("time")), "units": units, "fires": fires}
+
+    def column(self, name):
+        """Полная колонка (например, 'unit_pulse') по всем тикам, склеенная из чанков."""
+
+        n_chunks = (self.n_ticks + self.chunk_ticks - 1) // self.chunk_ticks
+        return np.concatenate([np.asarray(self._column(name, i)) for i in range(n_chunks)])
+
+    def to_timestamped_geojson(self, step=1, period=None):
+        """Строит анимированный слой folium TimestampedGeoJson прямо из массивов."""
+
+        from folium.plugins import TimestampedGeoJson
+
+        times_ms = (self.column("time")[::step] * 1000).astype(np.int64).tolist()
+        lat = self.column("unit_lat")[::step]
+        lon = self.column("unit_lon")[::step]
+        radius = self.column("fire_radius")[::step]
+        active = self.column("fire_active")[::step]
+
+        features = []
+        for i, name in enumerate(self.unit_names):
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": np.column_stack((lon[:, i], lat[:, i])).tolist()},
+                "properties": {"times": times_ms, "popup": name, "style": {"color": "blue", "weight": 3}},
+            })
+        for i, fire in enumerate(self.fires):
+            for t, r, a in zip(times_ms, radius[:, i].tolist(), active[:, i].tolist()):
+                color = "red" if a else "gray"
+                features.append({
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [fire["lon"], fire["lat"]]},
+                    "properties": {
+                        "times": [t],
+                        "popup": f"{fire['name']}<br>Радиус: {int(r)} м",
+                        "icon": "circle",
+                        "iconstyle": {"color": color, "fillColor": color, "fillOpacity": 0.25, "radius": max(3, r / 10)},
+                    },
+                })
+
+        if period is None:
+            period = f"PT{int(self.tick_seconds * step)}S"
+        return TimestampedGeoJson({"type": "FeatureCollection", "features": features},
+                                  period=period, duration=period, add_last_point=True, auto_play=False)
+
+    def save_replay_map(self, filename="replay.html", center=None, step=1):
+        """Сохраняет HTML-карту с анимацией всей записи."""
+
+        import folium
+
+        if center is None:
+            first = self.seek(0)
+            center = [first["fires"][0]["lat"], first["fires"][0]["lon"]] if first["fires"] else [0.0, 0.0]
+        m = folium.Map(location=center, zoom_start=14)
+        self.to_timestamped_geojson(step=step).add_to(m)
+        m.save(filename)
+        return filename